@@ -0,0 +1,297 @@
+"""
+Suite di benchmark delle prestazioni del progetto.
+
+Per ogni scala del dataset (dalle 8.124 righe originali fino a milioni di righe sintetiche)
+misura:
+  - addestramento del 'MushroomClassifier' (a freddo e con la cache dei codici) e
+    costruzione a partire dall'artefatto salvato;
+  - latenza di 'predict' su una singola osservazione (p50/p99), con e senza tabella;
+  - throughput di 'predict_batch' (righe/sec), con e senza tabella;
+  - tempo della matrice di Cramér's V usata da 'heatmap_correlazioni';
+  - tempo di fit del motore K-Modes usato da 'k_modes_cluster'.
+
+I risultati vengono salvati in JSON insieme ai metadati dell'ambiente. Con '--confronta'
+si confrontano due file di risultati e si segnalano le regressioni oltre una soglia.
+
+Uso:
+    python benchmarks/benchmark_suite.py --righe 8124 100000 1000000 --output risultati.json
+    python benchmarks/benchmark_suite.py --confronta base.json risultati.json --soglia 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+POISON_ANALYSIS_DIR = os.path.join(PROJECT_ROOT, 'poison_analysis')
+VISUALIZATION_DIR = os.path.join(PROJECT_ROOT, 'visualization')
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+for cartella in (POISON_ANALYSIS_DIR, VISUALIZATION_DIR, DATA_DIR):
+    if cartella not in sys.path:
+        sys.path.append(cartella)
+
+CSV_ORIGINALE = os.path.join(POISON_ANALYSIS_DIR, 'mushrooms.csv')
+
+# stessi parametri usati dal visualizzatore per K-Modes
+KMODES_N_CLUSTERS = 2
+KMODES_SOGLIA_MINI_BATCH = 200_000
+KMODES_BATCH_SIZE = 20_000
+
+# numero di chiamate singole a 'predict' per stimare i percentili di latenza
+CHIAMATE_PREDICT = 2000
+
+BENCHMARK = ['addestramento', 'predict', 'batch', 'cramers', 'kmodes']
+
+
+def _tempo(funzione):
+    inizio = time.perf_counter()
+    risultato = funzione()
+    return time.perf_counter() - inizio, risultato
+
+
+def _mediana_tempi(funzione, ripetizioni):
+    return statistics.median(_tempo(funzione)[0] for _ in range(ripetizioni))
+
+
+def metadati_ambiente():
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        'python': sys.version.split()[0],
+        'piattaforma': platform.platform(),
+        'processore': platform.processor() or platform.machine(),
+        'cpu': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scikit-learn': sklearn.__version__,
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def prepara_dataset(righe, cartella, seed=0):
+    """
+    Scrive in 'cartella' un CSV con 'righe' righe e lo restituisce come DataFrame categorico.
+    Oltre la dimensione originale le righe sono generate da 'synthetic_data.GeneratoreFunghi',
+    che conserva le dipendenze tra le feature e la separabilità delle classi.
+    """
+    from mushroom_data import leggi_dataset, risolvi_dataset
+    from synthetic_data import GeneratoreFunghi
+
+    df = leggi_dataset(risolvi_dataset(CSV_ORIGINALE)).astype('category')
+    if righe != len(df):
+        generatore = GeneratoreFunghi().adatta(df)
+        # i blocchi hanno le stesse categorie: la concatenazione resta categorica
+        sintetico = pd.concat(generatore.genera_blocchi(righe, seed), ignore_index=True)
+        df = sintetico[list(df.columns)]
+
+    csv_path = os.path.join(cartella, f"mushrooms_{righe}.csv")
+    df.to_csv(csv_path, index=False)
+    return csv_path, df
+
+
+def bench_addestramento(csv_path, df, cartella, ripetizioni):
+    from poison_model import MushroomClassifier
+    # importato qui perché il suo tempo di import non finisca nella misura a freddo
+    import sklearn.tree  # noqa: F401
+
+    artifact_path = os.path.join(cartella, 'modello.pkl')
+    # la prima volta il CSV va letto e codificato (poi resta la cache '.npy' dei codici)
+    freddo, _ = _tempo(lambda: MushroomClassifier(csv_path, artifact_path=artifact_path, force_retrain=True))
+    return {
+        'addestramento_freddo_s': freddo,
+        'addestramento_s': _mediana_tempi(
+            lambda: MushroomClassifier(csv_path, artifact_path=artifact_path, force_retrain=True), ripetizioni),
+        'costruzione_artefatto_s': _mediana_tempi(
+            lambda: MushroomClassifier(csv_path, artifact_path=artifact_path), ripetizioni),
+    }
+
+
+def _percentili_predict(classifier, osservazioni):
+    latenze = np.empty(len(osservazioni))
+    for i, osservazione in enumerate(osservazioni):
+        inizio = time.perf_counter()
+        classifier.predict(osservazione)
+        latenze[i] = time.perf_counter() - inizio
+    return np.percentile(latenze, 50) * 1e6, np.percentile(latenze, 99) * 1e6
+
+
+def bench_predict(csv_path, df, cartella, ripetizioni):
+    from poison_model import MushroomClassifier, FEATURES_INPUT
+
+    artifact_path = os.path.join(cartella, 'modello.pkl')
+    indici = np.random.default_rng(1).integers(0, len(df), CHIAMATE_PREDICT)
+    osservazioni = df[FEATURES_INPUT].iloc[indici].astype(str).to_dict('records')
+
+    risultati = {}
+    for tabella, prefisso in ((False, 'predict'), (True, 'predict_tabella')):
+        classifier = MushroomClassifier(csv_path, artifact_path=artifact_path, lookup_table=tabella)
+        # una passata di riscaldamento, poi la misura
+        _percentili_predict(classifier, osservazioni[:100])
+        p50, p99 = _percentili_predict(classifier, osservazioni)
+        risultati[f'{prefisso}_p50_us'] = p50
+        risultati[f'{prefisso}_p99_us'] = p99
+    return risultati
+
+
+def bench_batch(csv_path, df, cartella, ripetizioni):
+    from poison_model import MushroomClassifier
+
+    artifact_path = os.path.join(cartella, 'modello.pkl')
+    risultati = {}
+    for tabella, nome in ((False, 'batch_righe_al_s'), (True, 'batch_tabella_righe_al_s')):
+        classifier = MushroomClassifier(csv_path, artifact_path=artifact_path, lookup_table=tabella)
+        throughput = []
+        for _ in range(ripetizioni):
+            classifier.predict_batch(df)
+            throughput.append(classifier.ultimo_throughput)
+        risultati[nome] = statistics.median(throughput)
+    return risultati
+
+
+def bench_cramers(csv_path, df, cartella, ripetizioni):
+    from cramers_matrix import matrice_cramers_v
+
+    return {'cramers_matrice_s': _mediana_tempi(lambda: matrice_cramers_v(df), ripetizioni)}
+
+
+def bench_kmodes(csv_path, df, cartella, ripetizioni):
+    from kmodes_engine import KModesNumpy
+    from mushroom_data import carica_codici
+
+    dataset = carica_codici(csv_path)
+    codici = dataset.seleziona([c for c in dataset.colonne if c != 'poisonous'])
+    batch_size = KMODES_BATCH_SIZE if len(codici) > KMODES_SOGLIA_MINI_BATCH else None
+
+    costi = []
+
+    def fit():
+        km = KModesNumpy(n_clusters=KMODES_N_CLUSTERS, init='Huang', n_init=1, batch_size=batch_size, random_state=0)
+        km.fit(codici)
+        costi.append(km.cost_)
+
+    return {'kmodes_fit_s': _mediana_tempi(fit, ripetizioni), 'kmodes_costo': costi[-1],
+            'kmodes_mini_batch': batch_size is not None}
+
+
+FUNZIONI_BENCHMARK = {
+    'addestramento': bench_addestramento,
+    'predict': bench_predict,
+    'batch': bench_batch,
+    'cramers': bench_cramers,
+    'kmodes': bench_kmodes,
+}
+
+
+def esegui_suite(scale, benchmark=BENCHMARK, ripetizioni=3, seed=0):
+    risultati = {'ambiente': metadati_ambiente(), 'ripetizioni': ripetizioni, 'scale': {}}
+
+    for righe in scale:
+        print(f"\n--- {righe:,} righe ---")
+        misure = {}
+        with tempfile.TemporaryDirectory(prefix='bench_funghi_') as cartella:
+            preparazione, (csv_path, df) = _tempo(lambda: prepara_dataset(righe, cartella, seed))
+            print(f"Dataset pronto in {preparazione:.2f} s")
+
+            # l'addestramento crea l'artefatto usato dai benchmark successivi
+            for nome in ['addestramento'] + [b for b in benchmark if b != 'addestramento']:
+                misure_nome = FUNZIONI_BENCHMARK[nome](csv_path, df, cartella, ripetizioni)
+                if nome in benchmark:
+                    misure.update(misure_nome)
+                    for chiave, valore in misure_nome.items():
+                        print(f"  {chiave:28s} {valore:,.6g}" if isinstance(valore, float) else f"  {chiave:28s} {valore}")
+
+        risultati['scale'][str(righe)] = misure
+
+    return risultati
+
+
+def _direzione(metrica):
+    """
+    +1 se un valore più alto è meglio (throughput), -1 se è meglio più basso (tempi), 0 se non è una misura.
+    """
+    if metrica.endswith('_al_s'):
+        return 1
+    if metrica.endswith('_s') or metrica.endswith('_us'):
+        return -1
+    return 0
+
+
+def confronta(base, nuovo, soglia=0.10):
+    """
+    Confronta due file di risultati. Restituisce l'elenco delle misure peggiorate di oltre 'soglia'
+    (es. 0.10 = 10%) come tuple (scala, metrica, valore base, valore nuovo, variazione relativa).
+    """
+    regressioni = []
+    for scala, misure_base in base['scale'].items():
+        misure_nuove = nuovo['scale'].get(scala, {})
+        for metrica, valore_base in misure_base.items():
+            direzione = _direzione(metrica)
+            valore_nuovo = misure_nuove.get(metrica)
+            if direzione == 0 or valore_nuovo is None or not valore_base:
+                continue
+            # variazione positiva = peggioramento, qualunque sia la direzione della metrica
+            variazione = -direzione * (valore_nuovo - valore_base) / valore_base
+            if variazione > soglia:
+                regressioni.append((scala, metrica, valore_base, valore_nuovo, variazione))
+    return regressioni
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite di benchmark di addestramento, predizione, statistiche e clustering.")
+    parser.add_argument('--righe', type=int, nargs='+', default=[8124, 100_000, 1_000_000],
+                        help="Scale del dataset da misurare (numero di righe).")
+    parser.add_argument('--benchmark', nargs='+', choices=BENCHMARK, default=BENCHMARK,
+                        help="Benchmark da eseguire (default: tutti).")
+    parser.add_argument('--ripetizioni', type=int, default=3, help="Ripetizioni di ogni misura (si usa la mediana).")
+    parser.add_argument('--seed', type=int, default=0, help="Seme del generatore di righe sintetiche.")
+    parser.add_argument('--output', help="Percorso del file JSON con i risultati.")
+    parser.add_argument('--confronta', nargs=2, metavar=('BASE', 'NUOVO'),
+                        help="Confronta due file di risultati invece di eseguire i benchmark.")
+    parser.add_argument('--soglia', type=float, default=0.10,
+                        help="Peggioramento relativo oltre il quale una misura è una regressione (default: 0.10).")
+    args = parser.parse_args()
+
+    if args.confronta:
+        with open(args.confronta[0]) as f:
+            base = json.load(f)
+        with open(args.confronta[1]) as f:
+            nuovo = json.load(f)
+
+        for chiave in ('commit', 'cpu', 'python'):
+            if base['ambiente'].get(chiave) != nuovo['ambiente'].get(chiave):
+                print(f"Nota: '{chiave}' diverso ({base['ambiente'].get(chiave)} -> {nuovo['ambiente'].get(chiave)})")
+
+        regressioni = confronta(base, nuovo, args.soglia)
+        if not regressioni:
+            print(f"Nessuna regressione oltre il {args.soglia:.0%}.")
+            return
+        print(f"{len(regressioni)} regressioni oltre il {args.soglia:.0%}:")
+        for scala, metrica, valore_base, valore_nuovo, variazione in regressioni:
+            print(f"  [{int(scala):,} righe] {metrica:28s} {valore_base:,.6g} -> {valore_nuovo:,.6g} (+{variazione:.0%})")
+        sys.exit(1)
+
+    risultati = esegui_suite(args.righe, args.benchmark, args.ripetizioni, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(risultati, f, indent=2)
+        print(f"\nRisultati salvati in: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark riproducibile del tempo di avvio a freddo.
+
+Per ogni punto di ingresso (modulo del modello, runtime leggero, GUI) lancia un nuovo
+interprete più volte e misura:
+  - il tempo di import riportato da 'python -X importtime' (somma dei tempi 'self');
+  - il tempo a orologio fino al primo marcatore utile (import completato, prima finestra,
+    modello pronto);
+  - se sono stati caricati moduli che non dovrebbero servire (es. matplotlib);
+  - per la GUI, quanto a lungo la finestra resta bloccata (watchdog di 'data/tk_watchdog.py').
+
+Uso:
+    python benchmarks/startup_benchmark.py --ripetizioni 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+POISON_ANALYSIS_DIR = os.path.join(PROJECT_ROOT, 'poison_analysis')
+
+# moduli che un uso di sola predizione non dovrebbe mai caricare
+MODULI_INDESIDERATI = ['matplotlib', 'matplotlib.pyplot', 'seaborn']
+
+# punti di ingresso misurati con 'python -X importtime': nome -> codice eseguito
+ENTRY_POINTS = {
+    'poison_model (import)': "import poison_model",
+    'poison_model (artefatto)': "import poison_model; poison_model.MushroomClassifier()",
+    'poison_runtime (import)': "import poison_runtime",
+}
+
+
+def _analizza_importtime(stderr):
+    """
+    Estrae dall'output di '-X importtime' il tempo totale (somma dei 'self', in µs),
+    i moduli caricati e i dieci moduli di primo livello più costosi.
+    """
+    totale_us = 0
+    moduli = []
+    primo_livello = []
+    for riga in stderr.splitlines():
+        if not riga.startswith('import time:') or 'self [us]' in riga:
+            continue
+        campi = riga[len('import time:'):].split('|')
+        if len(campi) != 3:
+            continue
+        self_us, cumulativo_us, nome = int(campi[0]), int(campi[1]), campi[2]
+        totale_us += self_us
+        moduli.append(nome.strip())
+        # i moduli importati direttamente hanno un solo spazio di indentazione
+        if not nome[1:].startswith(' '):
+            primo_livello.append((nome.strip(), cumulativo_us))
+
+    primo_livello.sort(key=lambda x: x[1], reverse=True)
+    return totale_us, moduli, primo_livello[:10]
+
+
+def misura_import(codice, ripetizioni):
+    risultati = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', codice],
+            cwd=POISON_ANALYSIS_DIR, capture_output=True, text=True
+        )
+        durata = time.perf_counter() - inizio
+        if proc.returncode != 0:
+            return {'errore': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'errore sconosciuto'}
+        totale_us, moduli, primo_livello = _analizza_importtime(proc.stderr)
+        risultati.append((durata, totale_us, moduli, primo_livello))
+
+    durate = [r[0] for r in risultati]
+    import_us = [r[1] for r in risultati]
+    moduli = risultati[-1][2]
+    return {
+        'wall_s_mediana': statistics.median(durate),
+        'wall_s_min': min(durate),
+        'import_ms_mediana': statistics.median(import_us) / 1000,
+        'moduli_caricati': len(moduli),
+        'moduli_indesiderati': [m for m in MODULI_INDESIDERATI if m in moduli],
+        'top_import_ms': [(nome, us / 1000) for nome, us in risultati[-1][3]],
+    }
+
+
+def misura_gui(ripetizioni, timeout=60):
+    """
+    Avvia 'poison_tester_gui.py --benchmark-avvio' e misura il tempo fino ai marcatori
+    'PRIMA_FINESTRA' e 'MODELLO_PRONTO', più il ritardo massimo del ciclo degli eventi
+    registrato dal watchdog di Tk. Richiede un display (o Xvfb).
+    """
+    script = os.path.join(POISON_ANALYSIS_DIR, 'poison_tester_gui.py')
+    prima_finestra = []
+    modello_pronto = []
+    ritardo_massimo = []
+    tempo_bloccato = []
+
+    for i in range(ripetizioni):
+        rapporto_watchdog = os.path.join(tempfile.gettempdir(), f"watchdog_avvio_{os.getpid()}_{i}.json")
+        inizio = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, script, '--benchmark-avvio'],
+            cwd=POISON_ANALYSIS_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            env=dict(os.environ, FUNGHI_WATCHDOG=rapporto_watchdog)
+        )
+        pronto = False
+        try:
+            for riga in proc.stdout:
+                riga = riga.strip()
+                if riga == 'PRIMA_FINESTRA':
+                    prima_finestra.append(time.perf_counter() - inizio)
+                elif riga == 'MODELLO_PRONTO':
+                    modello_pronto.append(time.perf_counter() - inizio)
+                    pronto = True
+                    break
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            return {'errore': f'timeout dopo {timeout}s'}
+
+        if not pronto:
+            errore = proc.stderr.read().strip()
+            return {'errore': errore.splitlines()[-1] if errore else 'la GUI non ha segnalato alcun marcatore'}
+
+        # il rapporto viene scritto alla chiusura della finestra
+        try:
+            with open(rapporto_watchdog) as f:
+                rapporto = json.load(f)
+            os.remove(rapporto_watchdog)
+            ritardo_massimo.append(rapporto['ritardo_ms']['massimo'])
+            tempo_bloccato.append(rapporto['ritardo_ms']['totale_bloccato'])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    risultato = {
+        'prima_finestra_s_mediana': statistics.median(prima_finestra),
+        'prima_finestra_s_min': min(prima_finestra),
+        'modello_pronto_s_mediana': statistics.median(modello_pronto),
+        'modello_pronto_s_min': min(modello_pronto),
+    }
+    if ritardo_massimo:
+        risultato['ritardo_eventi_ms_massimo_mediana'] = statistics.median(ritardo_massimo)
+        risultato['finestra_bloccata_ms_mediana'] = statistics.median(tempo_bloccato)
+    return risultato
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tempo di avvio a freddo.")
+    parser.add_argument('--ripetizioni', type=int, default=5, help="Numero di avvii per ogni punto di ingresso.")
+    parser.add_argument('--senza-gui', action='store_true', help="Non misura la GUI (es. in assenza di display).")
+    parser.add_argument('--output', help="Percorso del file JSON con i risultati.")
+    args = parser.parse_args()
+
+    risultati = {
+        'ambiente': {
+            'python': sys.version.split()[0],
+            'piattaforma': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ripetizioni': args.ripetizioni,
+        },
+        'entry_points': {},
+    }
+
+    for nome, codice in ENTRY_POINTS.items():
+        print(f"Misuro '{nome}'...")
+        risultati['entry_points'][nome] = misura_import(codice, args.ripetizioni)
+
+    if not args.senza_gui:
+        print("Misuro 'poison_tester_gui'...")
+        risultati['entry_points']['poison_tester_gui'] = misura_gui(args.ripetizioni)
+
+    for nome, r in risultati['entry_points'].items():
+        if 'errore' in r:
+            print(f"{nome:28s} ERRORE: {r['errore']}")
+        elif 'import_ms_mediana' in r:
+            extra = f" (indesiderati: {', '.join(r['moduli_indesiderati'])})" if r['moduli_indesiderati'] else ""
+            print(f"{nome:28s} wall {r['wall_s_mediana'] * 1000:8.1f} ms | import {r['import_ms_mediana']:8.1f} ms{extra}")
+        else:
+            blocco = (f" | finestra bloccata {r['finestra_bloccata_ms_mediana']:8.1f} ms"
+                      if 'finestra_bloccata_ms_mediana' in r else "")
+            print(f"{nome:28s} prima finestra {r['prima_finestra_s_mediana'] * 1000:8.1f} ms | "
+                  f"modello pronto {r['modello_pronto_s_mediana'] * 1000:8.1f} ms{blocco}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(risultati, f, indent=2)
+        print(f"\nRisultati salvati in: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,412 @@
+"""
+Caricamento condiviso del dataset in forma compatta.
+
+Ogni valore del dataset è una singola lettera, quindi invece di tenere in memoria colonne
+di stringhe (decine di byte per cella) lo rappresentiamo come:
+  - una matrice di codici uint8 (righe x colonne), 1 byte per cella;
+  - per ogni colonna, l'elenco ordinato delle categorie: il codice è la posizione nell'elenco,
+    quindi coincide con la codifica di 'LabelEncoder'.
+
+'carica_codici' salva la matrice accanto al CSV come file '.npy' (più un piccolo '.json'
+con colonne e categorie) e nelle chiamate successive la apre in memory-map, senza
+rileggere né ricodificare il testo. La cache viene rigenerata se il CSV cambia.
+
+Se accanto al CSV c'è la versione binaria prodotta da 'setup_dataset.py' (Parquet con colonne
+categoriche, più un manifest JSON con hash e numero di righe), 'leggi_dataset' legge quella
+invece di rianalizzare il testo; in mancanza di 'pyarrow' o del file si torna al CSV.
+
+Il modulo vive in 'data/' ed è usato da 'poison_analysis' e 'visualization', che aggiungono
+questa cartella al 'sys.path'. 'data/' contiene anche la copia canonica del dataset: con
+'risolvi_dataset' gli script la usano quando nella propria cartella non c'è il file.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# 'COLUMN_NAMES' (target seguito dalle 22 feature) è definito nello schema condiviso
+# e re-esportato qui per chi legge e scrive il dataset
+from mushroom_schema import COLUMN_NAMES
+from pipeline_trace import traccia
+
+# incrementare se cambia il formato dei file di cache
+VERSIONE_CODICI = 1
+
+# versione del manifest della copia binaria del dataset
+VERSIONE_MANIFEST = 1
+
+# righe lette e scritte per blocco durante la conversione del dataset
+RIGHE_BLOCCO = 100_000
+
+# cartella 'data' (dove si trova questo modulo), sede della copia canonica del dataset
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class DatasetCodificato:
+
+    def __init__(self, codici, colonne, categorie):
+        # matrice (righe x colonne) uint8, eventualmente in memory-map (sola lettura)
+        self.codici = codici
+        self.colonne = list(colonne)
+        # dict colonna -> array ordinato delle categorie (il codice è l'indice)
+        self.categorie = categorie
+
+    def __len__(self):
+        return self.codici.shape[0]
+
+    def indice(self, colonna):
+        return self.colonne.index(colonna)
+
+    def colonna(self, colonna):
+        return self.codici[:, self.indice(colonna)]
+
+    def seleziona(self, colonne):
+        """
+        Sottomatrice contigua con le colonne richieste, nell'ordine indicato.
+        """
+        return np.ascontiguousarray(self.codici[:, [self.indice(c) for c in colonne]])
+
+    def decodifica(self, colonna, codici):
+        return self.categorie[colonna][np.asarray(codici)]
+
+
+@traccia("dati.codifica")
+def codifica_dataframe(df):
+    """
+    Codifica tutte le colonne di 'df' in una matrice uint8 con categorie ordinate.
+    I valori mancanti diventano la stringa vuota, che è una categoria come le altre.
+    """
+    codici = np.empty((len(df), len(df.columns)), dtype=np.uint8)
+    categorie = {}
+    for j, col in enumerate(df.columns):
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            cod, uniche = _codifica_categorica(df[col])
+        else:
+            valori = df[col].astype(object).where(df[col].notna(), '').astype(str)
+            cod, uniche = pd.factorize(valori, sort=True)
+        if len(uniche) > 255:
+            raise ValueError(f"La colonna '{col}' ha {len(uniche)} categorie: al massimo 255 sono rappresentabili in uint8.")
+        codici[:, j] = cod
+        categorie[col] = np.asarray(uniche, dtype=str)
+    return DatasetCodificato(codici, df.columns, categorie)
+
+
+def _codifica_categorica(serie):
+    """
+    Codici di una colonna già categorica (es. letta dal Parquet): si riordinano solo
+    le categorie, senza mai convertire le singole celle in stringhe.
+    """
+    serie = serie.cat.remove_unused_categories()
+    uniche = serie.cat.categories.astype(str).to_numpy()
+    cod = serie.cat.codes.to_numpy()
+    if (cod < 0).any():
+        # i mancanti diventano la categoria '' come nel percorso CSV
+        uniche = np.append(uniche, '')
+        cod = np.where(cod < 0, len(uniche) - 1, cod)
+    ordine = np.argsort(uniche, kind='stable')
+    rango = np.empty(len(ordine), dtype=np.int64)
+    rango[ordine] = np.arange(len(ordine))
+    return rango[cod], uniche[ordine]
+
+
+def impronta_file(percorso, dimensione_blocco=1 << 20):
+    """
+    Hash SHA-256 del contenuto di un file, letto a blocchi.
+    """
+    h = hashlib.sha256()
+    with open(percorso, 'rb') as f:
+        for blocco in iter(lambda: f.read(dimensione_blocco), b''):
+            h.update(blocco)
+    return h.hexdigest()
+
+
+def percorsi_binario(csv_path):
+    """
+    Percorsi della copia Parquet del dataset e del relativo manifest.
+    """
+    base, _ = os.path.splitext(csv_path)
+    return f"{base}.parquet", f"{base}.manifest.json"
+
+
+def risolvi_dataset(percorso):
+    """
+    Percorso effettivo del dataset: 'percorso' se esiste (CSV o copia Parquet), altrimenti il
+    file con lo stesso nome nella cartella 'data', dove 'setup_dataset.py' lo crea una volta sola.
+    """
+    if os.path.exists(percorso) or os.path.exists(percorsi_binario(percorso)[0]):
+        return percorso
+    canonico = os.path.join(DATA_DIR, os.path.basename(percorso))
+    if os.path.exists(canonico) or os.path.exists(percorsi_binario(canonico)[0]):
+        return canonico
+    return percorso
+
+
+class _ScrittoreParquet:
+    """
+    Scrive la copia Parquet a blocchi (un row group per blocco) con colonne dizionario,
+    che 'pd.read_parquet' restituisce come colonne categoriche.
+    """
+
+    def __init__(self, percorso):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.percorso = percorso
+        self.temporaneo = f"{percorso}.{os.getpid()}.tmp"
+        self._writer = None
+
+    def scrivi(self, blocco):
+        pa = self._pa
+        # tipo fisso (indici int32) per tutti i blocchi, anche se le categorie cambiano da un blocco all'altro.
+        # I valori mancanti (es. 'stalk-root' nel download da ucimlrepo) diventano '', come nel CSV
+        # scritto da 'to_csv' e riletto con 'keep_default_na=False'.
+        colonne = [pa.array(blocco[c].where(blocco[c].notna(), '').to_numpy(dtype=object), type=pa.string()).dictionary_encode()
+                   for c in blocco.columns]
+        tabella = pa.Table.from_arrays(colonne, names=[str(c) for c in blocco.columns])
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.temporaneo, tabella.schema)
+        self._writer.write_table(tabella)
+
+    def chiudi(self):
+        if self._writer is None:
+            raise ValueError("Nessun blocco scritto nella copia Parquet.")
+        self._writer.close()
+        os.replace(self.temporaneo, self.percorso)
+
+    def annulla(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.temporaneo):
+            os.remove(self.temporaneo)
+
+
+def _pyarrow_disponibile():
+    try:
+        import pyarrow  # noqa: F401 (serve solo a verificare che sia disponibile)
+    except ImportError:
+        print("ATTENZIONE: 'pyarrow' non è installato, salto la creazione della copia binaria del dataset.")
+        return False
+    return True
+
+
+def scrivi_manifest(csv_path, righe, colonne, sha256):
+    """
+    Scrive il manifest della copia Parquet (hash SHA-256 e dimensione del CSV, numero di righe).
+    """
+    percorso_binario, percorso_manifest = percorsi_binario(csv_path)
+    manifest = {
+        'versione': VERSIONE_MANIFEST,
+        'formato': 'parquet',
+        'csv': os.path.basename(csv_path),
+        'binario': os.path.basename(percorso_binario),
+        'sha256': sha256,
+        'righe': righe,
+        'colonne': list(colonne),
+        'dimensione_csv': os.path.getsize(csv_path),
+        'dimensione_binario': os.path.getsize(percorso_binario),
+    }
+    with open(percorso_manifest, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+@traccia("dati.scrivi_binario")
+def scrivi_binario(csv_path, righe_blocco=RIGHE_BLOCCO):
+    """
+    Crea accanto al CSV la copia Parquet (colonne categoriche) e il manifest con hash
+    SHA-256 del CSV e numero di righe. Il CSV viene letto a blocchi, quindi la memoria
+    non dipende dalla dimensione del file. Restituisce il percorso del Parquet, o None se
+    'pyarrow' non è installato.
+    """
+    if not _pyarrow_disponibile():
+        return None
+
+    percorso_binario, _ = percorsi_binario(csv_path)
+    scrittore = _ScrittoreParquet(percorso_binario)
+    righe, colonne = 0, []
+    try:
+        for blocco in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=righe_blocco):
+            scrittore.scrivi(blocco)
+            righe += len(blocco)
+            colonne = list(blocco.columns)
+        scrittore.chiudi()
+    except BaseException:
+        scrittore.annulla()
+        raise
+
+    scrivi_manifest(csv_path, righe, colonne, impronta_file(csv_path))
+    return percorso_binario
+
+
+class ScrittoreDataset:
+    """
+    Scrive un dataset a blocchi direttamente nel CSV finale e (se 'pyarrow' è disponibile)
+    nella copia Parquet, calcolando l'hash SHA-256 del CSV mentre viene scritto: alla fine il
+    manifest è pronto senza rileggere il file. Entrambi i file vengono scritti come temporanei
+    e rinominati solo con 'chiudi' (prima il CSV, poi il Parquet, che così non risulta più
+    vecchio del CSV).
+
+        with ScrittoreDataset(percorso) as scrittore:
+            for blocco in blocchi:
+                scrittore.scrivi(blocco)
+    """
+
+    def __init__(self, csv_path, binario=True):
+        self.csv_path = csv_path
+        self.righe = 0
+        self.colonne = None
+        self._hash = hashlib.sha256()
+        self._temporaneo = f"{csv_path}.{os.getpid()}.tmp"
+        self._file = open(self._temporaneo, 'wb')
+        self._parquet = _ScrittoreParquet(percorsi_binario(csv_path)[0]) if binario and _pyarrow_disponibile() else None
+
+    def scrivi(self, blocco):
+        if self.colonne is None:
+            self.colonne = [str(c) for c in blocco.columns]
+        dati = blocco.to_csv(index=False, header=(self.righe == 0), lineterminator='\n').encode('utf-8')
+        self._hash.update(dati)
+        self._file.write(dati)
+        if self._parquet is not None:
+            self._parquet.scrivi(blocco)
+        self.righe += len(blocco)
+
+    def chiudi(self):
+        """
+        Rende definitivi i file e scrive il manifest. Restituisce il numero di righe scritte.
+        """
+        self._file.close()
+        os.replace(self._temporaneo, self.csv_path)
+        if self._parquet is not None:
+            self._parquet.chiudi()
+            scrivi_manifest(self.csv_path, self.righe, self.colonne, self._hash.hexdigest())
+        return self.righe
+
+    def annulla(self):
+        self._file.close()
+        if os.path.exists(self._temporaneo):
+            os.remove(self._temporaneo)
+        if self._parquet is not None:
+            self._parquet.annulla()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valore, traceback):
+        if tipo is None:
+            self.chiudi()
+        else:
+            self.annulla()
+
+
+def leggi_manifest(csv_path):
+    _, percorso_manifest = percorsi_binario(csv_path)
+    with open(percorso_manifest) as f:
+        return json.load(f)
+
+
+def binario_valido(csv_path):
+    """
+    Percorso del Parquet se è utilizzabile al posto del CSV, altrimenti None.
+    Il controllo è economico (dimensioni e date dei file): l'hash completo del manifest
+    si verifica con 'verifica_binario'.
+    """
+    percorso_binario, percorso_manifest = percorsi_binario(csv_path)
+    if not (os.path.exists(percorso_binario) and os.path.exists(percorso_manifest)):
+        return None
+    try:
+        manifest = leggi_manifest(csv_path)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('versione') != VERSIONE_MANIFEST:
+        return None
+    if os.path.getsize(percorso_binario) != manifest.get('dimensione_binario'):
+        return None
+    # se il CSV esiste deve essere quello da cui è nato il Parquet (e non modificato dopo)
+    if os.path.exists(csv_path):
+        if os.path.getsize(csv_path) != manifest.get('dimensione_csv'):
+            return None
+        if os.path.getmtime(csv_path) > os.path.getmtime(percorso_binario):
+            return None
+    return percorso_binario
+
+
+def verifica_binario(csv_path):
+    """
+    Confronta l'hash SHA-256 del CSV con quello registrato nel manifest.
+    """
+    return binario_valido(csv_path) is not None and impronta_file(csv_path) == leggi_manifest(csv_path)['sha256']
+
+
+@traccia("dati.leggi_dataset")
+def leggi_dataset(csv_path, colonne=None):
+    """
+    Legge il dataset preferendo la copia Parquet (colonne categoriche) se è valida,
+    altrimenti il CSV come DataFrame di stringhe, mantenendo i codici così come sono (es. '?').
+    """
+    percorso_binario = binario_valido(csv_path)
+    if percorso_binario:
+        try:
+            return pd.read_parquet(percorso_binario, columns=colonne)
+        except ImportError:
+            # Parquet presente ma 'pyarrow' non installato: si usa il CSV
+            pass
+    return pd.read_csv(csv_path, dtype=str, keep_default_na=False, usecols=colonne)
+
+
+def _percorsi_cache(csv_path):
+    base, _ = os.path.splitext(csv_path)
+    return f"{base}.codici.npy", f"{base}.codici.json"
+
+
+def _stato_file(percorso):
+    stat = os.stat(percorso)
+    return {'dimensione': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+@traccia("dati.carica_codici")
+def carica_codici(csv_path, usa_cache=True):
+    """
+    Restituisce il dataset di 'csv_path' come 'DatasetCodificato'.
+    Con 'usa_cache' la matrice viene letta in memory-map dal file '.npy' se è aggiornato,
+    altrimenti viene ricostruita dal CSV e salvata per le volte successive.
+    """
+    percorso_npy, percorso_json = _percorsi_cache(csv_path)
+    # senza CSV (es. solo la copia binaria) la cache segue il file Parquet
+    stato = _stato_file(csv_path if os.path.exists(csv_path) else percorsi_binario(csv_path)[0])
+
+    if usa_cache and os.path.exists(percorso_npy) and os.path.exists(percorso_json):
+        try:
+            with open(percorso_json) as f:
+                meta = json.load(f)
+            if meta.get('versione') == VERSIONE_CODICI and meta.get('sorgente') == stato:
+                codici = np.load(percorso_npy, mmap_mode='r')
+                categorie = {c: np.asarray(v, dtype=str) for c, v in meta['categorie'].items()}
+                return DatasetCodificato(codici, meta['colonne'], categorie)
+        except (OSError, ValueError, KeyError):
+            # cache illeggibile: la ricostruiamo
+            pass
+
+    dataset = codifica_dataframe(leggi_dataset(csv_path))
+
+    if usa_cache:
+        meta = {
+            'versione': VERSIONE_CODICI,
+            'sorgente': stato,
+            'colonne': dataset.colonne,
+            'categorie': {c: v.tolist() for c, v in dataset.categorie.items()},
+        }
+        try:
+            temporaneo = f"{percorso_npy}.{os.getpid()}.tmp"
+            with open(temporaneo, 'wb') as f:
+                np.save(f, dataset.codici)
+            os.replace(temporaneo, percorso_npy)
+            with open(percorso_json, 'w') as f:
+                json.dump(meta, f)
+        except OSError as e:
+            # senza cache funziona tutto lo stesso, solo più lentamente
+            print(f"ATTENZIONE: Impossibile salvare la cache dei codici accanto a '{csv_path}': {e}")
+
+    return dataset
@@ -0,0 +1,207 @@
+"""
+Schema fisso del dataset dei funghi: unico punto in cui sono definiti gli attributi, i loro
+valori (le lettere del dataset UCI) e i relativi nomi in inglese e in italiano.
+
+Il codice intero di ogni valore è la sua posizione nell'elenco ordinato delle lettere
+dell'attributo, cioè lo stesso che produrrebbe 'LabelEncoder' su un dataset che contiene tutti
+i valori. Essendo fisso, non dipende da quali valori compaiono nei dati: resta identico tra
+processi, esecuzioni e artefatti salvati, e codificare non richiede nessun 'fit'.
+'CodificatoreFisso' traduce un'intera colonna con una sola lettura da una tabella indicizzata
+dal carattere.
+
+Da qui derivano 'COLUMN_NAMES' (in 'mushroom_data'), i menu della GUI ('MENU_OPZIONI' in
+'poison_model') e i nomi leggibili usati dai visualizzatori.
+"""
+import numpy as np
+
+# attributo -> [(lettera, nome inglese, nome italiano), ...] nell'ordine della descrizione UCI
+SCHEMA = {
+    "class": [("e", "edible", "Commestibile"), ("p", "poisonous", "Velenoso")],
+    "cap-shape": [
+        ("b", "bell", "A campana"), ("c", "conical", "Conico"), ("x", "convex", "Convesso"),
+        ("f", "flat", "Piatto"), ("k", "knobbed", "Nodoso/Umbone"), ("s", "sunken", "Infossato"),
+    ],
+    "cap-surface": [("f", "fibrous", "Fibrosa"), ("g", "grooves", "Scanalata"), ("y", "scaly", "Squamosa"), ("s", "smooth", "Liscia")],
+    "cap-color": [
+        ("n", "brown", "Marrone"), ("b", "buff", "Giallo pallido (Buff)"), ("c", "cinnamon", "Cannella"),
+        ("g", "gray", "Grigio"), ("r", "green", "Verde"), ("p", "pink", "Rosa"), ("u", "purple", "Viola"),
+        ("e", "red", "Rosso"), ("w", "white", "Bianco"), ("y", "yellow", "Giallo"),
+    ],
+    "bruises": [("t", "bruises", "Con macchie"), ("f", "no bruises", "Senza macchie")],
+    "odor": [
+        ("a", "almond", "Mandorla"), ("l", "anise", "Anice"), ("c", "creosote", "Chimico/Creosoto"),
+        ("y", "fishy", "Pesce"), ("f", "foul", "Fetido"), ("m", "musty", "Muffa"), ("n", "none", "Nessun odore"),
+        ("p", "pungent", "Pungente"), ("s", "spicy", "Speziato"),
+    ],
+    "gill-attachment": [("a", "attached", "Attaccate"), ("d", "descending", "Decorrenti"), ("f", "free", "Libere"), ("n", "notched", "Smarginate")],
+    "gill-spacing": [("c", "close", "Fitte"), ("w", "crowded", "Molto fitte"), ("d", "distant", "Rade")],
+    "gill-size": [("b", "broad", "Larghe"), ("n", "narrow", "Strette")],
+    "gill-color": [
+        ("k", "black", "Nero"), ("n", "brown", "Marrone"), ("b", "buff", "Giallo pallido"), ("h", "chocolate", "Cioccolato"),
+        ("g", "gray", "Grigio"), ("r", "green", "Verde"), ("o", "orange", "Arancione"), ("p", "pink", "Rosa"),
+        ("u", "purple", "Viola"), ("e", "red", "Rosso"), ("w", "white", "Bianco"), ("y", "yellow", "Giallo"),
+    ],
+    "stalk-shape": [("e", "enlarging", "Si allarga alla base"), ("t", "tapering", "Si restringe (affusolato)")],
+    "stalk-root": [
+        ("b", "bulbous", "Bulboso"), ("c", "club", "A clava"), ("u", "cup", "A coppa"), ("e", "equal", "Uniforme"),
+        ("z", "rhizomorphs", "Rizomorfe"), ("?", "missing", "Mancante"), ("r", "rooted", "Radicante"),
+    ],
+    "stalk-surface-above-ring": [("f", "fibrous", "Fibrosa"), ("y", "scaly", "Squamosa"), ("k", "silky", "Setosa"), ("s", "smooth", "Liscia")],
+    "stalk-surface-below-ring": [("f", "fibrous", "Fibrosa"), ("y", "scaly", "Squamosa"), ("k", "silky", "Setosa"), ("s", "smooth", "Liscia")],
+    "stalk-color-above-ring": [
+        ("n", "brown", "Marrone"), ("b", "buff", "Giallo pallido"), ("c", "cinnamon", "Cannella"), ("g", "gray", "Grigio"),
+        ("o", "orange", "Arancione"), ("p", "pink", "Rosa"), ("e", "red", "Rosso"), ("w", "white", "Bianco"), ("y", "yellow", "Giallo"),
+    ],
+    "stalk-color-below-ring": [
+        ("n", "brown", "Marrone"), ("b", "buff", "Giallo pallido"), ("c", "cinnamon", "Cannella"), ("g", "gray", "Grigio"),
+        ("o", "orange", "Arancione"), ("p", "pink", "Rosa"), ("e", "red", "Rosso"), ("w", "white", "Bianco"), ("y", "yellow", "Giallo"),
+    ],
+    "veil-type": [("p", "partial", "Parziale"), ("u", "universal", "Universale")],
+    "veil-color": [("n", "brown", "Marrone"), ("o", "orange", "Arancione"), ("w", "white", "Bianco"), ("y", "yellow", "Giallo")],
+    "ring-number": [("n", "none", "Nessuno"), ("o", "one", "Uno"), ("t", "two", "Due")],
+    "ring-type": [
+        ("c", "cobwebby", "Ragnatela"), ("e", "evanescent", "Evanescente"), ("f", "flaring", "Svasato"), ("l", "large", "Grande"),
+        ("n", "none", "Nessuno"), ("p", "pendant", "Pendente"), ("s", "sheathing", "Avvolgente"), ("z", "zone", "A zona"),
+    ],
+    "spore-print-color": [
+        ("k", "black", "Nero"), ("n", "brown", "Marrone"), ("b", "buff", "Giallo pallido"), ("h", "chocolate", "Cioccolato"),
+        ("r", "green", "Verde"), ("o", "orange", "Arancione"), ("u", "purple", "Viola"), ("w", "white", "Bianco"), ("y", "yellow", "Giallo"),
+    ],
+    "population": [
+        ("a", "abundant", "Abbondante"), ("c", "clustered", "Raggruppata"), ("n", "numerous", "Numerosa"),
+        ("s", "scattered", "Sparsa"), ("v", "several", "Diverse"), ("y", "solitary", "Solitaria"),
+    ],
+    "habitat": [
+        ("g", "grasses", "Erba"), ("l", "leaves", "Foglie"), ("m", "meadows", "Prati"), ("p", "paths", "Sentieri"),
+        ("u", "urban", "Urbano"), ("w", "waste", "Rifiuti"), ("d", "woods", "Boschi"),
+    ],
+}
+
+# nomi italiani degli attributi
+NOMI_ITALIANI = {
+    "class": "CLASSE", "cap-shape": "FORMA DEL CAPPELLO", "cap-surface": "SUPERFICIE DEL CAPPELLO",
+    "cap-color": "COLORE DEL CAPPELLO", "bruises": "MACCHIE", "odor": "ODORE",
+    "gill-attachment": "ATTACCATURA DELLE LAMELLE", "gill-spacing": "SPAZIATURA DELLE LAMELLE",
+    "gill-size": "DIMENSIONE DELLE LAMELLE", "gill-color": "COLORE DELLE LAMELLE", "stalk-shape": "FORMA DEL GAMBO",
+    "stalk-root": "RADICE DEL GAMBO", "stalk-surface-above-ring": "SUPERFICIE DEL GAMBO SOPRA L'ANELLO",
+    "stalk-surface-below-ring": "SUPERFICIE DEL GAMBO SOTTO L'ANELLO", "stalk-color-above-ring": "COLORE DEL GAMBO SOPRA L'ANELLO",
+    "stalk-color-below-ring": "COLORE DEL GAMBO SOTTO L'ANELLO", "veil-type": "TIPO DI VELO", "veil-color": "COLORE DEL VELO",
+    "ring-number": "NUMERO DI ANELLI", "ring-type": "TIPO DI ANELLO", "spore-print-color": "COLORE DELLE SPORE",
+    "population": "POPOLAZIONE", "habitat": "HABITAT",
+}
+
+# nomi alternativi della colonna target (il CSV e ucimlrepo la chiamano 'poisonous')
+ALIAS = {"poisonous": "class"}
+
+# Schema delle colonne del dataset UCI (target seguito dalle 22 feature), usato anche
+# come intestazione per i file .data senza header
+COLUMN_NAMES = list(SCHEMA)
+
+# categorie ordinate di ogni attributo: il codice di un valore è la sua posizione
+_CATEGORIE = {a: np.array(sorted(v[0] for v in valori)) for a, valori in SCHEMA.items()}
+
+# le tabelle di traduzione sono indicizzate dal carattere (ASCII); l'ultima cella raccoglie
+# tutti i caratteri fuori tabella
+_DIMENSIONE_TABELLA = 129
+
+
+def nome_schema(attributo):
+    """
+    Nome dell'attributo nello schema (risolve gli alias, es. 'poisonous' -> 'class').
+    """
+    nome = ALIAS.get(attributo, attributo)
+    if nome not in SCHEMA:
+        raise KeyError(f"L'attributo '{attributo}' non fa parte dello schema.")
+    return nome
+
+
+def categorie(attributo):
+    """
+    Valori ammessi dell'attributo in ordine di codice.
+    """
+    return _CATEGORIE[nome_schema(attributo)].copy()
+
+
+def nomi_inglesi(attributo):
+    """
+    Dizionario lettera -> nome inglese (es. per rendere leggibili i grafici).
+    """
+    return {lettera: inglese for lettera, inglese, _ in SCHEMA[nome_schema(attributo)]}
+
+
+def menu_italiano(attributo):
+    """
+    Dizionario nome italiano -> lettera, nell'ordine della descrizione (menu della GUI).
+    """
+    return {italiano: lettera for lettera, _, italiano in SCHEMA[nome_schema(attributo)]}
+
+
+class CodificatoreFisso:
+    """
+    Codificatore a categorie fisse, utilizzabile al posto di un 'LabelEncoder' già addestrato
+    ('classes_', 'transform', 'inverse_transform'): le categorie vengono dallo schema e
+    non si impara nulla dai dati. 'extra' aggiunge valori fuori schema (mantenendo l'ordine).
+    """
+
+    def __init__(self, attributo, extra=()):
+        self.attributo = nome_schema(attributo)
+        classi = _CATEGORIE[self.attributo]
+        extra = np.asarray(extra).astype(str)
+        if len(extra):
+            classi = np.union1d(classi, extra)
+        self.classes_ = classi.astype(object)
+
+    @property
+    def classes_(self):
+        return self._classi
+
+    @classes_.setter
+    def classes_(self, classi):
+        # le classi possono essere sostituite (es. 'MushroomClassifier._estendi_encoder'):
+        # la tabella di traduzione va ricostruita insieme
+        self._classi = np.asarray(classi, dtype=object)
+        self._classi_str = self._classi.astype(str)
+        tabella = np.full(_DIMENSIONE_TABELLA, -1, dtype=np.int64)
+        for codice, valore in enumerate(self._classi_str):
+            if len(valore) != 1 or ord(valore) >= _DIMENSIONE_TABELLA - 1:
+                # valori di più caratteri: si ripiega sulla ricerca binaria
+                tabella = None
+                break
+            tabella[ord(valore)] = codice
+        self._tabella = tabella
+
+    def codifica(self, valori, default=None):
+        """
+        Codici interi di 'valori'. I valori sconosciuti diventano 'default' oppure, se non
+        è indicato, sollevano ValueError come 'LabelEncoder.transform'.
+        """
+        valori = np.asarray(valori).astype(str)
+        if self._tabella is not None and valori.dtype.itemsize == 4:
+            # stringhe di un solo carattere: il codice del carattere indicizza la tabella
+            # (la stringa vuota vale 0 e finisce su una cella vuota)
+            caratteri = np.minimum(valori.view(np.uint32), _DIMENSIONE_TABELLA - 1)
+            codici = self._tabella[caratteri]
+        else:
+            posizioni = np.minimum(np.searchsorted(self._classi_str, valori), len(self._classi_str) - 1)
+            codici = np.where(self._classi_str[posizioni] == valori, posizioni, -1)
+
+        sconosciuti = codici < 0
+        if sconosciuti.any():
+            if default is None:
+                raise ValueError(f"Valori sconosciuti per '{self.attributo}': {sorted(set(valori[sconosciuti].tolist()))}")
+            codici = np.where(sconosciuti, default, codici)
+        return codici
+
+    def transform(self, valori):
+        return self.codifica(valori)
+
+    def inverse_transform(self, codici):
+        return self._classi[np.asarray(codici)]
+
+    def fit(self, valori):
+        # categorie fisse: si controlla solo che i valori siano ammessi
+        self.codifica(valori)
+        return self
+
+    def fit_transform(self, valori):
+        return self.codifica(valori)
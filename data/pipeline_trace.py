@@ -0,0 +1,296 @@
+"""
+Strumentazione opzionale delle fasi della pipeline (caricamento, codifica, addestramento,
+predizione, statistiche, clustering, grafici).
+
+Si attiva con la variabile d'ambiente FUNGHI_TRACCIA:
+    FUNGHI_TRACCIA=1 python poison_analysis/poison_model.py            -> traccia_funghi.json
+    FUNGHI_TRACCIA=/tmp/run.json python poison_analysis/test_stats.py  -> /tmp/run.json
+Ogni fase ("span") registra tempo reale, tempo di CPU e memoria allocata (con 'tracemalloc'),
+annidata nelle fasi che la contengono. All'uscita vengono scritti:
+  - un file JSON nel formato Chrome trace, da aprire con https://ui.perfetto.dev o chrome://tracing;
+  - un riepilogo testuale ('.txt' accanto al JSON) con i totali per fase, stampato anche su stderr.
+I processi figli (es. i worker di 'test_stats.py') ereditano la variabile e scrivono un proprio
+file con il PID nel nome; per vederli insieme:
+    python data/pipeline_trace.py traccia_funghi*.json -o traccia_unita.json
+
+'tracemalloc' rallenta sensibilmente le allocazioni (gli import di librerie pesanti anche di
+alcune volte): con FUNGHI_TRACCIA_MEMORIA=0 si misurano solo i tempi, più fedeli, e la memoria vale 0.
+
+Da disattivata costa quasi nulla: 'span' restituisce sempre lo stesso oggetto vuoto e
+'traccia' lascia la funzione decorata invariata.
+
+    from pipeline_trace import span, traccia
+
+    with span("caricamento_csv", righe=n):
+        ...
+
+    @traccia("addestramento")
+    def addestra(...):
+        ...
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+VARIABILE_AMBIENTE = "FUNGHI_TRACCIA"
+FILE_DEFAULT = "traccia_funghi.json"
+
+# riga ("thread") della traccia su cui finiscono le fasi aperte con 'apri_span'
+TID_SEPARATE = 0
+
+_valore = os.environ.get(VARIABILE_AMBIENTE, "").strip()
+ATTIVO = _valore.lower() not in ("", "0", "false", "no")
+MEMORIA = os.environ.get("FUNGHI_TRACCIA_MEMORIA", "1").strip().lower() not in ("0", "false", "no")
+
+
+class _SpanNullo:
+    """
+    Span usato quando la strumentazione è disattivata: non fa nulla.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def chiudi(self):
+        pass
+
+
+_NULLO = _SpanNullo()
+
+
+class _Registro:
+
+    def __init__(self, percorso):
+        import tracemalloc
+
+        self.percorso = percorso
+        self.eventi = []
+        self.scritto = False
+        self._lock = threading.Lock()
+        self._locale = threading.local()
+        self._tracemalloc = tracemalloc
+        self._origine = time.perf_counter_ns()
+        # senza 'tracemalloc' attivo 'get_traced_memory' restituisce sempre zero
+        if MEMORIA:
+            tracemalloc.start()
+        atexit.register(self.scrivi)
+        # i processi di 'multiprocessing' terminano senza eseguire 'atexit' ma con i suoi finalizzatori,
+        # che all'avvio del figlio vengono azzerati: il registro si reimposta dopo l'avvio
+        import multiprocessing.util
+        multiprocessing.util.register_after_fork(self, _Registro._nel_figlio)
+
+    def _nel_figlio(self):
+        import multiprocessing.util
+
+        # con 'fork' il figlio eredita gli eventi del padre: riparte da zero, sul proprio file
+        self.percorso = _percorso_traccia()
+        self.eventi = []
+        self.scritto = False
+        self._lock = threading.Lock()
+        self._locale = threading.local()
+        multiprocessing.util.Finalize(self, self.scrivi, exitpriority=0)
+
+    def pila(self):
+        pila = getattr(self._locale, 'pila', None)
+        if pila is None:
+            pila = self._locale.pila = []
+        return pila
+
+    def registra(self, evento):
+        with self._lock:
+            self.eventi.append(evento)
+
+    def riepilogo(self):
+        """
+        Totali per nome di fase, ordinati per tempo reale complessivo.
+        """
+        totali = {}
+        eventi = [e for e in self.eventi if e['ph'] == 'X']
+        for evento in eventi:
+            t = totali.setdefault(evento['name'], {'chiamate': 0, 'reale_ms': 0.0, 'cpu_ms': 0.0, 'picco_kb': 0.0})
+            t['chiamate'] += 1
+            t['reale_ms'] += evento['dur'] / 1000
+            t['cpu_ms'] += evento['args']['cpu_ms']
+            t['picco_kb'] = max(t['picco_kb'], evento['args']['picco_kb'])
+
+        righe = [f"Traccia del processo {os.getpid()} ({len(eventi)} span)",
+                 f"{'fase':<32} {'chiamate':>8} {'reale ms':>11} {'CPU ms':>11} {'picco KB':>11}"]
+        for nome, t in sorted(totali.items(), key=lambda v: -v[1]['reale_ms']):
+            righe.append(f"{nome:<32} {t['chiamate']:>8} {t['reale_ms']:>11.1f} {t['cpu_ms']:>11.1f} {t['picco_kb']:>11.0f}")
+        return "\n".join(righe) + "\n"
+
+    def scrivi(self):
+        if self.scritto or not self.eventi:
+            return
+        self.scritto = True
+        # le fasi separate (vedi 'apri_span') hanno una riga a parte nel visualizzatore
+        self.eventi.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': TID_SEPARATE,
+                            'args': {'name': 'fasi separate'}})
+        try:
+            with open(self.percorso, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': self.eventi, 'displayTimeUnit': 'ms'}, f)
+            riepilogo = self.riepilogo()
+            with open(os.path.splitext(self.percorso)[0] + '.txt', 'w', encoding='utf-8') as f:
+                f.write(riepilogo)
+            sys.stderr.write(riepilogo + f"Traccia salvata in: {self.percorso}\n")
+        except OSError as e:
+            sys.stderr.write(f"ATTENZIONE: Impossibile salvare la traccia in '{self.percorso}': {e}\n")
+
+
+class _Span:
+
+    def __init__(self, registro, nome, attributi, separato=False):
+        self.registro = registro
+        self.nome = nome
+        self.attributi = attributi
+        self.separato = separato
+        self.aperto = False
+
+    def apri(self):
+        tracemalloc = self.registro._tracemalloc
+        corrente, picco = tracemalloc.get_traced_memory()
+        self.memoria_inizio = corrente
+        self.picco_figli = corrente
+        if not self.separato:
+            pila = self.registro.pila()
+            # 'reset_peak' azzera il picco anche per gli span esterni: lo conservano nel proprio stato
+            if pila:
+                pila[-1].picco_figli = max(pila[-1].picco_figli, picco)
+            tracemalloc.reset_peak()
+            pila.append(self)
+        self.cpu_inizio = time.process_time_ns()
+        self.inizio = time.perf_counter_ns()
+        self.aperto = True
+        return self
+
+    def chiudi(self):
+        if not self.aperto:
+            return
+        self.aperto = False
+        fine = time.perf_counter_ns()
+        cpu = time.process_time_ns() - self.cpu_inizio
+        corrente, picco = self.registro._tracemalloc.get_traced_memory()
+        if self.separato:
+            # il picco globale è stato azzerato dalle altre fasi nel frattempo: resta solo l'ultimo valore
+            picco = max(corrente, self.picco_figli)
+        else:
+            picco = max(picco, self.picco_figli)
+            pila = self.registro.pila()
+            if self in pila:
+                pila.remove(self)
+            if pila:
+                pila[-1].picco_figli = max(pila[-1].picco_figli, picco)
+
+        args = {
+            'cpu_ms': cpu / 1e6,
+            'memoria_kb': (corrente - self.memoria_inizio) / 1024,
+            'picco_kb': (picco - self.memoria_inizio) / 1024,
+        }
+        args.update({k: v if isinstance(v, (int, float, str, bool)) else str(v) for k, v in self.attributi.items()})
+        self.registro.registra({
+            'name': self.nome,
+            'ph': 'X',
+            'ts': (self.inizio - self.registro._origine) / 1000,
+            'dur': (fine - self.inizio) / 1000,
+            'pid': os.getpid(),
+            'tid': TID_SEPARATE if self.separato else threading.get_ident(),
+            'args': args,
+        })
+
+    def __enter__(self):
+        return self.apri()
+
+    def __exit__(self, *exc):
+        self.chiudi()
+        return False
+
+
+def _percorso_traccia():
+    percorso = _valore if _valore.lower().endswith('.json') else FILE_DEFAULT
+    # i processi figli scrivono un file separato, altrimenti si sovrascriverebbero a vicenda
+    import multiprocessing
+    if multiprocessing.parent_process() is not None:
+        base, estensione = os.path.splitext(percorso)
+        percorso = f"{base}.{os.getpid()}{estensione}"
+    return os.path.abspath(percorso)
+
+
+_registro = _Registro(_percorso_traccia()) if ATTIVO else None
+
+
+def span(nome, **attributi):
+    """
+    Context manager che misura una fase. Con la strumentazione disattivata non fa nulla.
+    """
+    if _registro is None:
+        return _NULLO
+    return _Span(_registro, nome, attributi)
+
+
+def apri_span(nome, **attributi):
+    """
+    Apre una fase che si chiude più tardi con '.chiudi()', anche da un'altra funzione (es. un
+    lavoro in background che termina in un callback di Tk). Non si annida nelle altre fasi:
+    compare su una riga a parte della traccia e CPU e memoria sono quelle del processo.
+    """
+    if _registro is None:
+        return _NULLO
+    return _Span(_registro, nome, attributi, separato=True).apri()
+
+
+def traccia(nome=None):
+    """
+    Decoratore che misura ogni chiamata della funzione (di default col suo nome).
+    Con la strumentazione disattivata restituisce la funzione invariata.
+    """
+    def decora(funzione):
+        if _registro is None:
+            return funzione
+        etichetta = nome or funzione.__qualname__
+
+        @functools.wraps(funzione)
+        def avvolta(*args, **kwargs):
+            with _Span(_registro, etichetta, {}):
+                return funzione(*args, **kwargs)
+        return avvolta
+    return decora
+
+
+def unisci(percorsi, output_path):
+    """
+    Unisce più tracce (es. quella del processo principale e quelle dei worker) in un unico
+    file da aprire nel visualizzatore.
+    """
+    eventi = []
+    for percorso in percorsi:
+        with open(percorso, encoding='utf-8') as f:
+            eventi.extend(json.load(f)['traceEvents'])
+    temporaneo = f"{output_path}.{os.getpid()}.tmp"
+    with open(temporaneo, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': eventi, 'displayTimeUnit': 'ms'}, f)
+    os.replace(temporaneo, output_path)
+    return len(eventi)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Unisce le tracce dei processi della pipeline in un unico file.")
+    parser.add_argument('tracce', nargs='+', help="File JSON delle tracce (es. traccia_funghi*.json).")
+    parser.add_argument('-o', '--output', default='traccia_unita.json', help="File JSON risultante.")
+    args = parser.parse_args()
+
+    percorsi = [p for p in args.tracce if os.path.abspath(p) != os.path.abspath(args.output)]
+    n = unisci(percorsi, args.output)
+    print(f"SUCCESSO: {n} eventi da {len(percorsi)} tracce salvati in '{args.output}'.")
+
+
+if __name__ == '__main__':
+    main()
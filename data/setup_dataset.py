@@ -5,6 +5,10 @@ import os
 import argparse
 import shutil
 from ucimlrepo import fetch_ucirepo
+# 'COLUMN_NAMES' (nomi delle colonne per il fallback da file .data senza header) è definito
+# in 'mushroom_data', così lo possono usare anche gli altri moduli senza importare questo script.
+from mushroom_data import COLUMN_NAMES, RIGHE_BLOCCO, ScrittoreDataset, binario_valido, percorsi_binario, scrivi_binario
+from pipeline_trace import traccia
 
 # --- Costanti ---
 # Lo script è progettato per risiedere nella cartella 'data'.
@@ -23,17 +27,9 @@ ZIP_FILE = "mushroom.zip"
 CSV_PATH = os.path.join(DATA_DIR, CSV_FILE)
 ZIP_PATH = os.path.join(DATA_DIR, ZIP_FILE)
 
-# Nomi delle colonne per il fallback da file .data (senza header)
-COLUMN_NAMES = [
-    "class", "cap-shape", "cap-surface", "cap-color", "bruises", "odor",
-    "gill-attachment", "gill-spacing", "gill-size", "gill-color", "stalk-shape",
-    "stalk-root", "stalk-surface-above-ring", "stalk-surface-below-ring",
-    "stalk-color-above-ring", "stalk-color-below-ring", "veil-type", "veil-color",
-    "ring-number", "ring-type", "spore-print-color", "population", "habitat"
-]
-
 # --- Funzioni ---
 
+@traccia("setup.download")
 def download_from_url():
     """Scarica il dataset Mushroom utilizzando la libreria ucimlrepo."""
     print("Tentativo di download del dataset Mushroom tramite ucimlrepo...")
@@ -48,8 +44,9 @@ def download_from_url():
         # Combiniamo features e target in un unico DataFrame
         df = pd.concat([y, X], axis=1)
 
-        # Salviamo il DataFrame in un file CSV
-        df.to_csv(CSV_PATH, index=False)
+        # Salviamo il DataFrame nel file CSV (e nella copia binaria, in un solo passaggio)
+        with ScrittoreDataset(CSV_PATH) as scrittore:
+            scrittore.scrivi(df)
 
         print("\nSUCCESSO!")
         print(f"File '{CSV_PATH}' creato correttamente con {len(df)} righe.")
@@ -65,6 +62,7 @@ def download_from_url():
         return False
 
 
+@traccia("setup.estrazione_zip")
 def extract_from_zip():
     """Estrae il dataset da un file ZIP, cercando un file .csv o .data."""
     print(f"Tentativo di estrazione del dataset da '{ZIP_PATH}'...")
@@ -96,23 +94,26 @@ def extract_from_zip():
                 print(f"\nERRORE: Impossibile trovare un file '.csv' o '.data' in '{ZIP_PATH}'.")
                 return False
 
+            # il file viene decompresso e analizzato a blocchi: in memoria c'è al massimo un
+            # blocco di righe, scritto subito nel CSV finale e nella copia binaria
             with zip_ref.open(file_to_extract) as f:
+                testo = io.TextIOWrapper(f, encoding='utf-8', newline='')
                 if is_csv:
                     # Il CSV da Kaggle dovrebbe avere gli header
                     print(f"Trovato file '{file_to_extract}', lo leggo come CSV con header.")
-                    df = pd.read_csv(f)
+                    blocchi = pd.read_csv(testo, dtype=str, keep_default_na=False, chunksize=RIGHE_BLOCCO)
                 else:
                     # Il file .data non ha header
                     print(f"Trovato file '{file_to_extract}', lo leggo come file .data senza header.")
-                    content = f.read().decode('utf-8')
-                    file_stream = io.StringIO(content)
-                    df = pd.read_csv(file_stream, header=None, names=COLUMN_NAMES)
+                    blocchi = pd.read_csv(testo, header=None, names=COLUMN_NAMES, dtype=str,
+                                          keep_default_na=False, chunksize=RIGHE_BLOCCO)
 
-        # Salva il DataFrame nel percorso CSV finale
-        df.to_csv(CSV_PATH, index=False)
+                with ScrittoreDataset(CSV_PATH) as scrittore:
+                    for blocco in blocchi:
+                        scrittore.scrivi(blocco)
 
         print("\nSUCCESSO!")
-        print(f"File '{CSV_PATH}' creato correttamente da '{file_to_extract}' con {len(df)} righe.")
+        print(f"File '{CSV_PATH}' creato correttamente da '{file_to_extract}' con {scrittore.righe} righe.")
         return True
 
     except Exception as e:
@@ -120,28 +121,71 @@ def extract_from_zip():
         print(e)
         return False
 
+@traccia("setup.copia_binaria")
+def create_binary_copy():
+    """Crea la copia binaria (Parquet con colonne categoriche) e il manifest accanto al CSV, se manca."""
+    # download ed estrazione la scrivono già insieme al CSV: qui si rimedia solo se manca o non è aggiornata
+    if binario_valido(CSV_PATH):
+        return
+    try:
+        percorso_binario = scrivi_binario(CSV_PATH)
+    except Exception as e:
+        # i consumatori ripiegano sul CSV: non è un errore bloccante
+        print(f"ATTENZIONE: Impossibile creare la copia binaria del dataset. Dettagli: {e}")
+        return
+    if percorso_binario:
+        print(f"SUCCESSO: Creata la copia binaria '{os.path.basename(percorso_binario)}' con il relativo manifest.")
+
+def _collega(sorgente, dest_dir):
+    """
+    Rende 'sorgente' disponibile in 'dest_dir' con un hard link (nessun dato duplicato);
+    dove non è possibile (file system diversi o che non li supportano) ripiega sulla copia.
+    Restituisce 'collegato' o 'copiato'.
+    """
+    destinazione = os.path.join(dest_dir, os.path.basename(sorgente))
+    if os.path.exists(destinazione):
+        if os.path.samefile(sorgente, destinazione):
+            return 'collegato'
+        os.remove(destinazione)
+    try:
+        os.link(sorgente, destinazione)
+        return 'collegato'
+    except OSError:
+        # 'copy2' mantiene le date: la copia binaria resta non più vecchia del CSV
+        shutil.copy2(sorgente, destinazione)
+        return 'copiato'
+
+@traccia("setup.collegamento")
 def copy_csv_to_projects():
-    """Copia il file CSV nelle cartelle dei progetti che lo utilizzano."""
+    """
+    Rende il file CSV (e l'eventuale copia binaria) disponibile nelle cartelle dei progetti che
+    lo utilizzano, con hard link al file in 'data/' invece di copie.
+    Gli script trovano comunque il dataset in 'data/' anche senza questo passaggio (vedi 'risolvi_dataset').
+    """
     if not os.path.exists(CSV_PATH):
         print(f"\nERRORE: Il file sorgente '{CSV_PATH}' non esiste. Impossibile copiare.")
         return
 
+    # il CSV va collegato per primo: la copia binaria è valida solo se non è più vecchia del CSV
+    files_to_copy = [CSV_PATH] + [p for p in percorsi_binario(CSV_PATH) if os.path.exists(p)]
+
     destinations = {
         "Analisi dei veleni": POISON_ANALYSIS_DIR,
         "Visualizzazione": VISUALIZATION_DIR
     }
 
-    print("\n--- Copia del dataset nelle altre cartelle ---")
+    print("\n--- Collegamento del dataset nelle altre cartelle ---")
     for name, dest_dir in destinations.items():
         if not os.path.exists(dest_dir):
-            print(f"ATTENZIONE: La cartella del progetto '{name}' ('{dest_dir}') non esiste. Salto la copia.")
+            print(f"ATTENZIONE: La cartella del progetto '{name}' ('{dest_dir}') non esiste. Salto il collegamento.")
             continue
         
         try:
-            shutil.copy(CSV_PATH, dest_dir)
-            print(f"SUCCESSO: Copiato '{CSV_FILE}' in '{dest_dir}'.")
+            for path in files_to_copy:
+                esito = _collega(path, dest_dir)
+                print(f"SUCCESSO: {esito.capitalize()} '{os.path.basename(path)}' in '{dest_dir}'.")
         except Exception as e:
-            print(f"ERRORE: Impossibile copiare in '{dest_dir}'. Dettagli: {e}")
+            print(f"ERRORE: Impossibile collegare in '{dest_dir}'. Dettagli: {e}")
 
 # --- Esecuzione ---
 
@@ -157,6 +201,11 @@ def main():
         action='store_true',
         help=f"Se specificato, estrae il dataset da '{ZIP_FILE}' invece di scaricarlo."
     )
+    parser.add_argument(
+        '--solo-data',
+        action='store_true',
+        help="Non collega il dataset nelle cartelle dei progetti: gli script useranno direttamente quello in 'data/'."
+    )
     args = parser.parse_args()
 
     if not os.path.exists(DATA_DIR):
@@ -168,9 +217,11 @@ def main():
     else:
         success = download_from_url()
 
-    # Se il download o l'estrazione hanno avuto successo, copia il file
+    # Se il download o l'estrazione hanno avuto successo, verifica la copia binaria e collega i file
     if success:
-        copy_csv_to_projects()
+        create_binary_copy()
+        if not args.solo_data:
+            copy_csv_to_projects()
 
 if __name__ == "__main__":
     main()
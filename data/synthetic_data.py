@@ -0,0 +1,254 @@
+"""
+Generatore di dataset sintetici di funghi per i test di carico.
+
+Il modello viene appreso da 'mushrooms.csv':
+  - per ogni classe (commestibile / velenoso) si costruisce un albero di Chow-Liu, cioè
+    l'albero di copertura massimo sulle informazioni mutue tra coppie di feature;
+  - ogni feature viene campionata dalla distribuzione condizionata alla classe e al
+    valore della feature "genitore" nell'albero.
+In questo modo restano (approssimativamente) le dipendenze a coppie più forti, quindi la
+struttura di Cramér's V e la separabilità delle classi, senza inventare categorie nuove.
+
+Le righe vengono generate e scritte a blocchi (memoria limitata a un blocco alla volta),
+in CSV o Parquet a seconda dell'estensione. A parità di seme e di 'righe_blocco' l'output
+è identico. Le colonne seguono 'COLUMN_NAMES'; il target mantiene il nome usato nel CSV
+di origine ('poisonous'), così i file generati si usano al posto del dataset originale.
+
+Uso:
+    python data/synthetic_data.py funghi_1M.csv --righe 1000000 --seed 0
+    python data/synthetic_data.py funghi_10M.parquet --righe 10000000 --righe-blocco 500000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from mushroom_data import COLUMN_NAMES, codifica_dataframe, leggi_dataset
+
+CSV_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mushrooms.csv')
+
+
+def informazione_mutua(a, b, n_a, n_b):
+    """
+    Informazione mutua (in nat) tra due colonne di codici.
+    """
+    congiunta = np.bincount(a.astype(np.int64) * n_b + b, minlength=n_a * n_b).reshape(n_a, n_b)
+    p = congiunta / congiunta.sum()
+    pa = p.sum(axis=1, keepdims=True)
+    pb = p.sum(axis=0, keepdims=True)
+    nonzero = p > 0
+    return float((p[nonzero] * np.log(p[nonzero] / (pa @ pb)[nonzero])).sum())
+
+
+def albero_chow_liu(codici, n_categorie):
+    """
+    Albero di copertura massimo (algoritmo di Prim) sulle informazioni mutue tra le colonne.
+    Restituisce l'ordine di visita (radice = colonna 0) e il genitore di ogni colonna (-1 per la radice).
+    """
+    m = codici.shape[1]
+    mi = np.zeros((m, m))
+    for i in range(m):
+        for j in range(i + 1, m):
+            mi[i, j] = mi[j, i] = informazione_mutua(codici[:, i], codici[:, j], n_categorie[i], n_categorie[j])
+
+    genitori = np.full(m, -1)
+    nell_albero = np.zeros(m, dtype=bool)
+    nell_albero[0] = True
+    ordine = [0]
+    migliore = mi[0].copy()
+    candidato = np.zeros(m, dtype=int)
+    for _ in range(m - 1):
+        punteggi = np.where(nell_albero, -np.inf, migliore)
+        nuovo = int(np.argmax(punteggi))
+        genitori[nuovo] = candidato[nuovo]
+        nell_albero[nuovo] = True
+        ordine.append(nuovo)
+        aggiorna = mi[nuovo] > migliore
+        migliore = np.where(aggiorna, mi[nuovo], migliore)
+        candidato = np.where(aggiorna, nuovo, candidato)
+    return ordine, genitori
+
+
+def _campiona(cumulate, u):
+    """
+    Indice della categoria estratta per ogni riga, date le probabilità cumulate di ogni riga.
+    """
+    return np.minimum((u[:, None] > cumulate).sum(axis=1), cumulate.shape[1] - 1)
+
+
+class GeneratoreFunghi:
+
+    def __init__(self):
+        self.colonna_target = None
+        self.features = None
+        self.categorie = None
+        self.prob_classi = None
+        # per ogni classe: ordine di visita, genitori e tabelle cumulate P(feature | genitore, classe)
+        self.modelli = None
+
+    def adatta(self, df, colonna_target=None):
+        """
+        Apprende il modello dal DataFrame del dataset (target + feature di 'COLUMN_NAMES').
+        """
+        self.colonna_target = colonna_target or df.columns[0]
+        self.features = list(COLUMN_NAMES[1:])
+        mancanti = [c for c in self.features if c not in df.columns]
+        if mancanti:
+            raise ValueError(f"Colonne mancanti nel dataset di origine: {mancanti}")
+
+        dataset = codifica_dataframe(df[[self.colonna_target] + self.features])
+        self.categorie = dataset.categorie
+        codici_target = dataset.colonna(self.colonna_target)
+        X = dataset.seleziona(self.features)
+        n_categorie = [len(self.categorie[f]) for f in self.features]
+
+        conteggi_classi = np.bincount(codici_target, minlength=len(self.categorie[self.colonna_target]))
+        self.prob_classi = conteggi_classi / conteggi_classi.sum()
+
+        self.modelli = []
+        for classe in range(len(conteggi_classi)):
+            Xc = X[codici_target == classe]
+            ordine, genitori = albero_chow_liu(Xc, n_categorie)
+
+            tabelle = []
+            for j in range(len(self.features)):
+                marginale = np.bincount(Xc[:, j], minlength=n_categorie[j]).astype(np.float64)
+                marginale /= marginale.sum()
+                if genitori[j] < 0:
+                    tabella = marginale[None, :]
+                else:
+                    g = genitori[j]
+                    congiunta = np.bincount(Xc[:, g].astype(np.int64) * n_categorie[j] + Xc[:, j],
+                                            minlength=n_categorie[g] * n_categorie[j]).reshape(n_categorie[g], n_categorie[j])
+                    totali = congiunta.sum(axis=1, keepdims=True)
+                    # un valore del genitore mai osservato in questa classe non verrà mai estratto:
+                    # per sicurezza gli assegniamo la distribuzione marginale della feature
+                    tabella = np.where(totali > 0, congiunta / np.maximum(totali, 1), marginale[None, :])
+                tabelle.append(np.cumsum(tabella, axis=1))
+            self.modelli.append((ordine, genitori, tabelle))
+
+        return self
+
+    def campiona(self, righe, rng):
+        """
+        Matrice di codici (righe x [target + feature]) estratta dal modello.
+        """
+        if self.modelli is None:
+            raise ValueError("Il generatore non è stato ancora adattato ai dati.")
+
+        codici = np.empty((righe, 1 + len(self.features)), dtype=np.uint8)
+        cumulate_classi = np.cumsum(self.prob_classi)
+        classi = np.minimum(np.searchsorted(cumulate_classi, rng.random(righe)), len(cumulate_classi) - 1)
+        codici[:, 0] = classi
+
+        for classe, (ordine, genitori, tabelle) in enumerate(self.modelli):
+            righe_classe = np.flatnonzero(classi == classe)
+            n = len(righe_classe)
+            if n == 0:
+                continue
+            Xc = np.empty((n, len(self.features)), dtype=np.uint8)
+            for j in ordine:
+                cumulate = tabelle[j]
+                if genitori[j] < 0:
+                    # la radice ha una sola riga di probabilità
+                    Xc[:, j] = np.minimum(np.searchsorted(cumulate[0], rng.random(n)), cumulate.shape[1] - 1)
+                else:
+                    Xc[:, j] = _campiona(cumulate[Xc[:, genitori[j]]], rng.random(n))
+            codici[righe_classe, 1:] = Xc
+
+        return codici
+
+    def genera_blocchi(self, righe, seed=0, righe_blocco=100_000):
+        """
+        Genera 'righe' righe a blocchi di al massimo 'righe_blocco', come DataFrame categorici.
+        """
+        rng = np.random.default_rng(seed)
+        colonne = [self.colonna_target] + self.features
+        tipi = {c: pd.CategoricalDtype(self.categorie[c]) for c in colonne}
+
+        generate = 0
+        while generate < righe:
+            n = min(righe_blocco, righe - generate)
+            codici = self.campiona(n, rng)
+            yield pd.DataFrame({c: pd.Categorical.from_codes(codici[:, i], dtype=tipi[c])
+                                for i, c in enumerate(colonne)})
+            generate += n
+
+    def scrivi(self, output_path, righe, seed=0, righe_blocco=100_000):
+        """
+        Scrive 'righe' righe sintetiche in 'output_path' (CSV, oppure Parquet se l'estensione è '.parquet').
+        Con 'righe=0' il file contiene solo l'intestazione (o lo schema Parquet).
+        """
+        if righe < 0:
+            raise ValueError(f"Il numero di righe non può essere negativo ({righe}).")
+
+        parquet = output_path.endswith('.parquet')
+        writer = None
+        temporaneo = f"{output_path}.{os.getpid()}.tmp"
+
+        def scrivi_blocco(blocco, primo):
+            nonlocal writer
+            if parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                tabella = pa.Table.from_pandas(blocco, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(temporaneo, tabella.schema)
+                writer.write_table(tabella)
+            else:
+                blocco.to_csv(temporaneo, mode='w' if primo else 'a', header=primo, index=False)
+
+        try:
+            scritti = 0
+            for blocco in self.genera_blocchi(righe, seed, righe_blocco):
+                scrivi_blocco(blocco, scritti == 0)
+                scritti += 1
+            if scritti == 0:
+                # nessuna riga: un blocco vuoto con le stesse colonne (e categorie)
+                colonne = [self.colonna_target] + self.features
+                scrivi_blocco(pd.DataFrame({c: pd.Categorical([], categories=self.categorie[c]) for c in colonne}), True)
+            if writer is not None:
+                writer.close()
+                writer = None
+            os.replace(temporaneo, output_path)
+        except BaseException:
+            # un file a metà non deve restare accanto all'output
+            if writer is not None:
+                writer.close()
+            if os.path.exists(temporaneo):
+                os.remove(temporaneo)
+            raise
+        return output_path
+
+
+def genera_dataset(output_path, righe, seed=0, sorgente=CSV_DEFAULT, righe_blocco=100_000):
+    """
+    Adatta il generatore a 'sorgente' e scrive 'righe' righe sintetiche in 'output_path'.
+    """
+    generatore = GeneratoreFunghi().adatta(leggi_dataset(sorgente))
+    return generatore.scrivi(output_path, righe, seed, righe_blocco)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un dataset sintetico di funghi di qualsiasi dimensione.")
+    parser.add_argument('output', help="File di output: '.csv' oppure '.parquet'.")
+    parser.add_argument('--righe', type=int, required=True, help="Numero di righe da generare.")
+    parser.add_argument('--seed', type=int, default=0, help="Seme per la riproducibilità.")
+    parser.add_argument('--sorgente', default=CSV_DEFAULT, help="Dataset da cui apprendere la distribuzione.")
+    parser.add_argument('--righe-blocco', type=int, default=100_000, help="Righe generate e scritte per ogni blocco.")
+    args = parser.parse_args()
+    if args.righe < 0:
+        parser.error("--righe non può essere negativo")
+
+    inizio = time.perf_counter()
+    genera_dataset(args.output, args.righe, args.seed, args.sorgente, args.righe_blocco)
+    durata = time.perf_counter() - inizio
+    print(f"SUCCESSO: {args.righe:,} righe scritte in '{args.output}' in {durata:.1f} s "
+          f"({args.righe / durata:,.0f} righe/sec).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Watchdog della reattività del ciclo degli eventi di Tk.
+
+Ogni 'intervallo_ms' il watchdog programma un callback con 'after' e, quando questo parte,
+confronta l'istante previsto con quello reale: il ritardo è il tempo in cui la finestra
+è rimasta bloccata (addestramento, grafici, calcoli lunghi eseguiti nel thread principale).
+
+Ogni callback di Tk (pulsanti, eventi, 'after') viene cronometrato: quando un ritardo supera
+la soglia viene registrato un blocco con il callback che ha occupato di più quell'intervallo.
+Alla chiusura della finestra principale viene salvato un JSON con istogramma dei ritardi,
+percentili e blocchi, e stampato un riepilogo su stderr.
+
+Si attiva con la variabile d'ambiente FUNGHI_WATCHDOG (come FUNGHI_TRACCIA per
+'pipeline_trace.py'):
+    FUNGHI_WATCHDOG=1 python poison_analysis/poison_tester_gui.py          -> watchdog_tk.json
+    FUNGHI_WATCHDOG=/tmp/gui.json python visualization/VisualKmodesCSV.py  -> /tmp/gui.json
+Con FUNGHI_WATCHDOG_SOGLIA_MS si cambia la soglia dei blocchi (default 100 ms).
+"""
+import atexit
+import bisect
+import json
+import os
+import sys
+import time
+import tkinter
+from array import array
+
+VARIABILE_AMBIENTE = "FUNGHI_WATCHDOG"
+FILE_DEFAULT = "watchdog_tk.json"
+
+# periodo del callback di controllo e ritardo oltre il quale la finestra è considerata bloccata
+INTERVALLO_MS = 50
+SOGLIA_MS = 100
+
+# limiti superiori (ms) delle classi dell'istogramma dei ritardi; l'ultima classe è "oltre"
+LIMITI_ISTOGRAMMA_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# blocchi conservati nel dettaglio (gli altri vengono solo contati)
+MAX_BLOCCHI = 500
+
+
+def _funzione_reale(funzione):
+    """
+    'after' avvolge la funzione in una chiusura ('callit'): si restituisce quella vera.
+    """
+    codice = getattr(funzione, '__code__', None)
+    if codice is not None and 'func' in codice.co_freevars and funzione.__closure__:
+        return funzione.__closure__[codice.co_freevars.index('func')].cell_contents
+    return funzione
+
+
+def nome_callback(funzione):
+    """
+    Nome leggibile di un callback di Tk; le lambda e le funzioni locali riportano file e riga.
+    """
+    funzione = _funzione_reale(funzione)
+    nome = getattr(funzione, '__qualname__', None) or type(funzione).__qualname__
+    codice = getattr(funzione, '__code__', None) or getattr(getattr(funzione, '__func__', None), '__code__', None)
+    if codice is not None and (nome.endswith('<lambda>') or '<locals>' in nome):
+        nome = f"{nome} ({os.path.basename(codice.co_filename)}:{codice.co_firstlineno})"
+    return nome
+
+
+class WatchdogTk:
+
+    def __init__(self, root, intervallo_ms=INTERVALLO_MS, soglia_ms=SOGLIA_MS, output_path=None, nome=None):
+        """
+        'root': finestra principale (il salvataggio avviene alla sua distruzione);
+        'output_path': file JSON del rapporto (None = nessun file, solo 'rapporto()');
+        'nome': etichetta dell'applicazione nel rapporto.
+        """
+        self.root = root
+        self.intervallo_ms = intervallo_ms
+        self.soglia_ms = soglia_ms
+        self.output_path = output_path
+        self.nome = nome or getattr(root, 'title', lambda: "")() or "tk"
+
+        self.ritardi = array('d')
+        self.istogramma = [0] * (len(LIMITI_ISTOGRAMMA_MS) + 1)
+        self.blocchi = []
+        self.n_blocchi = 0
+
+        # callback lunghi completati dall'ultimo controllo: (inizio, fine, funzione)
+        self._callback_recenti = []
+        self._previsto = None
+        self._id_after = None
+        self._inizio = None
+        self._call_originale = None
+        self.attivo = False
+        self.salvato = False
+
+    # --- misura dei callback ---
+
+    def _installa_cronometro(self):
+        """
+        Cronometra ogni callback di Tk sostituendo 'CallWrapper.__call__', il punto da cui
+        passano pulsanti, 'bind' e 'after'.
+        """
+        originale = tkinter.CallWrapper.__call__
+        watchdog = self
+
+        def chiamata_cronometrata(wrapper, *args):
+            # il callback di controllo del watchdog non si misura
+            if _funzione_reale(wrapper.func) == watchdog._tick:
+                return originale(wrapper, *args)
+            inizio = time.perf_counter()
+            try:
+                return originale(wrapper, *args)
+            finally:
+                fine = time.perf_counter()
+                # solo i callback non trascurabili possono spiegare un blocco
+                if (fine - inizio) * 1000 >= watchdog.soglia_ms / 4:
+                    watchdog._callback_recenti.append((inizio, fine, wrapper.func))
+
+        self._call_originale = originale
+        tkinter.CallWrapper.__call__ = chiamata_cronometrata
+
+    def _rimuovi_cronometro(self):
+        if self._call_originale is not None:
+            tkinter.CallWrapper.__call__ = self._call_originale
+            self._call_originale = None
+
+    def _colpevole(self, inizio, fine):
+        """
+        Callback che si sovrappone di più all'intervallo bloccato; a parità il più interno
+        (iniziato per ultimo), così un dialogo modale non viene incolpato dei callback annidati.
+        """
+        migliore, chiave_migliore = None, None
+        for c_inizio, c_fine, funzione in self._callback_recenti:
+            sovrapposizione = min(c_fine, fine) - max(c_inizio, inizio)
+            chiave = (sovrapposizione, c_inizio)
+            if sovrapposizione > 0 and (chiave_migliore is None or chiave > chiave_migliore):
+                migliore, chiave_migliore = (c_fine - c_inizio, funzione), chiave
+        return migliore
+
+    # --- ciclo di controllo ---
+
+    def _programma(self):
+        self._previsto = time.perf_counter() + self.intervallo_ms / 1000
+        self._id_after = self.root.after(self.intervallo_ms, self._tick)
+
+    def _tick(self):
+        adesso = time.perf_counter()
+        ritardo_ms = max(0.0, (adesso - self._previsto) * 1000)
+        self.ritardi.append(ritardo_ms)
+        self.istogramma[bisect.bisect_left(LIMITI_ISTOGRAMMA_MS, ritardo_ms)] += 1
+
+        if ritardo_ms >= self.soglia_ms:
+            self.n_blocchi += 1
+            if len(self.blocchi) < MAX_BLOCCHI:
+                colpevole = self._colpevole(self._previsto, adesso)
+                self.blocchi.append({
+                    'istante_s': round(self._previsto - self._inizio, 3),
+                    'ritardo_ms': round(ritardo_ms, 1),
+                    'callback': nome_callback(colpevole[1]) if colpevole else None,
+                    'durata_callback_ms': round(colpevole[0] * 1000, 1) if colpevole else None,
+                })
+        self._callback_recenti.clear()
+
+        if self.attivo:
+            self._programma()
+
+    def avvia(self):
+        if self.attivo:
+            return self
+        self.attivo = True
+        self._inizio = time.perf_counter()
+        self._installa_cronometro()
+        self._programma()
+
+        # il rapporto si salva quando la finestra principale viene distrutta (anche con 'Esci')
+        def alla_distruzione(event):
+            if event.widget is self.root:
+                self.ferma()
+                self.salva()
+        self.root.bind('<Destroy>', alla_distruzione, add='+')
+        # ... oppure all'uscita dell'interprete, se la finestra non è mai stata distrutta
+        atexit.register(self.salva)
+        return self
+
+    def ferma(self):
+        if not self.attivo:
+            return
+        self.attivo = False
+        self._rimuovi_cronometro()
+        if self._id_after is not None:
+            try:
+                self.root.after_cancel(self._id_after)
+            except tkinter.TclError:
+                # la finestra è già stata distrutta insieme ai suoi timer
+                pass
+            self._id_after = None
+
+    # --- rapporto ---
+
+    def percentile(self, p):
+        if not self.ritardi:
+            return 0.0
+        ordinati = sorted(self.ritardi)
+        return ordinati[min(len(ordinati) - 1, int(round(p / 100 * (len(ordinati) - 1))))]
+
+    def rapporto(self):
+        durata = (time.perf_counter() - self._inizio) if self._inizio is not None else 0.0
+        limiti = [f"<= {l} ms" for l in LIMITI_ISTOGRAMMA_MS] + [f"> {LIMITI_ISTOGRAMMA_MS[-1]} ms"]
+        return {
+            'applicazione': self.nome,
+            'intervallo_ms': self.intervallo_ms,
+            'soglia_ms': self.soglia_ms,
+            'durata_s': round(durata, 3),
+            'campioni': len(self.ritardi),
+            'ritardo_ms': {
+                'p50': round(self.percentile(50), 2),
+                'p95': round(self.percentile(95), 2),
+                'p99': round(self.percentile(99), 2),
+                'massimo': round(max(self.ritardi, default=0.0), 2),
+                # tempo complessivo con la finestra bloccata oltre la soglia
+                'totale_bloccato': round(sum(r for r in self.ritardi if r >= self.soglia_ms), 1),
+            },
+            'istogramma': [{'classe': c, 'conteggio': n} for c, n in zip(limiti, self.istogramma)],
+            'n_blocchi': self.n_blocchi,
+            'blocchi': self.blocchi,
+        }
+
+    def riepilogo(self, rapporto=None):
+        r = rapporto or self.rapporto()
+        righe = [f"Watchdog Tk '{r['applicazione']}': {r['campioni']} controlli in {r['durata_s']:.1f} s, "
+                 f"ritardo p50 {r['ritardo_ms']['p50']:.1f} ms, p99 {r['ritardo_ms']['p99']:.1f} ms, "
+                 f"massimo {r['ritardo_ms']['massimo']:.0f} ms",
+                 f"Blocchi oltre {r['soglia_ms']:g} ms: {r['n_blocchi']} ({r['ritardo_ms']['totale_bloccato']:.0f} ms in totale)"]
+        for blocco in sorted(r['blocchi'], key=lambda b: -b['ritardo_ms'])[:10]:
+            righe.append(f"  {blocco['ritardo_ms']:>8.0f} ms a {blocco['istante_s']:>7.1f} s  {blocco['callback'] or '(nessun callback Python)'}")
+        return "\n".join(righe) + "\n"
+
+    def salva(self, output_path=None):
+        """
+        Scrive il rapporto JSON (una volta sola) e stampa il riepilogo su stderr.
+        """
+        output_path = output_path or self.output_path
+        if self.salvato or not self.ritardi:
+            return
+        self.salvato = True
+        rapporto = self.rapporto()
+        sys.stderr.write(self.riepilogo(rapporto))
+        if output_path is None:
+            return
+        temporaneo = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            with open(temporaneo, 'w', encoding='utf-8') as f:
+                json.dump(rapporto, f, indent=2)
+            os.replace(temporaneo, output_path)
+            sys.stderr.write(f"Rapporto del watchdog salvato in: {output_path}\n")
+        except OSError as e:
+            sys.stderr.write(f"ATTENZIONE: Impossibile salvare il rapporto del watchdog in '{output_path}': {e}\n")
+
+
+def installa_da_ambiente(root, nome=None):
+    """
+    Avvia un 'WatchdogTk' su 'root' se FUNGHI_WATCHDOG è impostata, altrimenti non fa nulla.
+    Restituisce il watchdog oppure None.
+    """
+    valore = os.environ.get(VARIABILE_AMBIENTE, "").strip()
+    if valore.lower() in ("", "0", "false", "no"):
+        return None
+    percorso = valore if valore.lower().endswith('.json') else FILE_DEFAULT
+    try:
+        soglia = float(os.environ.get("FUNGHI_WATCHDOG_SOGLIA_MS", SOGLIA_MS))
+    except ValueError:
+        soglia = SOGLIA_MS
+    return WatchdogTk(root, soglia_ms=soglia, output_path=os.path.abspath(percorso), nome=nome).avvia()
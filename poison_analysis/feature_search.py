@@ -0,0 +1,345 @@
+"""
+Ricerca automatica del sottoinsieme di feature per il classificatore.
+
+Ogni sottoinsieme candidato viene valutato con tabelle di conteggio vettorizzate: le righe
+vengono raggruppate per combinazione di valori delle feature scelte (una chiave intera in
+base mista) e per ogni combinazione si contano commestibili e velenosi. Dai conteggi si
+ricavano, senza addestrare alcun modello:
+  - entropia condizionale H(classe | feature) e informazione mutua;
+  - accuratezza e falsi negativi del modello a tabella (classe più frequente per combinazione);
+  - errore del modello a tabella "zero falsi negativi" (velenoso se la combinazione ha
+    almeno un velenoso), cioè quanti commestibili verrebbero scartati per prudenza;
+  - costo di inferenza previsto: dimensione della tabella delle predizioni precalcolate.
+Con '--holdout' le metriche sono misurate su una parte dei dati esclusa dai conteggi.
+
+Strategie di ricerca: greedy in avanti, greedy all'indietro e beam search. I candidati di
+ogni passo vengono valutati in parallelo da un pool di processi che leggono la matrice dei
+codici in memory-map dal caricatore condiviso.
+
+Uso:
+    python feature_search.py --strategia tutte --max-feature 7
+    python feature_search.py --strategia beam --criterio errore_zero_fn --holdout 0.3 --output ricerca.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from poison_model import FEATURES_INPUT, MAX_COMBINAZIONI_TABELLA
+from test_stats import FEATURES_VALUTAZIONE
+
+# Il caricatore condiviso del dataset vive nella cartella 'data' del progetto.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'data'))
+if DATA_DIR not in sys.path:
+    sys.path.append(DATA_DIR)
+
+from mushroom_data import carica_codici, risolvi_dataset
+
+# il CSV accanto allo script se c'è, altrimenti la copia canonica in 'data/'
+CSV_DEFAULT = risolvi_dataset(os.path.join(SCRIPT_DIR, 'mushrooms.csv'))
+
+# criteri di ordinamento (valori più bassi = sottoinsieme migliore)
+CRITERI = ['entropia', 'errore', 'errore_zero_fn']
+STRATEGIE = ['avanti', 'indietro', 'beam']
+
+# dati del processo worker, caricati una volta sola da '_inizializza_worker'
+_dati = None
+
+
+class DatiRicerca:
+    """
+    Matrice dei codici, target e (opzionale) divisione tra righe di conteggio e di verifica.
+    """
+
+    def __init__(self, csv_path, holdout=0.0, seed=0):
+        dataset = carica_codici(csv_path)
+        self.features = [c for c in dataset.colonne if c != 'poisonous']
+        self.X = dataset.seleziona(self.features)
+        self.y = np.asarray(dataset.colonna('poisonous')).astype(np.int64)
+        self.n_categorie = np.array([len(dataset.categorie[f]) for f in self.features], dtype=np.int64)
+        # codice della classe velenosa (le categorie sono ordinate: 'e' -> 0, 'p' -> 1)
+        self.velenoso = int(np.searchsorted(dataset.categorie['poisonous'], 'p'))
+
+        self.test = None
+        if holdout > 0:
+            rng = np.random.default_rng(seed)
+            permutazione = rng.permutation(len(self.y))
+            n_test = int(round(len(self.y) * holdout))
+            self.test = np.sort(permutazione[:n_test])
+            self.train = np.sort(permutazione[n_test:])
+        else:
+            self.train = np.arange(len(self.y))
+
+
+def _inizializza_worker(csv_path, holdout, seed):
+    global _dati
+    _dati = DatiRicerca(csv_path, holdout, seed)
+
+
+def chiavi_combinazioni(X, colonne, n_categorie):
+    """
+    Chiave intera della combinazione di valori di 'colonne' per ogni riga. Se il prodotto
+    delle categorie supera gli interi a 64 bit, le chiavi vengono compattate con 'np.unique'.
+    """
+    chiavi = np.zeros(X.shape[0], dtype=np.int64)
+    base = 1
+    for j in colonne:
+        if base * int(n_categorie[j]) >= 2 ** 62:
+            uniche, chiavi = np.unique(chiavi, return_inverse=True)
+            base = len(uniche)
+        chiavi = chiavi * n_categorie[j] + X[:, j]
+        base *= int(n_categorie[j])
+    return chiavi
+
+
+def _entropia(conteggi):
+    totali = conteggi.sum(axis=1, keepdims=True)
+    p = np.divide(conteggi, totali, out=np.zeros(conteggi.shape), where=totali > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        termini = np.where(p > 0, -p * np.log2(p), 0.0)
+    return termini.sum(axis=1)
+
+
+def valuta_sottoinsieme(dati, colonne):
+    """
+    Metriche del modello a tabella indotto dalle feature 'colonne' (indici nella matrice).
+    """
+    colonne = list(colonne)
+    chiavi = chiavi_combinazioni(dati.X, colonne, dati.n_categorie)
+    y = dati.y
+    velenoso = dati.velenoso
+
+    # tabella di conteggio (combinazione osservata x classe) sulle righe di addestramento
+    uniche, inverse = np.unique(chiavi[dati.train], return_inverse=True)
+    conteggi = np.bincount(inverse * 2 + y[dati.train], minlength=2 * len(uniche)).reshape(-1, 2).astype(np.float64)
+    n_train = len(dati.train)
+
+    entropia_condizionale = float((conteggi.sum(axis=1) / n_train * _entropia(conteggi)).sum())
+    p_classi = np.bincount(y[dati.train], minlength=2) / n_train
+    entropia_classe = float(_entropia(p_classi[None, :])[0])
+
+    # classe più frequente per combinazione (a parità si sceglie velenoso, per prudenza)
+    maggioranza = np.where(conteggi[:, velenoso] >= conteggi[:, 1 - velenoso], velenoso, 1 - velenoso)
+    # modello prudente: velenoso appena la combinazione contiene almeno un velenoso
+    prudente = np.where(conteggi[:, velenoso] > 0, velenoso, 1 - velenoso)
+
+    if dati.test is None:
+        righe, indici = y[dati.train], inverse
+        pred_maggioranza, pred_prudente = maggioranza[indici], prudente[indici]
+    else:
+        # combinazioni mai viste nei conteggi: si predice velenoso
+        righe = y[dati.test]
+        chiavi_test = chiavi[dati.test]
+        posizioni = np.minimum(np.searchsorted(uniche, chiavi_test), len(uniche) - 1)
+        note = uniche[posizioni] == chiavi_test
+        pred_maggioranza = np.where(note, maggioranza[posizioni], velenoso)
+        pred_prudente = np.where(note, prudente[posizioni], velenoso)
+
+    dimensione_tabella = int(np.prod([int(dati.n_categorie[j]) for j in colonne], dtype=object)) if colonne else 1
+    return {
+        'features': [dati.features[j] for j in colonne],
+        'indici': colonne,
+        'n_features': len(colonne),
+        'entropia': entropia_condizionale,
+        'informazione_mutua': entropia_classe - entropia_condizionale,
+        'accuratezza': float(np.mean(pred_maggioranza == righe)),
+        'errore': float(np.mean(pred_maggioranza != righe)),
+        'falsi_negativi': int(np.sum((righe == velenoso) & (pred_maggioranza != velenoso))),
+        'errore_zero_fn': float(np.mean(pred_prudente != righe)),
+        'falsi_negativi_zero_fn': int(np.sum((righe == velenoso) & (pred_prudente != velenoso))),
+        'combinazioni_osservate': len(uniche),
+        # costo di inferenza previsto: byte della tabella uint8 delle predizioni precalcolate
+        'dimensione_tabella': dimensione_tabella,
+        'tabella_possibile': dimensione_tabella <= MAX_COMBINAZIONI_TABELLA,
+    }
+
+
+def _valuta_worker(colonne):
+    return valuta_sottoinsieme(_dati, colonne)
+
+
+class RicercaFeature:
+
+    def __init__(self, csv_path=CSV_DEFAULT, criterio='entropia', holdout=0.0, seed=0, processi=None):
+        if criterio not in CRITERI:
+            raise ValueError(f"Criterio non valido: '{criterio}'. Valori ammessi: {CRITERI}")
+        self.csv_path = csv_path
+        self.criterio = criterio
+        self.holdout = holdout
+        self.seed = seed
+        self.processi = processi or os.cpu_count() or 1
+
+        # crea la cache '.npy' dei codici prima di avviare i worker
+        self.dati = DatiRicerca(csv_path, holdout, seed)
+        self.features = self.dati.features
+        # risultati già calcolati, per non valutare due volte lo stesso sottoinsieme
+        self.valutati = {}
+        self._pool = None
+
+    def __enter__(self):
+        if self.processi > 1:
+            self._pool = ProcessPoolExecutor(self.processi, initializer=_inizializza_worker,
+                                             initargs=(self.csv_path, self.holdout, self.seed))
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _punteggio(self, risultato):
+        # a parità di criterio vince la tabella più piccola, poi il sottoinsieme più corto
+        # (gli indici rendono l'ordine deterministico anche tra sottoinsiemi equivalenti)
+        return risultato[self.criterio], risultato['dimensione_tabella'], risultato['n_features'], risultato['indici']
+
+    def valuta(self, candidati):
+        """
+        Valuta (in parallelo se c'è un pool) i sottoinsiemi non ancora valutati e restituisce
+        i risultati di tutti i candidati, dal migliore al peggiore.
+        """
+        candidati = [tuple(sorted(c)) for c in candidati]
+        nuovi = list(dict.fromkeys(c for c in candidati if c not in self.valutati))
+        if nuovi:
+            if self._pool is not None:
+                blocco = max(1, len(nuovi) // (self.processi * 4))
+                risultati = self._pool.map(_valuta_worker, nuovi, chunksize=blocco)
+            else:
+                risultati = (valuta_sottoinsieme(self.dati, c) for c in nuovi)
+            for c, r in zip(nuovi, risultati):
+                self.valutati[c] = r
+        return sorted((self.valutati[c] for c in set(candidati)), key=self._punteggio)
+
+    def avanti(self, max_features):
+        """
+        Greedy in avanti: a ogni passo aggiunge la feature che migliora di più il criterio.
+        """
+        scelte = ()
+        percorso = []
+        for _ in range(min(max_features, len(self.features))):
+            candidati = [scelte + (j,) for j in range(len(self.features)) if j not in scelte]
+            migliore = self.valuta(candidati)[0]
+            scelte = tuple(migliore['indici'])
+            percorso.append(migliore)
+        return percorso
+
+    def indietro(self, min_features=1):
+        """
+        Greedy all'indietro: parte da tutte le feature e toglie quella la cui assenza pesa meno.
+        """
+        scelte = tuple(range(len(self.features)))
+        percorso = self.valuta([scelte])
+        while len(scelte) > min_features:
+            candidati = [tuple(j for j in scelte if j != rimossa) for rimossa in scelte]
+            migliore = self.valuta(candidati)[0]
+            scelte = tuple(migliore['indici'])
+            percorso.append(migliore)
+        return percorso
+
+    def beam(self, max_features, larghezza=5):
+        """
+        Beam search: a ogni livello espande i 'larghezza' sottoinsiemi migliori con una feature in più.
+        """
+        fascio = [()]
+        percorso = []
+        for _ in range(min(max_features, len(self.features))):
+            candidati = {tuple(sorted(s + (j,))) for s in fascio for j in range(len(self.features)) if j not in s}
+            classifica = self.valuta(candidati)[:larghezza]
+            fascio = [tuple(r['indici']) for r in classifica]
+            percorso.append(classifica[0])
+        return percorso
+
+    def valuta_nomi(self, nomi):
+        return self.valuta([[self.features.index(n) for n in nomi]])[0]
+
+    def classifica(self, top=None):
+        """
+        Tutti i sottoinsiemi valutati finora, dal migliore al peggiore.
+        """
+        ordinati = sorted(self.valutati.values(), key=self._punteggio)
+        return ordinati[:top] if top else ordinati
+
+
+def cerca_feature(csv_path=CSV_DEFAULT, strategie=('avanti', 'indietro', 'beam'), criterio='entropia',
+                  max_features=7, larghezza_beam=5, holdout=0.0, seed=0, processi=None, top=10):
+    """
+    Esegue le strategie richieste e restituisce un dict con i percorsi di ogni strategia,
+    la classifica dei sottoinsiemi migliori e, per confronto, i sottoinsiemi usati oggi.
+    """
+    inizio = time.perf_counter()
+    with RicercaFeature(csv_path, criterio, holdout, seed, processi) as ricerca:
+        percorsi = {}
+        if 'avanti' in strategie:
+            percorsi['avanti'] = ricerca.avanti(max_features)
+        if 'indietro' in strategie:
+            percorsi['indietro'] = ricerca.indietro()
+        if 'beam' in strategie:
+            percorsi['beam'] = ricerca.beam(max_features, larghezza_beam)
+
+        attuali = {
+            'modello (poison_model.FEATURES_INPUT)': ricerca.valuta_nomi(FEATURES_INPUT),
+            'valutazione (test_stats.FEATURES_VALUTAZIONE)': ricerca.valuta_nomi(FEATURES_VALUTAZIONE),
+        }
+        classifica = [r for r in ricerca.classifica() if r['n_features'] <= max_features][:top]
+
+        return {
+            'parametri': {'csv_path': os.path.abspath(csv_path), 'criterio': criterio, 'max_features': max_features,
+                          'larghezza_beam': larghezza_beam, 'holdout': holdout, 'seed': seed,
+                          'processi': ricerca.processi},
+            'percorsi': percorsi,
+            'classifica': classifica,
+            'attuali': attuali,
+            'sottoinsiemi_valutati': len(ricerca.valutati),
+            'tempo_totale': time.perf_counter() - inizio,
+        }
+
+
+def _riga(r):
+    return (f"{r['n_features']:>2} | {r['entropia']:.4f} | {r['accuratezza'] * 100:6.2f}% | {r['falsi_negativi']:>5} | "
+            f"{r['errore_zero_fn'] * 100:6.2f}% | {r['dimensione_tabella']:>12,} | {', '.join(r['features'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ricerca del sottoinsieme di feature migliore per il classificatore.")
+    parser.add_argument('--csv', default=CSV_DEFAULT, help="Dataset su cui valutare i sottoinsiemi.")
+    parser.add_argument('--strategia', choices=STRATEGIE + ['tutte'], default='tutte')
+    parser.add_argument('--criterio', choices=CRITERI, default='entropia',
+                        help="Metrica da minimizzare: entropia condizionale, errore del modello a tabella, "
+                             "oppure errore con zero falsi negativi.")
+    parser.add_argument('--max-feature', type=int, default=7, help="Numero massimo di feature per sottoinsieme.")
+    parser.add_argument('--larghezza-beam', type=int, default=5)
+    parser.add_argument('--holdout', type=float, default=0.0,
+                        help="Frazione di righe esclusa dai conteggi e usata per misurare le metriche (es. 0.3).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processi', type=int, default=None, help="Numero di processi worker (default: tutti i core).")
+    parser.add_argument('--top', type=int, default=10, help="Quanti sottoinsiemi mostrare in classifica.")
+    parser.add_argument('--output', help="Salva i risultati completi in questo file JSON.")
+    args = parser.parse_args()
+
+    strategie = STRATEGIE if args.strategia == 'tutte' else [args.strategia]
+    risultati = cerca_feature(args.csv, strategie, args.criterio, args.max_feature, args.larghezza_beam,
+                              args.holdout, args.seed, args.processi, args.top)
+
+    intestazione = " n | H(y|S) | accur.  |  FN   | err.0FN | tabella (B)  | feature"
+    print(f"\nClassifica per '{args.criterio}' ({risultati['sottoinsiemi_valutati']} sottoinsiemi valutati "
+          f"in {risultati['tempo_totale']:.2f} s):")
+    print(intestazione)
+    for r in risultati['classifica']:
+        print(_riga(r))
+
+    print("\nSottoinsiemi usati oggi:")
+    for nome, r in risultati['attuali'].items():
+        print(f"{nome}:\n{_riga(r)}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(risultati, f, indent=2)
+        print(f"\nRisultati salvati in: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
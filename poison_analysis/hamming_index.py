@@ -0,0 +1,204 @@
+"""
+Indice dei funghi più simili (distanza di Hamming su vettori one-hot compressi a bit).
+
+Ogni esemplare distinto diventa un vettore one-hot (un bit per ogni categoria di ogni
+feature) impacchettato in parole da 64 bit. La distanza tra due esemplari, cioè il numero
+di feature con valore diverso, è metà del popcount dello XOR dei loro vettori:
+    differenze = popcount(esemplare XOR richiesta) / 2
+Le feature mancanti o con un valore mai visto vengono semplicemente escluse con una
+maschera di bit, così la ricerca funziona anche su input parziali.
+
+Gli esemplari identici vengono fusi in una sola voce con i conteggi per classe: la scansione
+riguarda le combinazioni distinte, non le righe, e i voti dei vicini pesano quanti esemplari
+rappresentano.
+
+Uso:
+    python hamming_index.py odor=n cap-color=w gill-color=k -k 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# popcount nativo (NumPy >= 2.0) oppure tabella dei bit per byte
+if hasattr(np, 'bitwise_count'):
+    def _popcount(parole):
+        return np.bitwise_count(parole)
+else:
+    _BIT_PER_BYTE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(parole):
+        return _BIT_PER_BYTE[parole.view(np.uint8)].reshape(parole.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+class IndiceHamming:
+
+    def __init__(self, codici, conteggi_classi, categorie, classi):
+        """
+        'codici': combinazioni distinte (righe x feature) di codici interi;
+        'conteggi_classi': esemplari per classe di ogni combinazione (righe x classi);
+        'categorie': dict feature -> array ordinato delle categorie (il codice è l'indice);
+        'classi': etichette delle classi (es. ['e', 'p']).
+        """
+        self.features = list(categorie)
+        self.categorie = {f: np.asarray(v).astype(str) for f, v in categorie.items()}
+        self.classi = np.asarray(classi).astype(str)
+        self.codici = np.ascontiguousarray(codici, dtype=np.int64)
+        self.conteggi = np.asarray(conteggi_classi, dtype=np.int64)
+        self.totali = self.conteggi.sum(axis=1)
+
+        n_categorie = [len(self.categorie[f]) for f in self.features]
+        self.offset = np.concatenate([[0], np.cumsum(n_categorie)]).astype(np.int64)
+        self.n_parole = max(1, -(-int(self.offset[-1]) // 64))
+
+        # bit[parola, esemplare]: ogni parola è contigua, così la scansione procede a parole
+        n = len(self.codici)
+        self.bit = np.zeros((self.n_parole, n), dtype=np.uint64)
+        for j in range(len(self.features)):
+            posizioni = self.offset[j] + self.codici[:, j]
+            parole, bit = posizioni // 64, (posizioni % 64).astype(np.uint64)
+            for p in np.unique(parole):
+                selezione = parole == p
+                self.bit[p, selezione] |= np.left_shift(np.uint64(1), bit[selezione])
+
+    @classmethod
+    def da_codici(cls, codici, etichette, categorie, classi):
+        """
+        Indice di tutte le righe di una matrice di codici, con gli esemplari identici fusi.
+        """
+        codici = np.ascontiguousarray(codici)
+        etichette = np.asarray(etichette).astype(np.int64)
+        # ogni riga vista come un unico valore di byte: molto più veloce di 'np.unique(axis=0)'
+        righe = codici.view(np.dtype((np.void, codici.dtype.itemsize * codici.shape[1]))).ravel()
+        distinte, inverse = np.unique(righe, return_inverse=True)
+        distinte = distinte.view(codici.dtype).reshape(-1, codici.shape[1])
+        n_classi = len(classi)
+        conteggi = np.bincount(inverse.ravel() * n_classi + etichette,
+                               minlength=len(distinte) * n_classi).reshape(-1, n_classi)
+        return cls(distinte, conteggi, categorie, classi)
+
+    @classmethod
+    def da_conteggi(cls, conteggi, categorie, classi):
+        """
+        Indice delle combinazioni osservate di una tabella di conteggi in base mista
+        (es. 'MushroomClassifier.conteggi').
+        """
+        dimensioni = [len(v) for v in categorie.values()]
+        osservate = np.flatnonzero(conteggi.sum(axis=1))
+        codici = np.stack(np.unravel_index(osservate, dimensioni), axis=1)
+        return cls(codici, conteggi[osservate], categorie, classi)
+
+    def codifica_richiesta(self, features_dict):
+        """
+        Codici della richiesta (-1 per le feature mancanti o con valori mai visti) e nomi
+        delle feature ignorate.
+        """
+        codici = np.full(len(self.features), -1, dtype=np.int64)
+        ignorate = []
+        for j, f in enumerate(self.features):
+            valore = features_dict.get(f)
+            categorie = self.categorie[f]
+            posizione = np.searchsorted(categorie, str(valore)) if valore is not None else len(categorie)
+            if posizione < len(categorie) and categorie[posizione] == str(valore):
+                codici[j] = posizione
+            else:
+                ignorate.append(f)
+        return codici, ignorate
+
+    def distanze(self, codici_richiesta):
+        """
+        Numero di feature diverse tra la richiesta e ogni esemplare, contando solo le feature note.
+        """
+        richiesta = np.zeros(self.n_parole, dtype=np.uint64)
+        maschera = np.zeros(self.n_parole, dtype=np.uint64)
+        for j, codice in enumerate(codici_richiesta):
+            if codice < 0:
+                continue
+            posizione = int(self.offset[j] + codice)
+            richiesta[posizione // 64] |= np.uint64(1) << np.uint64(posizione % 64)
+            # la maschera contiene tutti i bit della feature, così conta anche il bit dell'esemplare
+            for p in range(int(self.offset[j]), int(self.offset[j + 1])):
+                maschera[p // 64] |= np.uint64(1) << np.uint64(p % 64)
+
+        bit_diversi = np.zeros(self.bit.shape[1], dtype=np.uint16)
+        for p in np.flatnonzero(maschera):
+            bit_diversi += _popcount((self.bit[p] & maschera[p]) ^ richiesta[p])
+        return bit_diversi // 2
+
+    def cerca(self, features_dict, k=5):
+        """
+        I 'k' esemplari distinti più vicini alla richiesta (a parità di distanza prima i più
+        frequenti) e i voti per classe. Votano tutti gli esemplari alla distanza del k-esimo
+        o meno, così i pareggi non dipendono dall'ordine dell'indice; con un pareggio dei voti
+        vince 'p' (velenoso), per prudenza.
+        """
+        codici, ignorate = self.codifica_richiesta(features_dict)
+        distanze = self.distanze(codici)
+
+        k = min(k, len(distanze))
+        soglia = np.partition(distanze, k - 1)[k - 1]
+        votanti = np.flatnonzero(distanze <= soglia)
+        # ordinamento per distanza crescente e poi per numero di esemplari decrescente
+        ordine = np.lexsort((-self.totali[votanti], distanze[votanti]))
+        vicini = votanti[ordine[:k]]
+
+        voti = self.conteggi[votanti].sum(axis=0)
+        prudente = np.flatnonzero(self.classi == 'p')
+        classe = int(np.argmax(voti))
+        if len(prudente) and voti[prudente[0]] == voti.max():
+            classe = int(prudente[0])
+
+        return {
+            'classe': str(self.classi[classe]),
+            'voti': {str(c): int(v) for c, v in zip(self.classi, voti)},
+            'feature_ignorate': ignorate,
+            'distanza_massima': int(soglia),
+            'vicini': [
+                {
+                    'valori': {f: str(self.categorie[f][self.codici[i, j]]) for j, f in enumerate(self.features)},
+                    'differenze': int(distanze[i]),
+                    'conteggi': {str(c): int(v) for c, v in zip(self.classi, self.conteggi[i])},
+                }
+                for i in vicini
+            ],
+        }
+
+
+def main():
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+    sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'data')))
+    from mushroom_data import carica_codici, risolvi_dataset
+
+    parser = argparse.ArgumentParser(description="Cerca i funghi del dataset più simili a un input (anche parziale).")
+    parser.add_argument('valori', nargs='*', help="Coppie feature=codice, es. odor=n cap-color=w")
+    parser.add_argument('-k', type=int, default=5, help="Numero di vicini.")
+    parser.add_argument('--csv', default=os.path.join(SCRIPT_DIR, 'mushrooms.csv'))
+    args = parser.parse_args()
+
+    richiesta = dict(v.split('=', 1) for v in args.valori)
+
+    inizio = time.perf_counter()
+    dataset = carica_codici(risolvi_dataset(args.csv))
+    features = [c for c in dataset.colonne if c != 'poisonous']
+    indice = IndiceHamming.da_codici(dataset.seleziona(features), dataset.colonna('poisonous'),
+                                     {f: dataset.categorie[f] for f in features}, dataset.categorie['poisonous'])
+    costruzione = time.perf_counter() - inizio
+
+    inizio = time.perf_counter()
+    risultato = indice.cerca(richiesta, args.k)
+    ricerca = time.perf_counter() - inizio
+
+    print(f"Indice di {len(dataset):,} righe ({len(indice.codici):,} esemplari distinti, {indice.n_parole} parole da 64 bit) "
+          f"costruito in {costruzione * 1000:.1f} ms; ricerca in {ricerca * 1e6:.0f} µs.")
+    if risultato['feature_ignorate']:
+        print(f"Feature ignorate (mancanti o sconosciute): {len(risultato['feature_ignorate'])}")
+    print(f"Classe votata: {risultato['classe']}  voti: {risultato['voti']}")
+    for vicino in risultato['vicini']:
+        diversi = [f for f in richiesta if vicino['valori'].get(f) != richiesta[f]]
+        print(f"  {vicino['differenze']} differenze {diversi} -> {vicino['conteggi']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Registro versionato dei modelli con sostituzione a caldo per i processi di lunga durata.
+
+Ogni versione pubblicata è un artefatto di 'MushroomClassifier' salvato in una cartella:
+    registro/
+        modello_v0001.pkl
+        modello_v0002.pkl
+        CORRENTE.json        {"versione": 2, "file": "modello_v0002.pkl", ...}
+'CORRENTE.json' indica la versione attiva e viene riscritto in modo atomico (file temporaneo
++ 'os.replace'), quindi pubblicare una versione o tornare a una precedente è un'unica rinomina.
+
+'RegistroModelli' tiene in memoria il modello attivo e, con 'avvia', controlla periodicamente
+il puntatore da un thread in background. Una nuova versione viene caricata e validata in quel
+thread; solo se è valida il riferimento al modello viene sostituito con un'unica assegnazione.
+Chi sta predicendo ha già in mano il riferimento al modello precedente e termina con quello:
+le predizioni non aspettano mai il caricamento e non serve riavviare il processo.
+
+Uso:
+    python model_registry.py pubblica --cartella registro          (addestra/carica e pubblica)
+    python model_registry.py elenca --cartella registro
+    python model_registry.py attiva 1 --cartella registro          (torna alla versione 1)
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+from poison_model import MushroomClassifier
+
+# file che indica la versione attiva del registro
+FILE_CORRENTE = "CORRENTE.json"
+
+# cartella di default del registro, accanto a questo script
+CARTELLA_REGISTRO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'registro_modelli')
+
+_MODELLO_VERSIONE = re.compile(r'modello_v(\d+)\.pkl$')
+
+
+def nome_versione(versione):
+    return f"modello_v{versione:04d}.pkl"
+
+
+def versioni_disponibili(cartella):
+    """
+    Numeri delle versioni presenti nella cartella del registro, in ordine crescente.
+    """
+    versioni = []
+    for percorso in glob.glob(os.path.join(cartella, 'modello_v*.pkl')):
+        trovato = _MODELLO_VERSIONE.search(os.path.basename(percorso))
+        if trovato:
+            versioni.append(int(trovato.group(1)))
+    return sorted(versioni)
+
+
+def leggi_corrente(cartella):
+    """
+    Contenuto di 'CORRENTE.json', oppure None se il registro non ha ancora una versione attiva.
+    """
+    try:
+        with open(os.path.join(cartella, FILE_CORRENTE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def attiva_versione(cartella, versione):
+    """
+    Rende attiva una versione già pubblicata riscrivendo il puntatore in modo atomico.
+    """
+    percorso = os.path.join(cartella, nome_versione(versione))
+    if not os.path.exists(percorso):
+        raise FileNotFoundError(f"ERRORE: La versione {versione} non esiste nel registro '{cartella}'.")
+
+    corrente = {'versione': versione, 'file': nome_versione(versione), 'attivata': time.time()}
+    destinazione = os.path.join(cartella, FILE_CORRENTE)
+    temporaneo = f"{destinazione}.{os.getpid()}.tmp"
+    with open(temporaneo, 'w', encoding='utf-8') as f:
+        json.dump(corrente, f)
+    os.replace(temporaneo, destinazione)
+    return corrente
+
+
+def pubblica(classifier, cartella=CARTELLA_REGISTRO, attiva=True):
+    """
+    Salva il modello come nuova versione del registro e (di default) la rende attiva.
+    Restituisce il numero della versione.
+    """
+    os.makedirs(cartella, exist_ok=True)
+    versioni = versioni_disponibili(cartella)
+    versione = (versioni[-1] + 1) if versioni else 1
+    percorso = os.path.join(cartella, nome_versione(versione))
+
+    # 'salva_artefatto' scrive su un file temporaneo e lo rinomina: chi osserva il registro
+    # non vede mai un artefatto a metà
+    classifier.salva_artefatto(percorso)
+    if not os.path.exists(percorso):
+        raise OSError(f"ERRORE: Impossibile pubblicare la versione {versione} in '{cartella}'.")
+
+    if attiva:
+        attiva_versione(cartella, versione)
+    return versione
+
+
+def valida_modello(classifier):
+    """
+    Controlli minimi prima di mettere in servizio un modello: predice un batch costruito
+    dalle categorie di ogni encoder e verifica che le etichette siano tra quelle note.
+    Solleva ValueError se il modello non è utilizzabile.
+    """
+    if classifier.model is None or not classifier.features_input:
+        raise ValueError("Il modello non è addestrato.")
+
+    classi = [classifier.dizionario_encoders[f].classes_ for f in classifier.features_input]
+    n = max(len(c) for c in classi)
+    # ogni categoria di ogni feature compare almeno una volta
+    campione = {f: [str(c[i % len(c)]) for i in range(n)] for f, c in zip(classifier.features_input, classi)}
+    predizioni = classifier.predict_batch(campione)
+
+    etichette = set(str(e) for e in classifier.le_target.classes_)
+    sconosciute = set(str(p) for p in predizioni) - etichette
+    if len(predizioni) != n or sconosciute:
+        raise ValueError(f"Predizioni non valide durante la validazione: {sorted(sconosciute)}")
+
+    singola = classifier.predict({f: v[0] for f, v in campione.items()})
+    if str(singola) not in etichette:
+        raise ValueError(f"Predizione singola non valida durante la validazione: {singola}")
+
+
+def verifica_compatibilita(classifier, features_input, menu_opzioni):
+    """
+    Controlla che il modello usi le stesse feature e le stesse opzioni dei menu con cui sono
+    stati costruiti i client (es. le richieste del servizio, i menu della GUI).
+    Solleva ValueError se sono diverse.
+    """
+    if list(classifier.features_input) != list(features_input):
+        raise ValueError(f"Feature diverse da quelle in uso: {list(classifier.features_input)}")
+    if classifier.menu_opzioni != menu_opzioni:
+        raise ValueError("Opzioni dei menu diverse da quelle in uso.")
+
+
+class RegistroModelli:
+
+    def __init__(self, cartella=CARTELLA_REGISTRO, intervallo=2.0, lookup_table=False, validazione=None):
+        """
+        'intervallo': secondi tra due controlli del puntatore;
+        'validazione': funzione opzionale chiamata col nuovo modello dopo 'valida_modello'
+        (deve sollevare un'eccezione per rifiutarlo).
+        """
+        self.cartella = cartella
+        self.intervallo = intervallo
+        self.lookup_table = lookup_table
+        self.validazione = validazione
+
+        # modello attivo e relativa versione: vengono sempre sostituiti insieme
+        self._attivo = (None, None)
+        # funzioni chiamate (dal thread del registro) dopo ogni sostituzione
+        self.al_cambio = []
+        self.ultimo_errore = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # stato del puntatore all'ultimo controllo e versione rifiutata (per non riprovarla a ogni giro)
+        self._stato_puntatore = None
+        self._versione_rifiutata = None
+
+        # la versione attiva all'avvio viene caricata subito, così il primo 'modello' è già pronto
+        self.controlla()
+
+    @property
+    def modello(self):
+        """
+        Modello attivo. Chi deve fare più operazioni coerenti lo legge una volta sola e usa
+        quel riferimento: una sostituzione successiva non lo modifica.
+        """
+        return self._attivo[0]
+
+    @property
+    def versione(self):
+        return self._attivo[1]
+
+    def predict(self, features_dict):
+        return self.modello.predict(features_dict)
+
+    def predict_batch(self, dati):
+        return self.modello.predict_batch(dati)
+
+    def controlla(self):
+        """
+        Controlla il puntatore e, se indica una versione diversa, la carica, la valida e la
+        mette in servizio. Restituisce True se il modello è stato sostituito.
+        """
+        percorso_corrente = os.path.join(self.cartella, FILE_CORRENTE)
+        try:
+            stat = os.stat(percorso_corrente)
+        except FileNotFoundError:
+            return False
+        # 'os.replace' crea sempre un nuovo inode, anche se mtime e dimensione coincidono
+        stato = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stato == self._stato_puntatore:
+            return False
+
+        # un solo caricamento alla volta (thread di controllo e chiamate esplicite)
+        with self._lock:
+            self._stato_puntatore = stato
+            corrente = leggi_corrente(self.cartella)
+            if corrente is None:
+                return False
+            versione = corrente['versione']
+            if versione == self.versione or versione == self._versione_rifiutata:
+                return False
+
+            percorso = os.path.join(self.cartella, corrente['file'])
+            try:
+                nuovo = MushroomClassifier(artifact_path=percorso, artifact_only=True, lookup_table=self.lookup_table)
+                # una nuova versione non può cambiare le feature sotto ai client già in esecuzione
+                attivo = self.modello
+                if attivo is not None:
+                    verifica_compatibilita(nuovo, attivo.features_input, attivo.menu_opzioni)
+                valida_modello(nuovo)
+                if self.validazione is not None:
+                    self.validazione(nuovo)
+            except Exception as e:
+                # il modello in servizio resta quello precedente
+                self._versione_rifiutata = versione
+                self.ultimo_errore = f"Versione {versione} rifiutata: {e}"
+                print(f"ATTENZIONE: {self.ultimo_errore}")
+                return False
+
+            precedente = self.versione
+            self._attivo = (nuovo, versione)
+            self._versione_rifiutata = None
+            self.ultimo_errore = None
+
+        for funzione in self.al_cambio:
+            try:
+                funzione(nuovo, versione, precedente)
+            except Exception as e:
+                print(f"ATTENZIONE: Errore nella notifica del cambio di modello: {e}")
+        return True
+
+    def _ciclo(self):
+        while not self._stop.wait(self.intervallo):
+            try:
+                self.controlla()
+            except Exception as e:
+                # il thread di controllo non deve mai morire per un errore di I/O
+                self.ultimo_errore = str(e)
+                print(f"ATTENZIONE: Controllo del registro fallito: {e}")
+
+    def avvia(self):
+        """
+        Avvia il thread che controlla il registro ogni 'intervallo' secondi.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._ciclo, name="registro-modelli", daemon=True)
+            self._thread.start()
+        return self
+
+    def ferma(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.avvia()
+
+    def __exit__(self, *exc):
+        self.ferma()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestisce il registro versionato dei modelli.")
+    parser.add_argument('comando', choices=['pubblica', 'elenca', 'attiva'])
+    parser.add_argument('versione', nargs='?', type=int, help="Versione da attivare (comando 'attiva').")
+    parser.add_argument('--cartella', default=CARTELLA_REGISTRO, help="Cartella del registro.")
+    parser.add_argument('--csv', default='mushrooms.csv', help="Dataset di addestramento (comando 'pubblica').")
+    parser.add_argument('--riaddestra', action='store_true', help="Riaddestra invece di riusare l'artefatto esistente.")
+    args = parser.parse_args()
+
+    if args.comando == 'pubblica':
+        classifier = MushroomClassifier(args.csv, force_retrain=args.riaddestra)
+        valida_modello(classifier)
+        versione = pubblica(classifier, args.cartella)
+        print(f"SUCCESSO: Pubblicata e attivata la versione {versione} in '{args.cartella}'.")
+
+    elif args.comando == 'elenca':
+        corrente = leggi_corrente(args.cartella) or {}
+        versioni = versioni_disponibili(args.cartella)
+        if not versioni:
+            print(f"Il registro '{args.cartella}' è vuoto.")
+        for versione in versioni:
+            attiva = " (attiva)" if versione == corrente.get('versione') else ""
+            percorso = os.path.join(args.cartella, nome_versione(versione))
+            data = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(os.path.getmtime(percorso)))
+            print(f"  v{versione:04d}  {data}{attiva}")
+
+    else:
+        if args.versione is None:
+            parser.error("indicare la versione da attivare")
+        attiva_versione(args.cartella, args.versione)
+        print(f"SUCCESSO: Versione {args.versione} attivata.")
+
+
+if __name__ == '__main__':
+    main()
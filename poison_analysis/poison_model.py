@@ -1,25 +1,76 @@
 import pandas as pd
 import numpy as np
 
-# Da 'scikit-learn', una delle più importanti librerie di machine learning, importiamo
-# il 'DecisionTreeClassifier'. Questo è l'algoritmo che useremo per costruire il nostro
-# modello di predizione, simile a un diagramma di flusso che impara dai dati.
-from sklearn.tree import DecisionTreeClassifier
-
-# Importiamo anche il 'LabelEncoder', un'utilità per convertire le etichette
-# testuali (es. "marrone", "bianco") in numeri, poiché i modelli di machine learning
-# lavorano solo con dati numerici.
-from sklearn.preprocessing import LabelEncoder
-
-# Infine, importiamo 'os' per interagire con il sistema operativo. Ci serve per
+# Importiamo 'os' per interagire con il sistema operativo. Ci serve per
 # gestire i percorsi dei file in modo che lo script funzioni su computer diversi.
 import os
-import matplotlib.pyplot as plt
-from sklearn import tree
+import time
+import json
+import pickle
+import hashlib
+import sys
+from poison_runtime import RUNTIME_FILE
+
+# Il caricatore condiviso del dataset ('mushroom_data') vive nella cartella 'data' del progetto.
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+if DATA_DIR not in sys.path:
+    sys.path.append(DATA_DIR)
+
+# schema fisso delle categorie: codici stabili e menu della GUI (solo NumPy, leggero da importare)
+from mushroom_schema import NOMI_ITALIANI, CodificatoreFisso, menu_italiano
+# hash a blocchi dei file, condiviso con il manifest della copia binaria del dataset
+from mushroom_data import impronta_file
+# misura opzionale delle fasi (attiva solo con la variabile d'ambiente FUNGHI_TRACCIA)
+from pipeline_trace import span, traccia
+
+# NB: scikit-learn e matplotlib NON vengono importati qui ma solo nei metodi che li usano
+# ('_train' e 'visualize_tree'). Chi usa il modello solo per predire (GUI, servizi, runtime)
+# evita così di caricare le librerie di addestramento e di grafica all'avvio.
+
+# Versione del formato dell'artefatto salvato: va incrementata ogni volta che cambia
+# il contenuto del file, così gli artefatti vecchi vengono ignorati e il modello riaddestrato.
+ARTIFACT_VERSION = 3
+
+# Nome di default dell'artefatto, salvato accanto a questo script.
+ARTIFACT_FILE = "mushroom_model.pkl"
+
+# Limite di sicurezza per la tabella delle predizioni precalcolate (numero di combinazioni).
+MAX_COMBINAZIONI_TABELLA = 10_000_000
+
+# --- Configurazione delle Feature ---
+# Definita a livello di modulo così la GUI può costruire i menu prima che il modello sia caricato.
+
+# lista delle feature scelte
+FEATURES_INPUT = [
+    'cap-shape',
+    'cap-color',
+    'gill-color',
+    'stalk-shape',
+    'odor'
+]
+
+# dict che mappa le feature italiane in singole lettere (dallo schema condiviso in 'data/mushroom_schema.py')
+MENU_OPZIONI = {feature: menu_italiano(feature) for feature in FEATURES_INPUT}
+
+# dict che mappa i nomi delle feature inglesi a quelli italiani
+NOMI_FEATURES_ITA = {feature: NOMI_ITALIANI[feature] for feature in FEATURES_INPUT}
+
+
+def _pesi_base_mista(dimensioni):
+    """
+    Pesi della base mista per indicizzare le combinazioni di codici: l'ultima feature
+    varia più velocemente (ordine C, lo stesso di 'np.indices' e 'np.unravel_index').
+    """
+    pesi = np.ones(len(dimensioni), dtype=np.int64)
+    for i in range(len(dimensioni) - 2, -1, -1):
+        pesi[i] = pesi[i + 1] * dimensioni[i + 1]
+    return pesi
+
 
 class MushroomClassifier:
 
-    def __init__(self, csv_path='mushrooms.csv'):
+    def __init__(self, csv_path='mushrooms.csv', artifact_path=None, force_retrain=False, artifact_only=False,
+                 lookup_table=False):
 
         # --- Inizializzazione delle Proprietà ---
 
@@ -32,69 +83,332 @@ class MushroomClassifier:
         # encoder specifico per il target
         self.le_target = None
 
-        # --- Configurazione delle Feature ---
+        # righe/sec misurate durante l'ultima chiamata a 'predict_batch'
+        self.ultimo_throughput = None
 
-        # lista delle feature scelte
-        self.features_input = [
-            'cap-shape',
-            'cap-color',
-            'gill-color',
-            'stalk-shape',
-            'odor'
-        ]
-
-        # dict che mappa le feature italiane in singole lettere
-        self.menu_opzioni = {
-            "cap-shape": {"A campana": "b", "Conico": "c", "Convesso": "x", "Piatto": "f", "Nodoso/Umbone": "k", "Infossato": "s"},
-            "cap-color": {"Marrone": "n", "Giallo pallido (Buff)": "b", "Cannella": "c", "Grigio": "g", "Verde": "r", "Rosa": "p", "Viola": "u", "Rosso": "e", "Bianco": "w", "Giallo": "y"},
-            "gill-color": {"Nero": "k", "Marrone": "n", "Giallo pallido": "b", "Cioccolato": "h", "Grigio": "g", "Verde": "r", "Arancione": "o", "Rosa": "p", "Viola": "u", "Rosso": "e", "Bianco": "w", "Giallo": "y"},
-            "stalk-shape": {"Si allarga alla base": "e", "Si restringe (affusolato)": "t"},
-            "odor": {"Mandorla": "a", "Anice": "l", "Chimico/Creosoto": "c", "Pesce": "y", "Fetido": "f", "Muffa": "m", "Nessun odore": "n", "Pungente": "p", "Speziato": "s"}
-        }
+        # impronta (hash dei dati + feature) del modello attualmente caricato
+        self.impronta_dati = None
 
-        # dict che mappa i nomi delle feature inglesi a quelli italiani
-        self.nomi_features_ita = {
-            'cap-shape': 'FORMA DEL CAPPELLO', 'cap-color': 'COLORE DEL CAPPELLO', 'gill-color': 'COLORE DELLE LAMELLE',
-            'stalk-shape': 'FORMA DEL GAMBO', 'odor': "ODORE"
-        }
+        # modalità tabella: tutte le combinazioni di input vengono predette una volta sola
+        # dopo l'addestramento e le predizioni diventano semplici letture da un array uint8.
+        self.usa_tabella = lookup_table
+        self.tabella_predizioni = None
+        self._pesi_tabella = None
+        self._indici_codici = {}
+
+        # statistiche sufficienti per l'addestramento incrementale: per ogni combinazione
+        # dei codici delle feature (indice in base mista) quante osservazioni per classe.
+        # Il modello viene sempre addestrato da queste, mai dalle righe grezze.
+        self.conteggi = None
+        # righe aggiunte con 'aggiorna' dopo l'ultimo addestramento completo
+        self.righe_aggiunte = 0
+
+        # indice di Hamming sulle combinazioni osservate (creato al primo uso da 'spiega')
+        self._indice_vicini = None
+
+        # --- Configurazione delle Feature ---
+
+        # copie delle costanti di modulo: un artefatto può sostituire la lista delle feature
+        self.features_input = list(FEATURES_INPUT)
+        self.menu_opzioni = MENU_OPZIONI
+        self.nomi_features_ita = NOMI_FEATURES_ITA
 
         # --- Caricamento Dati e Addestramento ---
 
-        #check per controllare il path assoluto del file csv se il file non viene trovato così com'è
         script_dir = os.path.dirname(__file__)
+        if artifact_path is None:
+            artifact_path = os.path.join(script_dir, ARTIFACT_FILE)
+        self.artifact_path = artifact_path
+
+        # in modalità solo-artefatto il CSV non viene mai letto: serve per i processi
+        # che devono solo predire partendo da un modello già addestrato.
+        if artifact_only:
+            if not os.path.exists(artifact_path):
+                raise FileNotFoundError(f"ERRORE: L'artefatto '{artifact_path}' non è stato trovato.")
+            self._carica_artefatto(artifact_path)
+            return
+
+        #check per controllare il path assoluto del file csv se il file non viene trovato così com'è
         full_path = os.path.join(script_dir, os.path.basename(csv_path))
 
         if not os.path.exists(full_path):
-             full_path = csv_path
+            # il percorso indicato così com'è, altrimenti la copia canonica in 'data/'
+            from mushroom_data import risolvi_dataset
+            full_path = risolvi_dataset(csv_path)
 
         try:
-            self._train(full_path)
+            impronta = self._impronta(full_path)
         except FileNotFoundError:
             raise FileNotFoundError(f"ERRORE: Il file '{os.path.basename(csv_path)}' non è stato trovato. Assicurati che sia nella stessa cartella dell'eseguibile.")
 
+        # se esiste un artefatto addestrato sugli stessi dati e sulle stesse feature lo riusiamo,
+        # altrimenti riaddestriamo e salviamo il nuovo artefatto per i prossimi avvii.
+        if not force_retrain and self._artefatto_valido(artifact_path, impronta):
+            return
+
+        self._train(full_path)
+        self.impronta_dati = impronta
+        self.salva_artefatto(artifact_path)
+
+    def _impronta(self, csv_path):
+        """
+        Chiave dell'artefatto: hash del CSV combinato con la lista delle feature usate.
+        """
+        h = hashlib.sha256()
+        h.update(impronta_file(csv_path).encode())
+        h.update(json.dumps(self.features_input).encode())
+        return h.hexdigest()
+
+    def _artefatto_valido(self, artifact_path, impronta):
+        """
+        Prova a caricare l'artefatto; restituisce True solo se corrisponde all'impronta richiesta.
+        """
+        if not os.path.exists(artifact_path):
+            return False
+        try:
+            with open(artifact_path, 'rb') as f:
+                artefatto = pickle.load(f)
+        except Exception:
+            # artefatto corrotto o creato con librerie incompatibili: si riaddestra
+            return False
+
+        if artefatto.get('versione') != ARTIFACT_VERSION or artefatto.get('impronta') != impronta:
+            return False
+
+        self._applica_artefatto(artefatto)
+        return True
+
+    @traccia("modello.carica_artefatto")
+    def _carica_artefatto(self, artifact_path):
+        with open(artifact_path, 'rb') as f:
+            artefatto = pickle.load(f)
+
+        if artefatto.get('versione') != ARTIFACT_VERSION:
+            raise ValueError(f"L'artefatto '{artifact_path}' ha una versione non supportata ({artefatto.get('versione')}).")
+
+        self._applica_artefatto(artefatto)
+
+    def _applica_artefatto(self, artefatto):
+        self.features_input = list(artefatto['features_input'])
+        self.model = artefatto['model']
+        self.dizionario_encoders = artefatto['dizionario_encoders']
+        self.le_target = artefatto['le_target']
+        self.impronta_dati = artefatto['impronta']
+        self.conteggi = artefatto['conteggi']
+        self.righe_aggiunte = artefatto['righe_aggiunte']
+        self._aggiorna_tabella()
+
+    @traccia("modello.salva_artefatto")
+    def salva_artefatto(self, artifact_path=None):
+        """
+        Salva modello, encoder e impronta dei dati in un file versionato.
+        La scrittura avviene su un file temporaneo poi rinominato, così un processo
+        concorrente non legge mai un artefatto scritto a metà.
+        """
+        if artifact_path is None:
+            artifact_path = self.artifact_path
+
+        artefatto = {
+            'versione': ARTIFACT_VERSION,
+            'impronta': self.impronta_dati,
+            'features_input': list(self.features_input),
+            'model': self.model,
+            'dizionario_encoders': self.dizionario_encoders,
+            'le_target': self.le_target,
+            'conteggi': self.conteggi,
+            'righe_aggiunte': self.righe_aggiunte,
+        }
+
+        temporaneo = f"{artifact_path}.{os.getpid()}.tmp"
+        try:
+            with open(temporaneo, 'wb') as f:
+                pickle.dump(artefatto, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporaneo, artifact_path)
+        except OSError as e:
+            # non riuscire a salvare la cache non deve impedire l'uso del modello
+            print(f"ATTENZIONE: Impossibile salvare l'artefatto in '{artifact_path}': {e}")
+            if os.path.exists(temporaneo):
+                os.remove(temporaneo)
+
+    @traccia("modello.addestramento")
     def _train(self, csv_path):
 
-        df = pd.read_csv(csv_path)
+        # Il caricatore condiviso restituisce il dataset come matrice di codici uint8 (1 byte per cella)
+        # con le categorie ordinate di ogni colonna.
+        from mushroom_data import carica_codici
+
+        with span("modello.carica_codici"):
+            dataset = carica_codici(csv_path)
+
+        # I modelli di machine learning lavorano solo con dati numerici: ogni lettera (es. "n" = marrone)
+        # diventa il suo codice fisso dello schema condiviso, senza nessun 'fit' sui dati.
+        # I valori fuori schema eventualmente presenti nel dataset vengono aggiunti alle categorie.
+        self.dizionario_encoders = {col: CodificatoreFisso(col, extra=dataset.categorie[col]) for col in self.features_input}
+        self.le_target = CodificatoreFisso('poisonous', extra=dataset.categorie['poisonous'])
+
+        # I codici del dataset dipendono dalle categorie osservate: si traducono in quelli dello
+        # schema traducendo solo le categorie e poi con un unico 'take' per colonna.
+        def codici_schema(encoder, col):
+            return encoder.codifica(dataset.categorie[col])[dataset.colonna(col)]
 
         # Separiamo le feature (colonne input -> X) dalla variabile target (la predizione -> y).
-        X = df[self.features_input].copy()  # .copy() previene un warning di pandas
-        y = df['poisonous']
+        X = np.stack([codici_schema(self.dizionario_encoders[col], col) for col in self.features_input], axis=1)
+        y = codici_schema(self.le_target, 'poisonous') # 'e' e 'p' diventano 0 e 1
+
+        # Contiamo quante volte ogni combinazione di feature compare con ciascuna classe:
+        # sono le statistiche sufficienti da cui viene addestrato il modello (vedi 'aggiorna').
+        with span("modello.conteggi", righe=len(y)):
+            self.conteggi = np.zeros((self._n_combinazioni(), len(self.le_target.classes_)), dtype=np.int64)
+            np.add.at(self.conteggi, (X @ _pesi_base_mista(self._dimensioni()), y), 1)
+        self.righe_aggiunte = 0
 
-        # trasformiamo ogni feature testuale in numeri.
-        self.dizionario_encoders = {col: LabelEncoder() for col in X.columns}
-        for col, encoder in self.dizionario_encoders.items():
-            # 'fit_transform' impara le etichette uniche e le trasforma in sequenze numeriche
-            X[col] = encoder.fit_transform(X[col])
+        self._adatta_da_conteggi()
 
-        self.le_target = LabelEncoder()
-        y = self.le_target.fit_transform(y) # 'e' e 'p' diventeranno 0 e 1
+    def _dimensioni(self):
+        return [len(self.dizionario_encoders[f].classes_) for f in self.features_input]
+
+    def _n_combinazioni(self):
+        n_combinazioni = int(np.prod(self._dimensioni()))
+        if n_combinazioni > MAX_COMBINAZIONI_TABELLA:
+            raise ValueError(f"Troppe combinazioni ({n_combinazioni}) per le statistiche del modello.")
+        return n_combinazioni
+
+    @traccia("modello.fit_albero")
+    def _adatta_da_conteggi(self):
+        """
+        Addestra l'albero dalle sole combinazioni osservate, pesate con i loro conteggi:
+        per l'albero è equivalente ad addestrarlo su tutte le righe, ma il costo dipende dal
+        numero di combinazioni distinte e non dalla quantità di dati storici.
+        """
+        # Da 'scikit-learn', una delle più importanti librerie di machine learning, importiamo
+        # il 'DecisionTreeClassifier'. Questo è l'algoritmo che useremo per costruire il nostro
+        # modello di predizione, simile a un diagramma di flusso che impara dai dati.
+        from sklearn.tree import DecisionTreeClassifier
+
+        indici, classi = np.nonzero(self.conteggi)
+        combinazioni = np.stack(np.unravel_index(indici, self._dimensioni()), axis=1)
+        X = pd.DataFrame(combinazioni, columns=self.features_input)
 
         # Creiamo un'istanza del decision tree.
         # #'random_state=42' serve a garantire che l'addestramento dia sempre lo stesso risultato, rendendo il modello riproducibile.
         self.model = DecisionTreeClassifier(random_state=42)
 
         # 'self.model.fit' : il modello analizza le feature (X) e i risultati (y) per imparare le regole di classificazione.
-        self.model.fit(X, y)
+        self.model.fit(X, classi, sample_weight=self.conteggi[indici, classi])
+
+        # ogni riaddestramento invalida la tabella delle predizioni precalcolate
+        self._aggiorna_tabella()
+
+    def _estendi_encoder(self, feature_name, valori):
+        """
+        Aggiunge all'encoder di 'feature_name' le categorie fuori schema, mantenendo le classi
+        ordinate, e sposta i conteggi sui nuovi codici.
+        Restituisce True se l'encoder è cambiato.
+        """
+        encoder = self.dizionario_encoders[feature_name]
+        classi = encoder.classes_.astype(str)
+        nuove = np.setdiff1d(np.asarray(valori).astype(str), classi)
+        if len(nuove) == 0:
+            return False
+
+        unite = np.union1d(classi, nuove)
+        asse = self.features_input.index(feature_name)
+        n_classi = self.conteggi.shape[1]
+        dimensioni = self._dimensioni()
+        nuove_dimensioni = list(dimensioni)
+        nuove_dimensioni[asse] = len(unite)
+        if int(np.prod(nuove_dimensioni)) > MAX_COMBINAZIONI_TABELLA:
+            raise ValueError(f"Troppe combinazioni ({int(np.prod(nuove_dimensioni))}) per le statistiche del modello.")
+
+        # i vecchi codici finiscono nella loro posizione all'interno delle classi estese
+        estesi = np.zeros(nuove_dimensioni + [n_classi], dtype=np.int64)
+        indice = [slice(None)] * (len(dimensioni) + 1)
+        indice[asse] = np.searchsorted(unite, classi)
+        estesi[tuple(indice)] = self.conteggi.reshape(dimensioni + [n_classi])
+
+        self.conteggi = estesi.reshape(-1, n_classi)
+        encoder.classes_ = unite.astype(object)
+        return True
+
+    @traccia("modello.aggiorna")
+    def aggiorna(self, dati, etichette=None, riaddestra=True):
+        """
+        Aggiunge osservazioni etichettate senza rileggere lo storico: aggiorna i conteggi
+        (costo proporzionale al batch) e riaddestra l'albero dai conteggi.
+        'dati' è un DataFrame o un dict colonna -> sequenza con le feature del modello e,
+        se 'etichette' non è indicato, la colonna 'poisonous' ('e'/'p').
+        Le categorie mai viste estendono gli encoder. Con 'riaddestra=False' si possono
+        accumulare più batch e riaddestrare una volta sola con 'riaddestra_da_conteggi'
+        (ma se un encoder viene esteso il modello viene comunque riaddestrato subito).
+        Per rendere persistente l'aggiornamento chiamare 'salva_artefatto'.
+        """
+        if self.conteggi is None:
+            raise ValueError("Il modello non ha le statistiche per l'aggiornamento incrementale: riaddestralo con force_retrain=True.")
+
+        if etichette is None:
+            etichette = dati['poisonous']
+        etichette = np.asarray(etichette).astype(str)
+        classi_target = self.le_target.classes_.astype(str)
+        y = np.minimum(np.searchsorted(classi_target, etichette), len(classi_target) - 1)
+        if not np.all(classi_target[y] == etichette):
+            sconosciute = sorted(set(etichette.tolist()) - set(classi_target.tolist()))
+            raise ValueError(f"Etichette non valide: {sconosciute}. Valori ammessi: {classi_target.tolist()}")
+
+        colonne = {f: np.asarray(dati[f]).astype(str) for f in self.features_input}
+        if any(len(v) != len(y) for v in colonne.values()):
+            raise ValueError("Feature ed etichette devono avere la stessa lunghezza.")
+
+        encoder_estesi = False
+        for feature_name, valori in colonne.items():
+            encoder_estesi |= self._estendi_encoder(feature_name, valori)
+
+        # ora tutte le categorie sono note: la codifica è esatta
+        codici = self._codifica_batch(colonne)
+        np.add.at(self.conteggi, (codici @ _pesi_base_mista(self._dimensioni()), y), 1)
+        self.righe_aggiunte += len(y)
+        self._indice_vicini = None
+
+        # con gli encoder estesi i codici del modello attuale non sono più validi
+        if riaddestra or encoder_estesi:
+            self._adatta_da_conteggi()
+
+    def riaddestra_da_conteggi(self):
+        """
+        Riaddestra il modello dai conteggi accumulati (es. dopo più 'aggiorna(..., riaddestra=False)').
+        """
+        self._adatta_da_conteggi()
+
+    @traccia("modello.tabella_predizioni")
+    def _aggiorna_tabella(self):
+        """
+        Enumera tutte le combinazioni delle feature codificate e salva la classe predetta
+        in un array uint8 indicizzato in base mista (un "peso" per feature).
+        """
+        # modello o encoder cambiati: l'indice dei vicini va ricostruito
+        self._indice_vicini = None
+
+        if not self.usa_tabella:
+            self.tabella_predizioni = None
+            return
+
+        dimensioni = self._dimensioni()
+        n_combinazioni = int(np.prod(dimensioni))
+        if n_combinazioni > MAX_COMBINAZIONI_TABELLA:
+            raise ValueError(f"Troppe combinazioni ({n_combinazioni}) per la tabella delle predizioni.")
+
+        # pesi della base mista: l'ultima feature varia più velocemente (ordine C)
+        pesi = _pesi_base_mista(dimensioni)
+
+        # 'np.indices' genera tutte le combinazioni nello stesso ordine dei pesi
+        combinazioni = np.indices(dimensioni).reshape(len(dimensioni), -1).T
+        predizioni = self.model.predict(pd.DataFrame(combinazioni, columns=self.features_input))
+
+        self.tabella_predizioni = predizioni.astype(np.uint8)
+        self._pesi_tabella = pesi
+        self._indici_codici = {
+            f: {codice: i for i, codice in enumerate(self.dizionario_encoders[f].classes_)}
+            for f in self.features_input
+        }
 
     def predict(self, features_dict):
 
@@ -102,6 +416,13 @@ class MushroomClassifier:
         if len(features_dict) != len(self.features_input):
             raise ValueError(f"L'input deve contenere {len(self.features_input)} feature.")
 
+        # con la tabella la predizione è una somma pesata dei codici e una lettura dall'array
+        if self.tabella_predizioni is not None:
+            indice = 0
+            for feature_name, peso in zip(self.features_input, self._pesi_tabella):
+                indice += peso * self._indici_codici[feature_name].get(features_dict[feature_name], 0)
+            return self.le_target.classes_[self.tabella_predizioni[indice]]
+
         encoded_input = []
 
         # iteriamo sulla lista 'self.features_input' per garantire che l'ordine delle feature sia corretto.
@@ -129,91 +450,234 @@ class MushroomClassifier:
 
         return result_text
 
+    def indice_vicini(self):
+        """
+        Indice di Hamming (vedi 'hamming_index.py') su tutte le combinazioni osservate in addestramento.
+        """
+        if self._indice_vicini is None:
+            if self.conteggi is None:
+                raise ValueError("Il modello non ha i conteggi di addestramento: riaddestralo con force_retrain=True.")
+            from hamming_index import IndiceHamming
+
+            categorie = {f: self.dizionario_encoders[f].classes_ for f in self.features_input}
+            self._indice_vicini = IndiceHamming.da_conteggi(self.conteggi, categorie, self.le_target.classes_)
+        return self._indice_vicini
+
+    def spiega(self, features_dict, k=5):
+        """
+        I 'k' funghi di addestramento più simili all'input con i voti per classe.
+        Le feature mancanti, vuote o con codici sconosciuti vengono ignorate (elencate in
+        'feature_ignorate'), quindi funziona anche con input parziali.
+        """
+        return self.indice_vicini().cerca(features_dict, k)
+
+    def predict_prudente(self, features_dict, k=5):
+        """
+        Come 'predict', ma se manca una feature o un codice non è tra quelli visti in
+        addestramento non sostituisce un valore arbitrario: decide il voto dei 'k' funghi
+        più simili (con un pareggio vince 'p').
+        """
+        completo = all(
+            feature_name in features_dict and features_dict[feature_name] in self.dizionario_encoders[feature_name].classes_
+            for feature_name in self.features_input
+        )
+        if completo:
+            return self.predict({f: features_dict[f] for f in self.features_input})
+        return self.spiega(features_dict, k)['classe']
 
-    def visualize_tree(self, output_filename="decision_tree.png"):
+    def _codifica_batch(self, dati):
         """
-        Genera e salva una visualizzazione dell'albero decisionale.
+        Codifica in un solo passaggio vettoriale un batch di codici testuali.
+        Accetta un DataFrame, un dict colonna -> sequenza o un array 2-D con le colonne
+        nell'ordine di 'self.features_input'. Restituisce una matrice di interi (righe x feature).
+        """
+        if isinstance(dati, pd.DataFrame):
+            mancanti = [f for f in self.features_input if f not in dati.columns]
+            if mancanti:
+                raise ValueError(f"Colonne mancanti nel DataFrame: {mancanti}")
+            # le colonne categoriche (es. lette dal Parquet) restano Series: si codificano solo le categorie
+            colonne = [dati[f] if isinstance(dati[f].dtype, pd.CategoricalDtype) else dati[f].to_numpy()
+                       for f in self.features_input]
+        elif isinstance(dati, dict):
+            mancanti = [f for f in self.features_input if f not in dati]
+            if mancanti:
+                raise ValueError(f"Feature mancanti nel dizionario: {mancanti}")
+            colonne = [np.asarray(dati[f]) for f in self.features_input]
+        else:
+            matrice = np.asarray(dati)
+            if matrice.ndim != 2 or matrice.shape[1] != len(self.features_input):
+                raise ValueError(f"L'array deve essere 2-D con {len(self.features_input)} colonne.")
+            colonne = [matrice[:, i] for i in range(matrice.shape[1])]
+
+        n_righe = len(colonne[0]) if colonne else 0
+        codificato = np.zeros((n_righe, len(self.features_input)), dtype=np.int64)
+
+        for i, (feature_name, valori) in enumerate(zip(self.features_input, colonne)):
+            if len(valori) != n_righe:
+                raise ValueError("Tutte le colonne devono avere la stessa lunghezza.")
+
+            # una sola traduzione per colonna dalla tabella del codificatore; i codici sconosciuti
+            # diventano il default 0 come in 'predict'
+            encoder = self.dizionario_encoders[feature_name]
+            if isinstance(valori, pd.Series):
+                # colonna categorica: si traducono solo le categorie, poi un solo 'take' sui codici
+                codici_categorie = valori.cat.codes.to_numpy()
+                codici = encoder.codifica(valori.cat.categories.to_numpy(), default=0)
+                # i valori mancanti (codice -1) vanno al default 0
+                codici = np.where(codici_categorie >= 0, codici[codici_categorie], 0)
+            else:
+                codici = encoder.codifica(valori, default=0)
+            codificato[:, i] = codici
+
+        return codificato
+
+    @traccia("modello.predict_batch")
+    def predict_batch(self, dati):
+        """
+        Predice in blocco la commestibilità di più funghi.
+        Restituisce un array di etichette 'e'/'p' e salva il throughput (righe/sec)
+        in 'self.ultimo_throughput'.
+        """
+        inizio = time.perf_counter()
+
+        codificato = self._codifica_batch(dati)
+        if len(codificato) == 0:
+            self.ultimo_throughput = 0.0
+            return np.empty(0, dtype=self.le_target.classes_.dtype)
+
+        if self.tabella_predizioni is not None:
+            predizioni_num = self.tabella_predizioni[codificato @ self._pesi_tabella]
+        else:
+            input_df = pd.DataFrame(codificato, columns=self.features_input)
+            predizioni_num = self.model.predict(input_df)
+        risultati = self.le_target.classes_[predizioni_num]
+
+        durata = time.perf_counter() - inizio
+        self.ultimo_throughput = len(risultati) / durata if durata > 0 else float('inf')
+
+        return risultati
+
+    def esporta_runtime(self, output_path=None):
+        """
+        Esporta albero, encoder ed etichette in array NumPy piatti (file .npz),
+        caricabili da 'poison_runtime.py' senza sklearn né pandas.
+        """
+        if not self.model:
+            raise ValueError("Il modello non è stato ancora addestrato. Impossibile esportarlo.")
+
+        if output_path is None:
+            output_path = os.path.join(os.path.dirname(__file__), RUNTIME_FILE)
+
+        albero = self.model.tree_
+        array = {
+            'versione': np.array(ARTIFACT_VERSION),
+            'features_input': np.array(self.features_input, dtype=str),
+            'etichette': self.le_target.classes_.astype(str),
+            'figlio_sinistro': albero.children_left.astype(np.int32),
+            'figlio_destro': albero.children_right.astype(np.int32),
+            'feature': albero.feature.astype(np.int32),
+            'soglia': albero.threshold.astype(np.float64),
+            # come 'predict' di sklearn: la classe di ogni nodo è l'argmax dei suoi valori
+            'classe_nodo': np.argmax(albero.value[:, 0, :], axis=1).astype(np.uint8),
+        }
+        for i, feature_name in enumerate(self.features_input):
+            array[f'classi_{i}'] = self.dizionario_encoders[feature_name].classes_.astype(str)
+
+        np.savez(output_path, **array)
+        return output_path
+
+    def visualize_tree(self, output_filename="decision_tree.svg", in_background=False, forza=False):
+        """
+        Genera e salva una visualizzazione dell'albero decisionale nella cartella 'data'.
+        Con '.svg', '.dot' o '.gv' l'albero viene disegnato direttamente da 'model.tree_'
+        (vedi 'tree_render.py'); con altre estensioni (es. '.png') si usa matplotlib.
+        Se il file esistente corrisponde allo stesso albero il disegno viene saltato
+        ('forza=True' per rifarlo). Con 'in_background=True' il disegno avviene in un thread
+        separato, che viene restituito (es. per chiamare 'join').
         """
         if not self.model:
             print("Il modello non è stato ancora addestrato. Impossibile visualizzare l'albero.")
             return
 
-        # Aumenta la dimensione della figura per una migliore leggibilità
-        plt.figure(figsize=(40, 20))
-        
-        import re
-        from matplotlib.colors import to_rgba
-        from matplotlib.text import Annotation
-
-        annotations = tree.plot_tree(
-            self.model,
-            feature_names=self.features_input,
-            class_names=list(self.le_target.classes_),
-            filled=True,
-            rounded=True,
-            fontsize=10
-        )
-        
-        # Definiamo i colori personalizzati
-        colors = {'e': "#5D8053", 'p': "#C63636"}
-        class_names = self.le_target.classes_
-
-        for artist in annotations:
-            # Applica i colori solo ai nodi (che sono oggetti Annotation)
-            if not isinstance(artist, Annotation):
-                continue
-
-            # Ottieni il box del nodo
-            box = artist.get_bbox_patch()
-            if not box:
-                continue
-
-            # Estrai il 'value' dal testo del nodo per calcolare la purezza
-            text = artist.get_text()
-            match = re.search(r'value = \[([\d\s,.]+)\]', text)
-            if not match:
-                continue
-            
-            try:
-                class_counts_str = match.group(1).split(',')
-                class_counts = np.array([float(c.strip()) for c in class_counts_str])
-            except (ValueError, IndexError):
-                continue
-
-            if np.sum(class_counts) == 0:
-                continue
-
-            # Determina la classe maggioritaria e il colore
-            majority_class_idx = np.argmax(class_counts)
-            majority_class_name = class_names[majority_class_idx]
-            color_hex = colors[majority_class_name]
-            
-            # Calcola la purezza e l'alpha per la trasparenza
-            purity = np.max(class_counts) / np.sum(class_counts)
-            alpha = 0.6 + (purity - 0.5) * 0.8 if purity > 0.5 else 0.6
-            
-            # Applica il colore
-            rgba_color = to_rgba(color_hex, alpha=alpha)
-            box.set_facecolor(rgba_color)
-        
-        plt.title("Albero Decisionale per la Classificazione dei Funghi", fontsize=20)
-        
         # Salva l'immagine nella cartella 'data'
         script_dir = os.path.dirname(__file__)
         project_root = os.path.abspath(os.path.join(script_dir, '..'))
         data_dir = os.path.join(project_root, 'data')
         os.makedirs(data_dir, exist_ok=True)
         output_path = os.path.join(data_dir, output_filename)
-        
+
+        if in_background:
+            import threading
+
+            thread = threading.Thread(target=self._disegna_albero, args=(output_path, forza),
+                                      name="disegno-albero", daemon=True)
+            thread.start()
+            return thread
+
+        self._disegna_albero(output_path, forza)
+
+    @traccia("modello.disegna_albero")
+    def _disegna_albero(self, output_path, forza):
+        from tree_render import FORMATI, conteggi_nodi, colore_nodo, impronta_albero, renderizza_albero
+
+        # riferimenti letti una volta sola: un riaddestramento concorrente non cambia il disegno a metà
+        model, features, classi = self.model, list(self.features_input), list(self.le_target.classes_)
+        categorie = {f: self.dizionario_encoders[f].classes_ for f in features}
+
         try:
-            plt.savefig(output_path, bbox_inches='tight')
+            if os.path.splitext(output_path)[1].lower() in FORMATI:
+                if renderizza_albero(model, features, classi, output_path, categorie, forza):
+                    print(f"\nAlbero decisionale salvato in: {output_path}")
+                else:
+                    print(f"\nAlbero decisionale invariato, disegno saltato: {output_path}")
+                return
+
+            impronta = impronta_albero(model, features, classi)
+            percorso_impronta = f"{output_path}.impronta"
+            if not forza and os.path.exists(output_path) and os.path.exists(percorso_impronta):
+                with open(percorso_impronta, encoding='utf-8') as f:
+                    if f.read().strip() == impronta:
+                        print(f"\nAlbero decisionale invariato, disegno saltato: {output_path}")
+                        return
+
+            # import "pigri": matplotlib e il modulo di plotting di sklearn servono solo qui.
+            # Si usa direttamente 'Figure' (senza pyplot) così il disegno funziona anche fuori dal thread principale.
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.colors import to_rgba
+            from matplotlib.figure import Figure
+            from matplotlib.text import Annotation
+            from sklearn import tree
+
+            # Aumenta la dimensione della figura per una migliore leggibilità
+            fig = Figure(figsize=(40, 20))
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+
+            annotations = tree.plot_tree(
+                model,
+                feature_names=features,
+                class_names=classi,
+                filled=True,
+                rounded=True,
+                fontsize=10,
+                ax=ax
+            )
+
+            # i box dei nodi compaiono nello stesso ordine dei nodi di 'model.tree_':
+            # i conteggi per classe si leggono da lì invece che dal testo delle annotazioni
+            nodi = [a for a in annotations if isinstance(a, Annotation) and a.get_bbox_patch()]
+            for box, conteggi in zip((a.get_bbox_patch() for a in nodi), conteggi_nodi(model.tree_)):
+                colore = colore_nodo(conteggi, classi)
+                box.set_facecolor(to_rgba(colore[:7], alpha=int(colore[7:], 16) / 255))
+
+            ax.set_title("Albero Decisionale per la Classificazione dei Funghi", fontsize=20)
+
+            fig.savefig(output_path, bbox_inches='tight')
+            with open(percorso_impronta, 'w', encoding='utf-8') as f:
+                f.write(impronta)
             print(f"\nAlbero decisionale salvato in: {output_path}")
         except Exception as e:
             print(f"\nErrore durante il salvataggio dell'albero: {e}")
-        finally:
-            # Chiude la figura per liberare memoria e non mostrarla interattivamente
-            plt.close()
-
 
 if __name__ == '__main__':
     print("Esecuzione di poison_model.py come script principale...")
@@ -223,8 +687,20 @@ if __name__ == '__main__':
         classifier = MushroomClassifier(csv_path='mushrooms.csv')
         print("   Modello addestrato con successo.")
         
-        print("\n2. Generazione della visualizzazione dell'albero decisionale...")
-        classifier.visualize_tree(output_filename="decision_tree.png")
+        print("\n2. Predizione in blocco sull'intero dataset...")
+        # 'leggi_dataset' usa la copia Parquet creata da 'setup_dataset.py' se presente, altrimenti il CSV
+        from mushroom_data import leggi_dataset, risolvi_dataset
+        df_completo = leggi_dataset(risolvi_dataset(os.path.join(os.path.dirname(__file__), 'mushrooms.csv')))
+        predizioni = classifier.predict_batch(df_completo)
+        accuratezza = np.mean(predizioni == df_completo['poisonous'].to_numpy(dtype=str)) * 100
+        print(f"   {len(predizioni)} righe, accuratezza {accuratezza:.2f}%, {classifier.ultimo_throughput:,.0f} righe/sec.")
+
+        print("\n3. Esportazione del modello per il runtime leggero...")
+        percorso_runtime = classifier.esporta_runtime()
+        print(f"   Runtime salvato in: {percorso_runtime}")
+
+        print("\n4. Generazione della visualizzazione dell'albero decisionale...")
+        classifier.visualize_tree(output_filename="decision_tree.svg")
         print("   Visualizzazione completata.")
 
     except FileNotFoundError:
@@ -0,0 +1,133 @@
+# Runtime minimale per le predizioni: dipende solo da NumPy.
+# Carica l'esportazione prodotta da 'MushroomClassifier.esporta_runtime' e percorre
+# l'albero decisionale usando array piatti, senza importare sklearn né pandas.
+# È pensato per i processi di breve durata e per la GUI impacchettata, dove il tempo
+# di avvio e la memoria occupata contano più della flessibilità.
+import os
+import sys
+
+import numpy as np
+
+RUNTIME_FILE = "mushroom_runtime.npz"
+
+
+class MushroomRuntime:
+
+    def __init__(self, runtime_path=None):
+
+        if runtime_path is None:
+            runtime_path = os.path.join(os.path.dirname(__file__), RUNTIME_FILE)
+
+        if not os.path.exists(runtime_path):
+            raise FileNotFoundError(f"ERRORE: Il file '{runtime_path}' non è stato trovato. Esegui prima 'poison_model.py'.")
+
+        with np.load(runtime_path) as dati:
+            self.features_input = [str(f) for f in dati['features_input']]
+            self.etichette = dati['etichette']
+            self.figlio_sinistro = dati['figlio_sinistro']
+            self.figlio_destro = dati['figlio_destro']
+            self.feature = dati['feature']
+            self.soglia = dati['soglia']
+            self.classe_nodo = dati['classe_nodo']
+            self.classi = [dati[f'classi_{i}'] for i in range(len(self.features_input))]
+
+        # dizionari codice -> indice per le predizioni singole
+        self._indici_codici = [{str(c): i for i, c in enumerate(classi)} for classi in self.classi]
+
+        # profondità massima: limita il numero di passi della visita vettoriale
+        self.profondita = self._calcola_profondita()
+
+    def _calcola_profondita(self):
+        profondita = 0
+        livello = [0]
+        while livello:
+            prossimo = []
+            for nodo in livello:
+                if self.figlio_sinistro[nodo] != -1:
+                    prossimo.append(self.figlio_sinistro[nodo])
+                    prossimo.append(self.figlio_destro[nodo])
+            if prossimo:
+                profondita += 1
+            livello = prossimo
+        return profondita
+
+    def predict(self, features_dict):
+
+        if len(features_dict) != len(self.features_input):
+            raise ValueError(f"L'input deve contenere {len(self.features_input)} feature.")
+
+        # stessa codifica di 'MushroomClassifier.predict': i codici sconosciuti diventano 0
+        codici = [
+            self._indici_codici[i].get(features_dict[feature_name], 0)
+            for i, feature_name in enumerate(self.features_input)
+        ]
+
+        nodo = 0
+        while self.figlio_sinistro[nodo] != -1:
+            # sklearn confronta l'input convertito in float32 con la soglia
+            if np.float32(codici[self.feature[nodo]]) <= self.soglia[nodo]:
+                nodo = self.figlio_sinistro[nodo]
+            else:
+                nodo = self.figlio_destro[nodo]
+
+        return self.etichette[self.classe_nodo[nodo]]
+
+    def _codifica_batch(self, dati):
+        """
+        Accetta un dict/DataFrame (accesso per nome di colonna) o un array 2-D
+        con le colonne nell'ordine di 'self.features_input'.
+        """
+        if hasattr(dati, 'keys'):
+            mancanti = [f for f in self.features_input if f not in dati.keys()]
+            if mancanti:
+                raise ValueError(f"Feature mancanti: {mancanti}")
+            colonne = [np.asarray(dati[f]) for f in self.features_input]
+        else:
+            matrice = np.asarray(dati)
+            if matrice.ndim != 2 or matrice.shape[1] != len(self.features_input):
+                raise ValueError(f"L'array deve essere 2-D con {len(self.features_input)} colonne.")
+            colonne = [matrice[:, i] for i in range(matrice.shape[1])]
+
+        n_righe = len(colonne[0]) if colonne else 0
+        codificato = np.zeros((n_righe, len(self.features_input)), dtype=np.float32)
+
+        for i, (classi, valori) in enumerate(zip(self.classi, colonne)):
+            if len(valori) != n_righe:
+                raise ValueError("Tutte le colonne devono avere la stessa lunghezza.")
+            valori = valori.astype(str)
+            posizioni = np.minimum(np.searchsorted(classi, valori), len(classi) - 1)
+            codificato[:, i] = np.where(classi[posizioni] == valori, posizioni, 0)
+
+        return codificato
+
+    def predict_batch(self, dati):
+        """
+        Visita vettoriale: a ogni passo tutte le righe scendono di un livello,
+        quindi il numero di iterazioni è la profondità dell'albero, non il numero di righe.
+        """
+        codificato = self._codifica_batch(dati)
+        righe = np.arange(len(codificato))
+        nodi = np.zeros(len(codificato), dtype=np.int32)
+
+        for _ in range(self.profondita):
+            sinistro = self.figlio_sinistro[nodi]
+            interni = sinistro != -1
+            if not interni.any():
+                break
+            # per le foglie 'feature' vale -2: l'indice viene corretto a 0 e il risultato ignorato
+            colonne = np.where(interni, self.feature[nodi], 0)
+            va_a_sinistra = codificato[righe, colonne] <= self.soglia[nodi]
+            nodi = np.where(interni, np.where(va_a_sinistra, sinistro, self.figlio_destro[nodi]), nodi)
+
+        return self.etichette[self.classe_nodo[nodi]]
+
+
+if __name__ == '__main__':
+    # Uso: python poison_runtime.py cap-shape=x cap-color=n gill-color=k stalk-shape=e odor=n
+    runtime = MushroomRuntime()
+    try:
+        input_utente = dict(arg.split('=', 1) for arg in sys.argv[1:])
+        print(runtime.predict(input_utente))
+    except ValueError as e:
+        print(f"ERRORE: {e}")
+        print(f"Feature richieste: {', '.join(runtime.features_input)}")
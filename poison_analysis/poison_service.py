@@ -0,0 +1,393 @@
+"""
+Servizio locale di predizione basato su asyncio.
+
+Un solo processo carica il 'MushroomClassifier' e lo condivide tra più strumenti tramite
+un endpoint HTTP/JSON (su TCP oppure su socket Unix). Le richieste concorrenti per singoli
+funghi vengono raccolte in micro-batch, svuotati quando raggiungono 'max_batch' elementi
+oppure dopo 'max_attesa_ms' millisecondi, e predette con una sola chiamata a 'predict_batch'.
+
+Endpoint:
+    POST /predict   {"cap-shape": "x", ...}             -> {"risultato": "e"}
+                    {"istanze": [{...}, {...}]}         -> {"risultati": ["e", "p"]}
+    GET  /stato     statistiche su richieste e batch
+
+Uso:
+    python poison_service.py --port 8765 --max-batch 64 --max-attesa-ms 2
+    python poison_service.py --socket /tmp/funghi.sock
+    python poison_service.py --registro registro_modelli        (segue le versioni pubblicate)
+    python poison_service.py --carico 20000 --concorrenza 64     (load test locale, tutto offline)
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from poison_model import MushroomClassifier, MENU_OPZIONI
+
+# dimensione massima accettata per il corpo di una richiesta (oltre si risponde 413)
+MAX_CORPO = 1024 * 1024
+
+
+class MicroBatcher:
+
+    def __init__(self, classifier, max_batch=64, max_attesa_ms=2.0, registro=None):
+
+        if max_batch < 1:
+            raise ValueError("'max_batch' deve essere almeno 1.")
+
+        self.classifier = classifier
+        # registro opzionale ('model_registry.RegistroModelli'): ogni batch usa il modello attivo
+        self.registro = registro
+        self.max_batch = max_batch
+        self.max_attesa = max_attesa_ms / 1000
+
+        # la coda viene creata in 'avvia', dentro l'event loop che la userà
+        self._coda = None
+        self._task = None
+
+        # statistiche esposte da GET /stato
+        self.n_richieste = 0
+        self.n_batch = 0
+        self.n_errori = 0
+
+    def avvia(self):
+        self._coda = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._ciclo())
+
+    async def ferma(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def predict(self, features_dict):
+        """
+        Accoda un singolo fungo e attende il risultato del batch in cui verrà incluso.
+        """
+        futuro = asyncio.get_running_loop().create_future()
+        await self._coda.put((features_dict, futuro))
+        return await futuro
+
+    async def _ciclo(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # il primo elemento apre il batch e fa partire la finestra temporale
+            batch = [await self._coda.get()]
+            scadenza = loop.time() + self.max_attesa
+
+            while len(batch) < self.max_batch:
+                # prima prendiamo tutto ciò che è già in coda, senza attese
+                try:
+                    batch.append(self._coda.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+
+                attesa = scadenza - loop.time()
+                if attesa <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._coda.get(), attesa))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._esegui(batch)
+
+    async def _esegui(self, batch):
+        # un solo riferimento per tutto il batch: una sostituzione a caldo vale dal batch successivo
+        classifier = self.registro.modello if self.registro is not None else self.classifier
+        features = classifier.features_input
+
+        # le richieste non valide ricevono il proprio errore senza bloccare le altre
+        validi = []
+        for features_dict, futuro in batch:
+            mancanti = [f for f in features if f not in features_dict] if isinstance(features_dict, dict) else features
+            # 'None' diventerebbe la stringa "None" e verrebbe codificato come un valore qualsiasi
+            nulli = [f for f in features if features_dict.get(f) is None] if not mancanti else []
+            if mancanti or nulli:
+                self.n_errori += 1
+                errore = f"Feature mancanti: {list(mancanti)}" if mancanti else f"Valori nulli per: {nulli}"
+                if not futuro.done():
+                    futuro.set_exception(ValueError(errore))
+            else:
+                validi.append((features_dict, futuro))
+
+        if not validi:
+            return
+
+        colonne = {f: [str(d[f]) for d, _ in validi] for f in features}
+
+        # la predizione gira in un thread: l'event loop intanto continua ad accodare
+        # richieste, che formeranno il batch successivo
+        loop = asyncio.get_running_loop()
+        try:
+            risultati = await loop.run_in_executor(None, classifier.predict_batch, colonne)
+        except Exception as e:
+            self.n_errori += len(validi)
+            for _, futuro in validi:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.n_batch += 1
+        self.n_richieste += len(validi)
+        for (_, futuro), risultato in zip(validi, risultati):
+            if not futuro.done():
+                futuro.set_result(str(risultato))
+
+
+class PredictionService:
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def gestisci_connessione(self, reader, writer):
+        """
+        Implementazione HTTP/1.1 minimale con keep-alive, sufficiente per i client interni.
+        """
+        try:
+            while True:
+                try:
+                    riga = await reader.readline()
+                except ValueError:
+                    # riga oltre il limite del buffer dello stream ('LimitOverrunError'): il resto
+                    # della richiesta non è più allineato, quindi si risponde e si chiude la connessione
+                    self._scrivi(writer, 400, {'errore': 'riga di richiesta troppo lunga'}, False)
+                    await writer.drain()
+                    break
+                if not riga:
+                    break
+
+                try:
+                    metodo, percorso, versione = riga.decode('latin-1').split()
+                except ValueError:
+                    self._scrivi(writer, 400, {'errore': 'richiesta non valida'}, False)
+                    break
+
+                intestazioni = {}
+                try:
+                    while True:
+                        riga = await reader.readline()
+                        if riga in (b'\r\n', b'\n', b''):
+                            break
+                        chiave, _, valore = riga.decode('latin-1').partition(':')
+                        intestazioni[chiave.strip().lower()] = valore.strip()
+                except ValueError:
+                    self._scrivi(writer, 431, {'errore': 'intestazione troppo lunga'}, False)
+                    await writer.drain()
+                    break
+
+                try:
+                    lunghezza = int(intestazioni.get('content-length', 0))
+                    if lunghezza < 0:
+                        raise ValueError(lunghezza)
+                except ValueError:
+                    # senza una lunghezza valida il corpo non si può leggere: si chiude la connessione
+                    self._scrivi(writer, 400, {'errore': 'Content-Length non valido'}, False)
+                    await writer.drain()
+                    break
+                if lunghezza > MAX_CORPO:
+                    # il corpo non viene letto: la connessione si chiude senza tenerlo in memoria
+                    self._scrivi(writer, 413, {'errore': f"corpo oltre il limite di {MAX_CORPO} byte"}, False)
+                    await writer.drain()
+                    break
+
+                corpo = await reader.readexactly(lunghezza)
+                try:
+                    stato, risposta = await self._instrada(metodo, percorso, corpo)
+                except Exception as e:
+                    # un errore inatteso riguarda solo questa richiesta, non la connessione né il servizio
+                    stato, risposta = 500, {'errore': f"errore interno: {e}"}
+
+                keep_alive = versione == 'HTTP/1.1' and intestazioni.get('connection', '').lower() != 'close'
+                self._scrivi(writer, stato, risposta, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def _instrada(self, metodo, percorso, corpo):
+        if metodo == 'GET' and percorso == '/stato':
+            b = self.batcher
+            return 200, {
+                'richieste': b.n_richieste,
+                'batch': b.n_batch,
+                'errori': b.n_errori,
+                'dimensione_media_batch': b.n_richieste / b.n_batch if b.n_batch else 0.0,
+                'max_batch': b.max_batch,
+                'max_attesa_ms': b.max_attesa * 1000,
+                'versione_modello': b.registro.versione if b.registro is not None else None,
+            }
+
+        if metodo != 'POST' or percorso != '/predict':
+            return 404, {'errore': f"endpoint '{metodo} {percorso}' non trovato"}
+
+        try:
+            dati = json.loads(corpo or b'{}')
+        except json.JSONDecodeError:
+            return 400, {'errore': 'JSON non valido'}
+
+        if not isinstance(dati, dict):
+            return 400, {'errore': "il corpo deve essere un oggetto JSON"}
+        if 'istanze' in dati and not (isinstance(dati['istanze'], list)
+                                      and all(isinstance(d, dict) for d in dati['istanze'])):
+            return 400, {'errore': "'istanze' deve essere una lista di oggetti JSON"}
+
+        try:
+            if 'istanze' in dati:
+                # ogni istanza passa dal batcher, così si mescola con le richieste degli altri client
+                risultati = await asyncio.gather(*(self.batcher.predict(d) for d in dati['istanze']))
+                return 200, {'risultati': list(risultati)}
+            return 200, {'risultato': await self.batcher.predict(dati)}
+        except ValueError as e:
+            return 400, {'errore': str(e)}
+
+    @staticmethod
+    def _scrivi(writer, stato, risposta, keep_alive):
+        corpo = json.dumps(risposta).encode()
+        motivi = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                  431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+        intestazioni = (
+            f"HTTP/1.1 {stato} {motivi.get(stato, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(intestazioni.encode('latin-1') + corpo)
+
+
+async def avvia_server(classifier, host='127.0.0.1', port=8765, socket_path=None, max_batch=64, max_attesa_ms=2.0,
+                       registro=None):
+    batcher = MicroBatcher(classifier, max_batch=max_batch, max_attesa_ms=max_attesa_ms, registro=registro)
+    batcher.avvia()
+    servizio = PredictionService(batcher)
+
+    if socket_path:
+        server = await asyncio.start_unix_server(servizio.gestisci_connessione, path=socket_path)
+    else:
+        server = await asyncio.start_server(servizio.gestisci_connessione, host, port)
+    return server, batcher
+
+
+# --- Load test locale ---
+
+def _fungo_casuale(rng):
+    return {feature: rng.choice(list(opzioni.values())) for feature, opzioni in MENU_OPZIONI.items()}
+
+
+async def _client(apri_connessione, n_richieste, latenze, rng):
+    reader, writer = await apri_connessione()
+    try:
+        for _ in range(n_richieste):
+            corpo = json.dumps(_fungo_casuale(rng)).encode()
+            richiesta = (
+                f"POST /predict HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(corpo)}\r\n\r\n"
+            ).encode('latin-1') + corpo
+
+            inizio = time.perf_counter()
+            writer.write(richiesta)
+            await writer.drain()
+
+            lunghezza = 0
+            await reader.readline()
+            while True:
+                riga = await reader.readline()
+                if riga in (b'\r\n', b'\n', b''):
+                    break
+                chiave, _, valore = riga.decode('latin-1').partition(':')
+                if chiave.strip().lower() == 'content-length':
+                    lunghezza = int(valore)
+            await reader.readexactly(lunghezza)
+            latenze.append(time.perf_counter() - inizio)
+    finally:
+        writer.close()
+
+
+async def load_test(n_richieste, concorrenza, host='127.0.0.1', port=8765, socket_path=None, seed=0):
+    """
+    Genera 'n_richieste' singole da 'concorrenza' connessioni keep-alive parallele.
+    """
+    if socket_path:
+        apri = lambda: asyncio.open_unix_connection(socket_path)
+    else:
+        apri = lambda: asyncio.open_connection(host, port)
+
+    rng = random.Random(seed)
+    latenze = []
+    per_client = [n_richieste // concorrenza + (1 if i < n_richieste % concorrenza else 0) for i in range(concorrenza)]
+
+    inizio = time.perf_counter()
+    await asyncio.gather(*(_client(apri, n, latenze, rng) for n in per_client if n))
+    durata = time.perf_counter() - inizio
+
+    latenze.sort()
+    return {
+        'richieste': len(latenze),
+        'richieste_al_secondo': len(latenze) / durata if durata > 0 else float('inf'),
+        'p50_ms': statistics.median(latenze) * 1000,
+        'p99_ms': latenze[min(len(latenze) - 1, int(len(latenze) * 0.99))] * 1000,
+    }
+
+
+async def _main(args):
+    registro = None
+    if args.registro:
+        from model_registry import RegistroModelli
+
+        registro = RegistroModelli(args.registro, lookup_table=args.tabella)
+        if registro.modello is None:
+            raise SystemExit(f"ERRORE: Il registro '{args.registro}' non ha una versione attiva valida.")
+        registro.avvia()
+        classifier = registro.modello
+    else:
+        classifier = MushroomClassifier(lookup_table=args.tabella)
+    server, batcher = await avvia_server(
+        classifier, host=args.host, port=args.port, socket_path=args.socket,
+        max_batch=args.max_batch, max_attesa_ms=args.max_attesa_ms, registro=registro
+    )
+    indirizzo = args.socket or f"http://{args.host}:{args.port}"
+
+    if args.carico:
+        # server e client nello stesso processo: utile per misurare il servizio su una sola macchina
+        async with server:
+            risultati = await load_test(args.carico, args.concorrenza, args.host, args.port, args.socket)
+        await batcher.ferma()
+        print(f"Richieste: {risultati['richieste']} | {risultati['richieste_al_secondo']:,.0f} req/s | "
+              f"p50 {risultati['p50_ms']:.2f} ms | p99 {risultati['p99_ms']:.2f} ms | "
+              f"batch medio {batcher.n_richieste / max(batcher.n_batch, 1):.1f}")
+        return
+
+    print(f"Servizio di predizione in ascolto su {indirizzo} (max_batch={args.max_batch}, max_attesa={args.max_attesa_ms} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servizio locale di predizione con micro-batching.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help="Percorso di un socket Unix da usare al posto di TCP.")
+    parser.add_argument('--max-batch', type=int, default=64, help="Numero massimo di richieste per batch.")
+    parser.add_argument('--max-attesa-ms', type=float, default=2.0, help="Attesa massima prima di svuotare un batch.")
+    parser.add_argument('--tabella', action='store_true', help="Usa la tabella delle predizioni precalcolate.")
+    parser.add_argument('--registro', help="Cartella di un registro dei modelli da seguire (sostituzione a caldo).")
+    parser.add_argument('--carico', type=int, default=0, help="Esegue un load test con N richieste e termina.")
+    parser.add_argument('--concorrenza', type=int, default=32, help="Connessioni parallele del load test.")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        print("\nServizio terminato.")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,23 +3,68 @@ from tkinter import ttk, messagebox
 import sys
 
 try:
-    from poison_model import MushroomClassifier
+    from poison_model import MushroomClassifier, FEATURES_INPUT, MENU_OPZIONI, NOMI_FEATURES_ITA
 except ImportError:
     messagebox.showerror("Errore Critico", "Il file 'poison_model.py' non è stato trovato. Assicurati che sia nella stessa cartella.")
     sys.exit(1)
 
+# 'poison_model' ha già aggiunto la cartella 'data' al 'sys.path'
+from tk_watchdog import installa_da_ambiente
+
 
 class MushroomGUI:
-    def __init__(self, root): #costruttore
+    def __init__(self, root, registro=None): #costruttore
         # --- Configurazione della Finestra Principale ---
         self.root = root
         self.root.title("Analizzatore di Funghi") # Titolo della finestra
         self.root.resizable(False, False) # Impedisce all'utente di ridimensionare la finestra
 
+        # il classificatore viene caricato solo dopo che la finestra è comparsa (vedi '_carica_modello')
+        self.classifier = None
+
+        # cartella opzionale di un registro dei modelli: le nuove versioni pubblicate
+        # sostituiscono il modello senza riavviare l'applicazione
+        self.cartella_registro = registro
+        self.registro = None
+
+        # funzione opzionale chiamata quando il modello è pronto (usata dal benchmark di avvio)
+        self.al_modello_pronto = None
+
+        # Un dizionario variabili menu a tendina.
+        self.feature_vars = {}
+        self._create_widgets()
+
+        self.root.eval('tk::PlaceWindow . center')
+
+        # i menu dipendono solo dalla configurazione delle feature, quindi la finestra può
+        # apparire subito; caricamento dell'artefatto o addestramento avvengono subito dopo.
+        self.root.after(10, self._carica_modello)
+
+        # watchdog opzionale della reattività della finestra (variabile d'ambiente FUNGHI_WATCHDOG)
+        self.watchdog = installa_da_ambiente(self.root, "poison_tester_gui")
+
+    def _carica_modello(self):
+
         csv_name = 'mushrooms.csv'
 
+        if self.cartella_registro:
+            from model_registry import RegistroModelli, verifica_compatibilita
+
+            # i menu sono costruiti da FEATURES_INPUT e MENU_OPZIONI: versioni diverse vengono rifiutate
+            self.registro = RegistroModelli(
+                self.cartella_registro,
+                validazione=lambda modello: verifica_compatibilita(modello, FEATURES_INPUT, MENU_OPZIONI)
+            )
+            if self.registro.modello is None:
+                # registro vuoto o versione attiva non valida: si parte dal modello locale
+                print(f"ATTENZIONE: Nessun modello valido nel registro '{self.cartella_registro}', uso quello locale.")
+            else:
+                self.classifier = self.registro.modello
+            self.registro.avvia()
+
         try:
-            self.classifier = MushroomClassifier(csv_name)
+            if self.classifier is None:
+                self.classifier = MushroomClassifier(csv_name)
         except FileNotFoundError as e:
             messagebox.showerror(
                 "Errore Critico",
@@ -28,11 +73,11 @@ class MushroomGUI:
             self.root.after(100, self.root.destroy)
             return
 
-        # Un dizionario variabili menu a tendina.
-        self.feature_vars = {}
-        self._create_widgets()
+        self.result_label.config(text="")
+        self.analyze_button.state(['!disabled'])
 
-        self.root.eval('tk::PlaceWindow . center')
+        if self.al_modello_pronto:
+            self.al_modello_pronto()
 
     def _setup_styles(self):
 
@@ -94,16 +139,16 @@ class MushroomGUI:
         ttk.Label(main_frame, text="Seleziona le caratteristiche del fungo:", style='Header.TLabel').pack(pady=(0, 15))
 
         # crea dinamicamente i menu a tendina
-        for feature in self.classifier.features_input:
+        for feature in FEATURES_INPUT:
             frame = ttk.Frame(main_frame)
             frame.pack(fill='x', pady=5, padx=10)
 
 
-            label_text = self.classifier.nomi_features_ita.get(feature, feature).title()
+            label_text = NOMI_FEATURES_ITA.get(feature, feature).title()
             ttk.Label(frame, text=f"{label_text}:", width=22, style='Feature.TLabel').pack(side="left")
 
 
-            opzioni = list(self.classifier.menu_opzioni[feature].keys())
+            opzioni = list(MENU_OPZIONI[feature].keys())
             # Creiamo una variabile speciale di tkinter per memorizzare la scelta dell'utente.
             var = tk.StringVar()
 
@@ -117,17 +162,23 @@ class MushroomGUI:
 
         exit_button = ttk.Button(button_frame, text="Esci", command=self.root.destroy, style="Exit.TButton")
         exit_button.pack(side="left", padx=10)
-        analyze_button = ttk.Button(button_frame, text="Analizza", command=self.analyze_mushroom, style="Analyze.TButton")
-        analyze_button.pack(side="left", padx=10)
+        # disabilitato finché il modello non è stato caricato
+        self.analyze_button = ttk.Button(button_frame, text="Analizza", command=self.analyze_mushroom, style="Analyze.TButton")
+        self.analyze_button.pack(side="left", padx=10)
+        self.analyze_button.state(['disabled'])
 
 
 
-        self.result_label = ttk.Label(main_frame, text="", style="Result.TLabel")
+        self.result_label = ttk.Label(main_frame, text="Caricamento del modello...", style="Result.TLabel")
         self.result_label.pack(pady=10, fill='x', expand=True)
 
     def analyze_mushroom(self):
 
-        input_codes = {}
+        # con il registro si usa l'ultima versione in servizio, letta una volta sola per questa analisi
+        if self.registro is not None and self.registro.modello is not None:
+            self.classifier = self.registro.modello
+
+        scelte = {}
         # raccoglie scelte dei menu a tenda
         for feature, var in self.feature_vars.items():
             scelta_italiano = var.get()
@@ -136,13 +187,16 @@ class MushroomGUI:
                 feature_name_ita = self.classifier.nomi_features_ita.get(feature, feature).title()
                 messagebox.showwarning("Input Mancante", f"Per favore, seleziona un valore per '{feature_name_ita}'.")
                 return
+            scelte[feature] = scelta_italiano
 
-            # encoding
-            codice_dataset = self.classifier.menu_opzioni[feature][scelta_italiano]
-            input_codes[feature] = codice_dataset
-
-        # predizione
+        # encoding e predizione
         try:
+            input_codes = {}
+            for feature, scelta_italiano in scelte.items():
+                try:
+                    input_codes[feature] = self.classifier.menu_opzioni[feature][scelta_italiano]
+                except KeyError:
+                    raise ValueError(f"il modello in uso non prevede '{scelta_italiano}' per '{feature}'")
             risultato = self.classifier.predict(input_codes)
             # Mostriamo il risultato all'utente.
             self.display_result(risultato)
@@ -161,7 +215,24 @@ class MushroomGUI:
 if __name__ == "__main__":
     # crea la finestra principale
     root = tk.Tk()
-    # crea un'istanza della classe GUI
-    app = MushroomGUI(root)
+    # crea un'istanza della classe GUI ('--registro CARTELLA' per seguire un registro dei modelli)
+    registro = sys.argv[sys.argv.index("--registro") + 1] if "--registro" in sys.argv[:-1] else None
+    app = MushroomGUI(root, registro=registro)
+
+    # modalità usata da 'benchmarks/startup_benchmark.py': stampa un marcatore quando la
+    # finestra compare e quando il modello è pronto, poi chiude l'applicazione.
+    if "--benchmark-avvio" in sys.argv:
+        def _finestra_visibile(event):
+            if event.widget is root:
+                root.unbind('<Map>')
+                print("PRIMA_FINESTRA", flush=True)
+
+        def _modello_pronto():
+            print("MODELLO_PRONTO", flush=True)
+            root.after(0, root.destroy)
+
+        root.bind('<Map>', _finestra_visibile)
+        app.al_modello_pronto = _modello_pronto
+
     #  Avvia l'event loop di tkinter. Questo tiene la finestra aperta e in ascolto di eventi
     root.mainloop()
@@ -0,0 +1,209 @@
+"""
+Classificazione in blocco di file CSV di qualsiasi dimensione.
+
+Il file viene letto a blocchi ('--righe-blocco'), i blocchi vengono distribuiti a un pool
+di processi in cui ogni worker carica il modello una sola volta (dall'artefatto salvato),
+e i risultati vengono scritti nello stesso ordine dell'input, in CSV oppure in Parquet.
+In memoria restano al massimo pochi blocchi alla volta.
+
+Uso:
+    python score_csv.py osservazioni.csv predizioni.csv
+    python score_csv.py osservazioni.csv predizioni.parquet --processi 8 --righe-blocco 200000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from poison_model import MushroomClassifier
+
+# modello del processo worker, caricato una volta sola da '_inizializza_worker'
+_classifier = None
+
+
+def _inizializza_worker(artifact_path, lookup_table):
+    global _classifier
+    _classifier = MushroomClassifier(artifact_path=artifact_path, artifact_only=True, lookup_table=lookup_table)
+
+
+def _classifica_blocco(colonne):
+    # ai worker arrivano solo le colonne delle feature, non l'intero blocco
+    return _classifier.predict_batch(colonne)
+
+
+def picco_rss_mb():
+    """
+    Picco di memoria residente (MB) del processo principale e del worker più grande.
+    Restituisce (None, None) dove il modulo 'resource' non è disponibile (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None, None
+
+    # su Linux 'ru_maxrss' è in KB, su macOS in byte
+    divisore = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    principale = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisore
+    figli = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisore
+    return principale, figli
+
+
+class ScrittoreRisultati:
+    """
+    Scrive i blocchi in ordine su CSV o Parquet (il formato dipende dall'estensione).
+    I blocchi finiscono in un file temporaneo che 'conferma' sposta su 'output_path' solo a
+    elaborazione completata: un errore o un'interruzione non lasciano un output troncato.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.temporaneo = f"{output_path}.{os.getpid()}.tmp"
+        self.parquet = output_path.endswith('.parquet')
+        self._writer = None
+        self._primo = True
+
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Per scrivere file Parquet è necessario installare 'pyarrow'.")
+
+    def scrivi(self, blocco):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabella = pa.Table.from_pandas(blocco, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.temporaneo, tabella.schema)
+            self._writer.write_table(tabella)
+        else:
+            blocco.to_csv(self.temporaneo, mode='w' if self._primo else 'a', header=self._primo, index=False)
+        self._primo = False
+
+    def chiudi(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def conferma(self):
+        if os.path.exists(self.temporaneo):
+            os.replace(self.temporaneo, self.output_path)
+
+    def scarta(self):
+        if os.path.exists(self.temporaneo):
+            os.remove(self.temporaneo)
+
+
+def classifica_csv(input_path, output_path, processi=None, righe_blocco=100_000, solo_predizioni=False,
+                   colonna_output='predizione', lookup_table=True):
+    """
+    Classifica 'input_path' e scrive i risultati in 'output_path'.
+    Restituisce un dict con righe elaborate, durata, righe/sec e picco di memoria.
+    """
+    inizio = time.perf_counter()
+
+    # il processo principale verifica (ed eventualmente rigenera) l'artefatto, che i worker
+    # caricheranno poi in modalità solo-artefatto senza rileggere il dataset di addestramento
+    classifier = MushroomClassifier()
+    features = classifier.features_input
+    artifact_path = classifier.artifact_path
+
+    if processi is None:
+        processi = os.cpu_count() or 1
+
+    # 'dtype=str' e 'keep_default_na=False' mantengono i codici così come sono (es. '?')
+    lettore = pd.read_csv(input_path, chunksize=righe_blocco, dtype=str, keep_default_na=False)
+    scrittore = ScrittoreRisultati(output_path)
+    n_righe = 0
+
+    def _colonne(blocco):
+        mancanti = [f for f in features if f not in blocco.columns]
+        if mancanti:
+            raise ValueError(f"Colonne mancanti nel file di input: {mancanti}")
+        return {f: blocco[f].to_numpy() for f in features}
+
+    def _scrivi(blocco, predizioni):
+        nonlocal n_righe
+        if solo_predizioni:
+            blocco = pd.DataFrame({colonna_output: predizioni})
+        else:
+            blocco = blocco.assign(**{colonna_output: predizioni})
+        scrittore.scrivi(blocco)
+        n_righe += len(blocco)
+
+    completato = False
+    try:
+        if processi <= 1:
+            _inizializza_worker(artifact_path, lookup_table)
+            for blocco in lettore:
+                _scrivi(blocco, _classifica_blocco(_colonne(blocco)))
+        else:
+            # al massimo due blocchi in volo per processo: la memoria resta limitata
+            # anche se la lettura è più veloce della classificazione
+            max_in_volo = 2 * processi
+            in_volo = deque()
+            with ProcessPoolExecutor(max_workers=processi, initializer=_inizializza_worker,
+                                     initargs=(artifact_path, lookup_table)) as pool:
+                for blocco in lettore:
+                    futuro = pool.submit(_classifica_blocco, _colonne(blocco))
+                    in_volo.append((blocco, futuro))
+
+                    # i blocchi vengono scritti in ordine di arrivo, quindi nell'ordine dell'input
+                    while len(in_volo) >= max_in_volo:
+                        blocco_pronto, futuro_pronto = in_volo.popleft()
+                        _scrivi(blocco_pronto, futuro_pronto.result())
+
+                while in_volo:
+                    blocco_pronto, futuro_pronto = in_volo.popleft()
+                    _scrivi(blocco_pronto, futuro_pronto.result())
+        completato = True
+    finally:
+        scrittore.chiudi()
+        if completato:
+            scrittore.conferma()
+        else:
+            scrittore.scarta()
+
+    durata = time.perf_counter() - inizio
+    rss_principale, rss_worker = picco_rss_mb()
+    return {
+        'righe': n_righe,
+        'secondi': durata,
+        'righe_al_secondo': n_righe / durata if durata > 0 else float('inf'),
+        'picco_rss_mb': rss_principale,
+        'picco_rss_worker_mb': rss_worker,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classifica in blocco un CSV di osservazioni di funghi.")
+    parser.add_argument('input', help="CSV di input con (almeno) le colonne delle feature del modello.")
+    parser.add_argument('output', help="File di output: '.csv' oppure '.parquet'.")
+    parser.add_argument('--processi', type=int, default=None, help="Numero di processi worker (default: tutti i core).")
+    parser.add_argument('--righe-blocco', type=int, default=100_000, help="Righe lette per ogni blocco.")
+    parser.add_argument('--solo-predizioni', action='store_true', help="Scrive solo la colonna delle predizioni.")
+    parser.add_argument('--colonna-output', default='predizione', help="Nome della colonna con le predizioni.")
+    parser.add_argument('--senza-tabella', action='store_true', help="Non usa la tabella delle predizioni precalcolate.")
+    args = parser.parse_args()
+
+    risultati = classifica_csv(
+        args.input, args.output, processi=args.processi, righe_blocco=args.righe_blocco,
+        solo_predizioni=args.solo_predizioni, colonna_output=args.colonna_output,
+        lookup_table=not args.senza_tabella
+    )
+
+    print(f"Classificate {risultati['righe']:,} righe in {risultati['secondi']:.2f} s "
+          f"({risultati['righe_al_secondo']:,.0f} righe/sec).")
+    if risultati['picco_rss_mb'] is not None:
+        print(f"Picco RSS: {risultati['picco_rss_mb']:.1f} MB (processo principale), "
+              f"{risultati['picco_rss_worker_mb']:.1f} MB (worker più grande).")
+    print(f"Risultati salvati in: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,128 +1,341 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import classification_report, confusion_matrix
+"""
+Valutazione statistica del classificatore di funghi.
+
+Importabile come modulo ('valuta_modello' restituisce risultati strutturati) oppure
+eseguibile come script, che salva il report testuale e la matrice di confusione in 'data/'.
+
+La valutazione usa una k-fold stratificata ripetuta, con i fold distribuiti su un pool di
+processi. Il dataset viene codificato una sola volta dal caricatore condiviso ('mushroom_data'):
+i worker aprono in memory-map la stessa matrice di codici uint8 invece di riceverne una copia.
+Report e grafico vengono generati dai risultati, senza ricalcolare nulla; i risultati sono
+salvati in cache e riutilizzati finché dataset e parametri non cambiano.
+
+Uso:
+    python test_stats.py
+    python test_stats.py --fold 10 --ripetizioni 5 --processi 4
+"""
+import argparse
+import hashlib
+import json
 import os
-from matplotlib.colors import LinearSegmentedColormap
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# --- 1. PREPARAZIONE DEI DATI ---
+import numpy as np
 
-# Definiamo il percorso del file CSV. Lo script si aspetta che 'mushrooms.csv'
-# sia nella stessa cartella.
-script_dir = os.path.dirname(__file__)
-csv_path = os.path.join(script_dir, 'mushrooms.csv')
-df = pd.read_csv(csv_path)
+# Il caricatore condiviso del dataset vive nella cartella 'data' del progetto.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'data'))
+if DATA_DIR not in sys.path:
+    sys.path.append(DATA_DIR)
 
-# Definiamo la cartella di output per i risultati.
-# I risultati verranno salvati nella cartella 'data' del progetto.
-output_dir = os.path.join(script_dir, '..', 'data')
-os.makedirs(output_dir, exist_ok=True)
+from mushroom_data import carica_codici, risolvi_dataset
+from pipeline_trace import span, traccia
 
-# Selezioniamo le stesse feature utilizzate per l'addestramento del modello.
-features_input = [
+# incrementare se cambia il contenuto dei risultati salvati in cache
+VERSIONE_RISULTATI = 1
+
+# il CSV accanto allo script se c'è, altrimenti la copia canonica in 'data/'
+CSV_DEFAULT = risolvi_dataset(os.path.join(SCRIPT_DIR, 'mushrooms.csv'))
+CARTELLA_CACHE = os.path.join(SCRIPT_DIR, '.cache_valutazione')
+
+# Le feature valutate: quelle del modello più 'veil-type' e 'veil-color'.
+FEATURES_VALUTAZIONE = [
     'cap-shape', 'cap-color', 'gill-color',
     'stalk-shape', 'veil-type', 'veil-color', 'odor'
 ]
 
-# Separiamo le feature (X) dal target (y).
-X = df[features_input].copy()
-y = df['poisonous']
+NOMI_CLASSI = ['Commestibile', 'Velenoso']
+
+# matrice dei codici e target del processo worker, caricati una volta sola da '_inizializza_worker'
+_X = None
+_y = None
+
+
+@traccia("valutazione.inizializza_worker")
+def _inizializza_worker(csv_path, features):
+    global _X, _y
+    # la cache '.npy' esiste già (l'ha creata il processo principale): qui è solo un memory-map
+    dataset = carica_codici(csv_path)
+    _X = dataset.seleziona(features)
+    _y = np.asarray(dataset.colonna('poisonous'))
+
+
+def metriche_da_confusione(cm):
+    """
+    Accuratezza, precisione, richiamo e F1 (classe positiva: velenoso) da una matrice 2x2.
+    """
+    tn, fp, fn, tp = (int(v) for v in np.asarray(cm).ravel())
+    totale = tn + fp + fn + tp
+    precisione = tp / (tp + fp) if tp + fp else 0.0
+    richiamo = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precisione * richiamo / (precisione + richiamo) if precisione + richiamo else 0.0
+    return {
+        'accuratezza': (tn + tp) / totale if totale else 0.0,
+        'precisione': precisione,
+        'richiamo': richiamo,
+        'f1': f1,
+        'falsi_positivi': fp,
+        'falsi_negativi': fn,
+    }
+
+
+@traccia("valutazione.fold")
+def _valuta_fold(parametri):
+    from sklearn.tree import DecisionTreeClassifier
+
+    ripetizione, fold, indici_train, indici_test = parametri
+    model = DecisionTreeClassifier(random_state=42)
+
+    inizio = time.perf_counter()
+    with span("valutazione.fit", ripetizione=ripetizione, fold=fold):
+        model.fit(_X[indici_train], _y[indici_train])
+    tempo_fit = time.perf_counter() - inizio
+
+    inizio = time.perf_counter()
+    with span("valutazione.predict", ripetizione=ripetizione, fold=fold):
+        predizioni = model.predict(_X[indici_test])
+    tempo_predict = time.perf_counter() - inizio
+
+    # matrice di confusione 2x2 con un solo 'bincount' (righe: realtà, colonne: predizione)
+    cm = np.bincount(_y[indici_test].astype(np.int64) * 2 + predizioni, minlength=4).reshape(2, 2)
 
-# Codifichiamo le feature categoriali in valori numerici.
-for col in X.columns:
-    le = LabelEncoder()
-    X[col] = le.fit_transform(X[col])
+    risultato = {
+        'ripetizione': ripetizione,
+        'fold': fold,
+        'n_train': len(indici_train),
+        'n_test': len(indici_test),
+        'tempo_fit': tempo_fit,
+        'tempo_predict': tempo_predict,
+        'matrice_confusione': cm.tolist(),
+    }
+    risultato.update(metriche_da_confusione(cm))
+    return risultato
 
-# Codifichiamo anche il target.
-le_target = LabelEncoder()
-y = le_target.fit_transform(y)
 
-# --- 2. DIVISIONE DEL DATASET E ADDESTRAMENTO DEL MODELLO ---
+def _chiave_cache(dataset, features, n_fold, n_ripetizioni, random_state):
+    import sklearn
 
-# Dividiamo il dataset in un set di addestramento (70%) e un set di test (30%).
-# 'random_state=42' assicura che la divisione sia sempre la stessa.
-# 'stratify=y' mantiene la stessa proporzione di funghi velenosi e commestibili
-# in entrambi i set.
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42, stratify=y)
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(dataset.codici).tobytes())
+    h.update(json.dumps([VERSIONE_RISULTATI, dataset.colonne, list(features), n_fold, n_ripetizioni,
+                         random_state, sklearn.__version__]).encode())
+    return h.hexdigest()
 
-# Creiamo e addestriamo il modello di albero decisionale.
-model = DecisionTreeClassifier(random_state=42)
-model.fit(X_train, y_train)
 
-# Eseguiamo le predizioni sul set di test.
-y_pred = model.predict(X_test)
+@traccia("valutazione.totale")
+def valuta_modello(csv_path=CSV_DEFAULT, features=FEATURES_VALUTAZIONE, n_fold=5, n_ripetizioni=3,
+                   random_state=42, processi=None, usa_cache=True):
+    """
+    K-fold stratificata ripetuta del 'DecisionTreeClassifier'. Restituisce un dict con:
+      - 'fold': metriche, tempi di fit/predict e matrice di confusione di ogni fold;
+      - 'riepilogo': media e deviazione standard di ogni metrica sui fold;
+      - 'matrice_confusione': somma delle matrici di tutti i fold;
+      - 'parametri', 'tempo_totale' e 'dalla_cache'.
+    """
+    from sklearn.model_selection import RepeatedStratifiedKFold
 
-# --- 3. CALCOLO DELLE STATISTICHE DI VALUTAZIONE ---
+    features = list(features)
+    dataset = carica_codici(csv_path)
+    # metriche e matrice di confusione dei fold sono quelle di un problema binario
+    classi = [str(c) for c in dataset.categorie['poisonous']]
+    if len(classi) != 2:
+        raise ValueError(f"La colonna 'poisonous' deve avere esattamente 2 classi, trovate {len(classi)}: {classi}")
 
-# Generiamo un report di classificazione che include precisione, richiamo e F1-score.
-report = classification_report(y_test, y_pred, target_names=['Commestibile', 'Velenoso'])
+    percorso_cache = None
+    if usa_cache:
+        chiave = _chiave_cache(dataset, features, n_fold, n_ripetizioni, random_state)
+        percorso_cache = os.path.join(CARTELLA_CACHE, f"{chiave}.json")
+        if os.path.exists(percorso_cache):
+            try:
+                with open(percorso_cache) as f:
+                    risultati = json.load(f)
+                risultati['dalla_cache'] = True
+                return risultati
+            except (OSError, ValueError):
+                # file illeggibile: ripetiamo la valutazione
+                pass
 
-# Calcoliamo la matrice di confusione per vedere gli errori in dettaglio.
-cm = confusion_matrix(y_test, y_pred)
+    inizio = time.perf_counter()
+    y = np.asarray(dataset.colonna('poisonous'))
+    divisore = RepeatedStratifiedKFold(n_splits=n_fold, n_repeats=n_ripetizioni, random_state=random_state)
+    # ai worker arrivano solo gli indici dei fold, i dati li leggono dal memory-map
+    with span("valutazione.split", n_fold=n_fold, n_ripetizioni=n_ripetizioni):
+        lavori = [(i // n_fold, i % n_fold, train.astype(np.int32), test.astype(np.int32))
+                  for i, (train, test) in enumerate(divisore.split(np.zeros(len(y)), y))]
 
-# Eseguiamo una cross-validation a 5 fold per una stima più robusta dell'accuratezza.
-scores = cross_val_score(model, X, y, cv=5)
-accuracy_cv = scores.mean() * 100
-std_cv = scores.std() * 100
+    processi = max(1, min(processi or os.cpu_count() or 1, len(lavori)))
+    if processi == 1:
+        _inizializza_worker(csv_path, features)
+        risultati_fold = [_valuta_fold(lavoro) for lavoro in lavori]
+    else:
+        with ProcessPoolExecutor(processi, initializer=_inizializza_worker, initargs=(csv_path, features)) as pool:
+            risultati_fold = list(pool.map(_valuta_fold, lavori))
 
-# --- 4. CREAZIONE E SALVATAGGIO DEL REPORT TESTUALE ---
+    metriche = ['accuratezza', 'precisione', 'richiamo', 'f1', 'falsi_negativi', 'falsi_positivi',
+                'tempo_fit', 'tempo_predict']
+    riepilogo = {}
+    for nome in metriche:
+        valori = np.array([r[nome] for r in risultati_fold], dtype=np.float64)
+        riepilogo[nome] = {'media': float(valori.mean()), 'std': float(valori.std())}
 
-# Creiamo una stringa formattata con tutti i risultati.
-testo_output = f"""
+    risultati = {
+        'parametri': {
+            'csv_path': os.path.abspath(csv_path),
+            'features': features,
+            'n_fold': n_fold,
+            'n_ripetizioni': n_ripetizioni,
+            'random_state': random_state,
+            'processi': processi,
+            'n_righe': len(y),
+        },
+        'fold': risultati_fold,
+        'riepilogo': riepilogo,
+        'matrice_confusione': np.sum([r['matrice_confusione'] for r in risultati_fold], axis=0).tolist(),
+        'tempo_totale': time.perf_counter() - inizio,
+        'dalla_cache': False,
+    }
+
+    if percorso_cache:
+        try:
+            os.makedirs(CARTELLA_CACHE, exist_ok=True)
+            temporaneo = f"{percorso_cache}.{os.getpid()}.tmp"
+            with open(temporaneo, 'w') as f:
+                json.dump(risultati, f, indent=2)
+            os.replace(temporaneo, percorso_cache)
+        except OSError as e:
+            print(f"ATTENZIONE: Impossibile salvare i risultati in cache: {e}")
+
+    return risultati
+
+
+def _report_classificazione(cm):
+    """
+    Tabella precisione/richiamo/F1/supporto per classe, nello stile di 'classification_report',
+    ricavata dalla matrice di confusione complessiva.
+    """
+    cm = np.asarray(cm)
+    righe = [f"{'':>14}{'precision':>10}{'recall':>10}{'f1-score':>10}{'support':>10}", ""]
+    for i, nome in enumerate(NOMI_CLASSI):
+        predetti, reali = cm[:, i].sum(), cm[i, :].sum()
+        precisione = cm[i, i] / predetti if predetti else 0.0
+        richiamo = cm[i, i] / reali if reali else 0.0
+        f1 = 2 * precisione * richiamo / (precisione + richiamo) if precisione + richiamo else 0.0
+        righe.append(f"{nome:>14}{precisione:>10.2f}{richiamo:>10.2f}{f1:>10.2f}{reali:>10}")
+    righe.append("")
+    righe.append(f"{'accuracy':>14}{'':>10}{'':>10}{np.trace(cm) / cm.sum():>10.2f}{cm.sum():>10}")
+    return "\n".join(righe)
+
+
+@traccia("valutazione.report")
+def genera_report(risultati):
+    """
+    Testo del report statistico, ottenuto dai risultati di 'valuta_modello'.
+    """
+    p = risultati['parametri']
+    r = risultati['riepilogo']
+    cm = risultati['matrice_confusione']
+    n_fold_totali = len(risultati['fold'])
+
+    return f"""
 =============================================
 REPORT STATISTICO COMPLETO - MUSHROOM DATASET
 =============================================
 
-1. ACCURATEZZA (Cross-Validation 5-fold)
+1. ACCURATEZZA (Cross-Validation {p['n_fold']}-fold stratificata, ripetuta {p['n_ripetizioni']} volte)
 ----------------------------------------
-Media: {accuracy_cv:.2f}%
-Deviazione Standard: +/- {std_cv:.2f}%
+Media: {r['accuratezza']['media'] * 100:.2f}%
+Deviazione Standard: +/- {r['accuratezza']['std'] * 100:.2f}%
+Falsi negativi per fold: {r['falsi_negativi']['media']:.1f} (+/- {r['falsi_negativi']['std']:.1f})
 
-2. REPORT DI CLASSIFICAZIONE
+2. REPORT DI CLASSIFICAZIONE (tutti i {n_fold_totali} fold)
 ----------------------------------------
-{report}
+{_report_classificazione(cm)}
 
-3. DETTAGLIO ERRORI (Matrice di Confusione)
+3. DETTAGLIO ERRORI (Matrice di Confusione complessiva)
 ----------------------------------------
-Su un totale di {len(y_test)} funghi testati:
+Su un totale di {int(np.sum(cm))} predizioni ({p['n_ripetizioni']} passate sull'intero dataset di {p['n_righe']} funghi):
 - Veri Negativi (Commestibili corretti): {cm[0][0]}
 - Veri Positivi (Velenosi corretti):     {cm[1][1]}
 - Falsi Positivi (Allarmi inutili):      {cm[0][1]}
 - Falsi Negativi (PERICOLOSI):           {cm[1][0]} <--- Questo numero deve essere 0!
+
+4. TEMPI
+----------------------------------------
+Addestramento per fold: {r['tempo_fit']['media'] * 1000:.1f} ms (+/- {r['tempo_fit']['std'] * 1000:.1f})
+Predizione per fold:    {r['tempo_predict']['media'] * 1000:.2f} ms (+/- {r['tempo_predict']['std'] * 1000:.2f})
+Valutazione completa:   {risultati['tempo_totale']:.2f} s su {p['processi']} processi
 """
 
-# Salviamo il report in un file di testo.
-report_path = os.path.join(output_dir, "report_statistiche.txt")
-with open(report_path, "w") as f:
-    f.write(testo_output)
 
-print(f"\n✅ Fatto! Ho salvato tutti i dati nel file: {report_path}")
-print("Apri quel file per vedere le percentuali.")
+@traccia("valutazione.grafico_confusione")
+def salva_matrice_confusione(risultati, plot_path):
+    """
+    Heatmap della matrice di confusione complessiva, ottenuta dai risultati di 'valuta_modello'.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.colors import LinearSegmentedColormap
+
+    plt.figure(figsize=(10, 7))
+
+    # Creiamo la colormap personalizzata
+    custom_cmap = LinearSegmentedColormap.from_list(
+        'custom_heatmap',
+        ["#C63636", "#FFD9A5", "#5D8053"]
+    )
+
+    sns.heatmap(np.asarray(risultati['matrice_confusione']), annot=True, fmt='d', cmap=custom_cmap,
+                annot_kws={"size": 14},
+                xticklabels=['Pred: Commestibile', 'Pred: Velenoso'],
+                yticklabels=['Reale: Commestibile', 'Reale: Velenoso'])
+
+    plt.xlabel('Predizione Modello', fontsize=12)
+    plt.ylabel('Realtà', fontsize=12)
+    plt.title(f"Matrice di Confusione\nAccuratezza Media: {risultati['riepilogo']['accuratezza']['media'] * 100:.2f}%",
+              fontsize=15)
+    plt.tight_layout()
+
+    # Salviamo il grafico come immagine PNG.
+    plt.savefig(plot_path)
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valutazione statistica del classificatore di funghi.")
+    parser.add_argument('--csv', default=CSV_DEFAULT, help="Dataset da valutare (default: mushrooms.csv accanto allo script).")
+    parser.add_argument('--fold', type=int, default=5, help="Numero di fold della cross-validation.")
+    parser.add_argument('--ripetizioni', type=int, default=3, help="Numero di ripetizioni della cross-validation.")
+    parser.add_argument('--processi', type=int, default=None, help="Numero di processi worker (default: tutti i core).")
+    parser.add_argument('--senza-cache', action='store_true', help="Ripete la valutazione anche se i risultati sono in cache.")
+    parser.add_argument('--output-dir', default=DATA_DIR, help="Cartella in cui salvare report e grafico (default: data/).")
+    parser.add_argument('--json', default=None, help="Salva anche i risultati strutturati in questo file JSON.")
+    args = parser.parse_args()
+
+    risultati = valuta_modello(args.csv, n_fold=args.fold, n_ripetizioni=args.ripetizioni,
+                               processi=args.processi, usa_cache=not args.senza_cache)
+    if risultati['dalla_cache']:
+        print("Risultati letti dalla cache (usa --senza-cache per ripetere la valutazione).")
+
+    os.makedirs(args.output_dir, exist_ok=True)
 
-# --- 5. CREAZIONE E SALVATAGGIO DELLA MATRICE DI CONFUSIONE GRAFICA ---
+    # Salviamo il report in un file di testo.
+    report_path = os.path.join(args.output_dir, "report_statistiche.txt")
+    with open(report_path, "w") as f:
+        f.write(genera_report(risultati))
 
-# Creiamo un grafico della matrice di confusione per una visualizzazione più chiara.
-plt.figure(figsize=(10, 7))
+    # Salviamo il grafico della matrice di confusione.
+    plot_path = os.path.join(args.output_dir, "confusion_matrix.png")
+    salva_matrice_confusione(risultati, plot_path)
 
-# Creiamo la colormap personalizzata
-custom_cmap = LinearSegmentedColormap.from_list(
-    'custom_heatmap',
-    ["#C63636", "#FFD9A5", "#5D8053"]
-)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(risultati, f, indent=2)
 
-sns.heatmap(cm, annot=True, fmt='d', cmap=custom_cmap, annot_kws={"size": 14},
-            xticklabels=['Pred: Commestibile', 'Pred: Velenoso'],
-            yticklabels=['Reale: Commestibile', 'Reale: Velenoso'])
+    print(f"\n✅ Fatto! Ho salvato tutti i dati nel file: {report_path}")
+    print("Apri quel file per vedere le percentuali.")
 
-plt.xlabel('Predizione Modello', fontsize=12)
-plt.ylabel('Realtà', fontsize=12)
-plt.title(f'Matrice di Confusione\nAccuratezza Media: {accuracy_cv:.2f}%', fontsize=15)
-plt.tight_layout()
 
-# Salviamo il grafico come immagine PNG.
-plot_path = os.path.join(output_dir, "confusion_matrix.png")
-plt.savefig(plot_path)
-plt.close()
+if __name__ == '__main__':
+    main()
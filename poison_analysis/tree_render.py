@@ -0,0 +1,218 @@
+"""
+Disegno diretto dell'albero decisionale in SVG o Graphviz (DOT).
+
+I conteggi per classe di ogni nodo vengono letti da 'model.tree_' (nessuna figura matplotlib
+e nessun parsing del testo delle annotazioni) e il colore segue la stessa regola di
+'visualize_tree': colore della classe maggioritaria con trasparenza crescente con la purezza.
+Il layout SVG assegna a ogni foglia una colonna e centra ogni nodo interno sopra i figli:
+il costo è lineare nel numero di nodi, quindi anche alberi profondi si disegnano in millisecondi.
+
+Accanto al file disegnato viene salvata l'impronta dell'albero ('<file>.impronta'): se il
+modello non è cambiato il disegno viene saltato.
+"""
+import hashlib
+import os
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# colori delle classi (gli stessi di 'MushroomClassifier.visualize_tree')
+COLORI_CLASSI = {'e': "#5D8053", 'p': "#C63636"}
+
+# dimensioni del layout SVG (pixel)
+LARGHEZZA_NODO = 170
+ALTEZZA_RIGA = 15
+SPAZIO_ORIZZONTALE = 20
+SPAZIO_VERTICALE = 50
+MARGINE = 20
+
+FORMATI = {'.svg': 'svg', '.dot': 'dot', '.gv': 'dot'}
+
+
+def conteggi_nodi(tree_):
+    """
+    Esemplari per classe di ogni nodo (nodi x classi). Le versioni recenti di sklearn salvano
+    in 'value' le frazioni: si riportano ai conteggi con il peso totale del nodo.
+    """
+    valori = tree_.value[:, 0, :]
+    totali = valori.sum(axis=1, keepdims=True)
+    return valori / np.where(totali > 0, totali, 1) * tree_.weighted_n_node_samples[:, None]
+
+
+def colore_nodo(conteggi, classi):
+    """
+    Colore '#RRGGBBAA' della classe maggioritaria, con alpha dipendente dalla purezza.
+    """
+    totale = conteggi.sum()
+    if totale == 0:
+        return "#FFFFFF00"
+    purezza = conteggi.max() / totale
+    alpha = 0.6 + (purezza - 0.5) * 0.8 if purezza > 0.5 else 0.6
+    return f"{COLORI_CLASSI.get(str(classi[int(np.argmax(conteggi))]), '#999999')}{int(round(alpha * 255)):02X}"
+
+
+def impronta_albero(model, features, classi, categorie=None):
+    """
+    Hash della struttura dell'albero e dei nomi usati nel disegno.
+    """
+    t = model.tree_
+    h = hashlib.sha256()
+    for array in (t.children_left, t.children_right, t.feature, t.threshold, t.value, t.weighted_n_node_samples):
+        h.update(np.ascontiguousarray(array).tobytes())
+    h.update(repr((list(features), [str(c) for c in classi])).encode())
+    if categorie is not None:
+        h.update(repr({f: [str(v) for v in c] for f, c in categorie.items()}).encode())
+    return h.hexdigest()
+
+
+def _condizione(feature, soglia, categorie):
+    """
+    Testo della condizione di un nodo interno. Con le categorie dell'encoder la soglia sui
+    codici diventa l'insieme dei valori che vanno a sinistra.
+    """
+    if categorie is not None and feature in categorie:
+        sinistra = [str(v) for i, v in enumerate(categorie[feature]) if i <= soglia]
+        return f"{feature} ∈ {{{', '.join(sinistra)}}}"
+    return f"{feature} <= {soglia:.1f}"
+
+
+def _etichette(tree_, features, classi, categorie):
+    conteggi = conteggi_nodi(tree_)
+    etichette = []
+    for nodo in range(tree_.node_count):
+        righe = []
+        if tree_.children_left[nodo] != tree_.children_right[nodo]:
+            righe.append(_condizione(features[tree_.feature[nodo]], tree_.threshold[nodo], categorie))
+        righe.append(f"gini = {tree_.impurity[nodo]:.3f}")
+        righe.append(f"samples = {int(round(tree_.weighted_n_node_samples[nodo]))}")
+        righe.append(f"value = [{', '.join(str(int(round(v))) for v in conteggi[nodo])}]")
+        righe.append(f"class = {classi[int(np.argmax(conteggi[nodo]))]}")
+        etichette.append(righe)
+    return etichette, conteggi
+
+
+def albero_dot(model, features, classi, categorie=None):
+    """
+    Albero in formato Graphviz DOT (da convertire con 'dot -Tsvg' o aprire con un visualizzatore).
+    """
+    t = model.tree_
+    etichette, conteggi = _etichette(t, features, classi, categorie)
+    righe = [
+        'digraph AlberoDecisionale {',
+        '    node [shape=box, style="filled, rounded", fontname="Helvetica", fontsize=10];',
+        '    edge [fontname="Helvetica", fontsize=9];',
+    ]
+    for nodo in range(t.node_count):
+        testo = '\\n'.join(r.replace('"', '\\"') for r in etichette[nodo])
+        righe.append(f'    {nodo} [label="{testo}", fillcolor="{colore_nodo(conteggi[nodo], classi)}"];')
+        sinistro, destro = t.children_left[nodo], t.children_right[nodo]
+        if sinistro != destro:
+            # come in 'plot_tree' il ramo sinistro è quello in cui la condizione è vera
+            righe.append(f'    {nodo} -> {sinistro} [label="{"Vero" if nodo == 0 else ""}"];')
+            righe.append(f'    {nodo} -> {destro} [label="{"Falso" if nodo == 0 else ""}"];')
+    righe.append('}')
+    return '\n'.join(righe) + '\n'
+
+
+def _layout(tree_):
+    """
+    Colonna (x, in unità di nodo) e profondità di ogni nodo: le foglie occupano colonne
+    consecutive da sinistra a destra, i nodi interni stanno a metà tra i figli.
+    """
+    x = np.zeros(tree_.node_count)
+    profondita = np.zeros(tree_.node_count, dtype=int)
+    prossima_colonna = 0
+    # visita iterativa in post-ordine (alberi profondi non consumano lo stack di Python)
+    pila = [(0, False)]
+    while pila:
+        nodo, visitato = pila.pop()
+        sinistro, destro = tree_.children_left[nodo], tree_.children_right[nodo]
+        if sinistro == destro:
+            x[nodo] = prossima_colonna
+            prossima_colonna += 1
+        elif visitato:
+            x[nodo] = (x[sinistro] + x[destro]) / 2
+        else:
+            profondita[sinistro] = profondita[destro] = profondita[nodo] + 1
+            pila.append((nodo, True))
+            pila.append((destro, False))
+            pila.append((sinistro, False))
+    return x, profondita, prossima_colonna
+
+
+def albero_svg(model, features, classi, categorie=None, titolo="Albero Decisionale per la Classificazione dei Funghi"):
+    """
+    Albero in formato SVG, disegnato direttamente senza matplotlib.
+    """
+    t = model.tree_
+    etichette, conteggi = _etichette(t, features, classi, categorie)
+    x, profondita, n_colonne = _layout(t)
+
+    altezza_nodo = 5 * ALTEZZA_RIGA + 10
+    passo_x = LARGHEZZA_NODO + SPAZIO_ORIZZONTALE
+    passo_y = altezza_nodo + SPAZIO_VERTICALE
+    inizio_y = MARGINE + 40
+    larghezza = int(n_colonne * passo_x + 2 * MARGINE)
+    altezza = int((profondita.max() + 1) * passo_y + inizio_y + MARGINE)
+
+    # angolo in alto a sinistra di ogni nodo
+    sx = MARGINE + x * passo_x
+    sy = inizio_y + profondita * passo_y
+
+    parti = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{larghezza}" height="{altezza}" '
+        f'viewBox="0 0 {larghezza} {altezza}" font-family="Helvetica, Arial, sans-serif" font-size="11">',
+        '<rect width="100%" height="100%" fill="white"/>',
+        f'<text x="{larghezza / 2:.0f}" y="{MARGINE + 20}" text-anchor="middle" font-size="20">{escape(titolo)}</text>',
+        '<g stroke="#555555" stroke-width="1">',
+    ]
+    for nodo in range(t.node_count):
+        sinistro, destro = t.children_left[nodo], t.children_right[nodo]
+        if sinistro == destro:
+            continue
+        x0, y0 = sx[nodo] + LARGHEZZA_NODO / 2, sy[nodo] + altezza_nodo
+        for figlio in (sinistro, destro):
+            parti.append(f'<line x1="{x0:.1f}" y1="{y0:.1f}" x2="{sx[figlio] + LARGHEZZA_NODO / 2:.1f}" y2="{sy[figlio]:.1f}"/>')
+    parti.append('</g>')
+
+    for nodo in range(t.node_count):
+        colore = colore_nodo(conteggi[nodo], classi)
+        parti.append(
+            f'<rect x="{sx[nodo]:.1f}" y="{sy[nodo]:.1f}" width="{LARGHEZZA_NODO}" height="{altezza_nodo}" rx="6" '
+            f'fill="{colore[:7]}" fill-opacity="{int(colore[7:], 16) / 255:.2f}" stroke="#333333"/>'
+        )
+        centro = sx[nodo] + LARGHEZZA_NODO / 2
+        for i, riga in enumerate(etichette[nodo]):
+            parti.append(f'<text x="{centro:.1f}" y="{sy[nodo] + 5 + ALTEZZA_RIGA * (i + 1):.1f}" '
+                         f'text-anchor="middle">{escape(riga)}</text>')
+    parti.append('</svg>')
+    return '\n'.join(parti) + '\n'
+
+
+def renderizza_albero(model, features, classi, output_path, categorie=None, forza=False):
+    """
+    Scrive l'albero in 'output_path' (formato dall'estensione: .svg, .dot o .gv).
+    Restituisce False se il file esistente corrisponde già allo stesso albero e il disegno
+    è stato saltato, True se è stato scritto.
+    """
+    formato = FORMATI.get(os.path.splitext(output_path)[1].lower())
+    if formato is None:
+        raise ValueError(f"Formato non supportato per '{output_path}'. Estensioni ammesse: {sorted(FORMATI)}")
+
+    impronta = impronta_albero(model, features, classi, categorie)
+    percorso_impronta = f"{output_path}.impronta"
+    if not forza and os.path.exists(output_path) and os.path.exists(percorso_impronta):
+        with open(percorso_impronta, encoding='utf-8') as f:
+            if f.read().strip() == impronta:
+                return False
+
+    contenuto = albero_svg(model, features, classi, categorie) if formato == 'svg' else albero_dot(model, features, classi, categorie)
+
+    # file temporaneo + rinomina: un visualizzatore aperto non legge mai un file a metà
+    temporaneo = f"{output_path}.{os.getpid()}.tmp"
+    with open(temporaneo, 'w', encoding='utf-8') as f:
+        f.write(contenuto)
+    os.replace(temporaneo, output_path)
+    with open(percorso_impronta, 'w', encoding='utf-8') as f:
+        f.write(impronta)
+    return True
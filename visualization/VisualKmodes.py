@@ -8,18 +8,28 @@ import seaborn as sns
 from ucimlrepo import fetch_ucirepo
 import tkinter as tk
 from tkinter import ttk, messagebox
-from sklearn.preprocessing import LabelEncoder
 from sklearn.decomposition import PCA
-from kmodes.kmodes import KModes
 
 from matplotlib.colors import LinearSegmentedColormap
-import numpy as np
-from scipy.stats import chi2_contingency
+from cramers_matrix import matrice_cramers_v
+from cache_risultati import CacheRisultati, impronta_dataframe
+from kmodes_worker import EsecuzioneKModes
+import os
+import sys
+
+# caricatore condiviso del dataset codificato (cartella 'data' del progetto)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data')))
+from mushroom_data import codifica_dataframe
+from mushroom_schema import COLUMN_NAMES, nomi_inglesi
+# misura opzionale delle fasi (attiva solo con la variabile d'ambiente FUNGHI_TRACCIA)
+from pipeline_trace import apri_span, span, traccia
+from tk_watchdog import installa_da_ambiente
 
 # -----------------------------
 # Scaricare il dataset
 # -----------------------------
-mushroom = fetch_ucirepo(id=73)
+with span("visual.download_uci"):
+    mushroom = fetch_ucirepo(id=73)
 X = mushroom.data.features
 y = mushroom.data.targets
 df = pd.concat([X, y], axis=1)
@@ -28,31 +38,8 @@ target_col = df.columns[-1]
 # -----------------------------
 # Mapping
 # -----------------------------
-mappings = {
-    "cap-shape": {"b": "bell", "c": "conical", "x": "convex", "f": "flat", "k": "knobbed", "s": "sunken"},
-    "cap-surface": {"f": "fibrous", "g": "grooves", "y": "scaly", "s": "smooth"},
-    "cap-color": {"n": "brown", "b": "buff", "c": "cinnamon", "g": "gray", "r": "green", "p": "pink", "u": "purple", "e": "red", "w": "white", "y": "yellow"},
-    "bruises": {"t": "bruises", "f": "no bruises"},
-    "odor": {"a": "almond", "l": "anise", "c": "creosote", "y": "fishy", "f": "foul", "m": "musty", "n": "none", "p": "pungent", "s": "spicy"},
-    "gill-attachment": {"a": "attached", "d": "descending", "f": "free", "n": "notched"},
-    "gill-spacing": {"c": "close", "w": "crowded", "d": "distant"},
-    "gill-size": {"b": "broad", "n": "narrow"},
-    "gill-color": {"k": "black", "n": "brown", "b": "buff", "h": "chocolate", "g": "gray", "r": "green", "o": "orange", "p": "pink", "u": "purple", "e": "red", "w": "white", "y": "yellow"},
-    "stalk-shape": {"e": "enlarging", "t": "tapering"},
-    "stalk-root": {"b": "bulbous", "c": "club", "u": "cup", "e": "equal", "z": "rhizomorphs","?":"missing","r": "rooted"},
-    "stalk-surface-above-ring": {"f": "fibrous", "y": "scaly", "k": "silky", "s": "smooth"},
-    "stalk-surface-below-ring": {"f": "fibrous", "y": "scaly", "k": "silky", "s": "smooth"},
-    "stalk-color-above-ring": {"n": "brown", "b": "buff", "c": "cinnamon", "g": "gray", "o": "orange", "p": "pink", "e": "red", "w": "white", "y": "yellow"},
-    "stalk-color-below-ring": {"n": "brown", "b": "buff", "c": "cinnamon", "g": "gray", "o": "orange", "p": "pink", "e": "red", "w": "white", "y": "yellow"},
-    "veil-type": {"p": "partial","u":"universal"},
-    "veil-color": {"n": "brown", "o": "orange", "w": "white", "y": "yellow"},
-    "ring-number": {"n": "none", "o": "one", "t": "two"},
-    "ring-type": {"c": "cobwebby", "e": "evanescent", "f": "flaring", "l": "large", "n": "none", "p": "pendant", "s": "sheathing", "z": "zone"},
-    "spore-print-color": {"k": "black", "n": "brown", "b": "buff", "h": "chocolate", "r": "green", "o": "orange", "u": "purple", "w": "white", "y": "yellow"},
-    "population": {"a": "abundant", "c": "clustered", "n": "numerous", "s": "scattered", "v": "several", "y": "solitary"},
-    "habitat": {"g": "grasses", "l": "leaves", "m": "meadows", "p": "paths", "u": "urban", "w": "waste", "d": "woods"},
-    target_col: {"e": "edible", "p": "poisonous"}
-}
+#Nomi leggibili (inglesi) dei valori, dallo schema condiviso in data/mushroom_schema.py
+mappings = {col: nomi_inglesi(col) for col in list(COLUMN_NAMES[1:]) + [target_col]}
 for col, mapping in mappings.items():
     if col in df.columns:
         df[col] = df[col].map(mapping)
@@ -62,9 +49,21 @@ for col, mapping in mappings.items():
 if 'veil-type' in df.columns:
     df = df.drop(columns=['veil-type'])
 
+# -----------------------------
+# Cache dei risultati
+# -----------------------------
+# 'df' non cambia più dopo il caricamento: ne calcoliamo l'impronta una volta sola e la usiamo
+# come parte della chiave di ogni calcolo costoso. Con USA_CACHE_SU_DISCO i risultati
+# vengono salvati anche nella cartella '.cache_risultati' e sopravvivono al riavvio.
+USA_CACHE_SU_DISCO = True
+cartella_cache = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_risultati")
+cache = CacheRisultati(max_elementi=16, cartella=cartella_cache if USA_CACHE_SU_DISCO else None)
+impronta_df = impronta_dataframe(df)
+
 # -----------------------------
 # grafici
 # -----------------------------
+@traccia("visual.grafico_target")
 def grafico_target():
     #Definire la figura
     plt.figure(figsize=(6,4)) 
@@ -76,6 +75,7 @@ def grafico_target():
     plt.ylabel("Conteggio")
     plt.show()          
 
+@traccia("visual.grafico_feature")
 def grafico_feature(feature):
     # Controllare se la feature selezionata esiste nel dataframe
     if feature not in df.columns:        
@@ -92,22 +92,12 @@ def grafico_feature(feature):
     plt.tight_layout()            
     plt.show() 
 
-def cramers_v(x, y):
-    table = pd.crosstab(x, y)
-    chi2 = chi2_contingency(table)[0]
-    n = table.sum().sum()
-    r, k = table.shape
-    return np.sqrt(chi2 / (n * (min(r, k) - 1)))
-
+@traccia("visual.heatmap_correlazioni")
 def heatmap_correlazioni():
-    cols = df.columns
-    n = len(cols)
-
-    M = pd.DataFrame(np.zeros((n, n)), index=cols, columns=cols)
-
-    for i, c1 in enumerate(cols):
-        for j, c2 in enumerate(cols):
-            M.iloc[i, j] = cramers_v(df[c1], df[c2])
+    # Cramér's V di tutte le coppie di colonne (vedi 'cramers_matrix.py'):
+    # una tabella di contingenza per coppia con un solo 'bincount', senza crosstab
+    with span("visual.cramers_v"):
+        M = cache.ottieni(("correlazioni", impronta_df), lambda: matrice_cramers_v(df))
 
 
     colors = ["#C63636", "#FFD9A5", "#5D8053"]
@@ -137,27 +127,96 @@ def heatmap_correlazioni():
 # -----------------------------
 # K-MODES
 # -----------------------------
-def k_modes_cluster(n_clusters=2):
-    df_encoded = df.copy() #Creazione di una copia per evitare di sostituire valori
-    le = LabelEncoder() #Creazione di un oggetto label encoder
+# Parametri di K-Modes (fanno parte della chiave della cache)
+KMODES_INIT = 'Huang'
+KMODES_N_INIT = 5
+# oltre questo numero di righe si usa la variante mini-batch del motore K-Modes
+KMODES_SOGLIA_MINI_BATCH = 200_000
+KMODES_BATCH_SIZE = 20_000
+
+@traccia("visual.codifica_dataset")
+def codifica_dataset():
+    #Matrice uint8 (righe x feature, senza target), 1 byte per cella
+    #Codici = posizione nella lista ordinata delle categorie, come con LabelEncoder
+    return codifica_dataframe(df.drop(columns=[target_col])).codici
+
+@traccia("visual.pca")
+def calcola_pca():
+    #Serve per visualizzare i dati in un grafico 2D
+    pca = PCA(n_components=2, random_state=42)
+    return pca.fit_transform(codifica_dataset())
 
-    #Codifica delle colonne 
-    for col in df_encoded.columns:
-        df_encoded[col] = le.fit_transform(df_encoded[col])
-    # Inizializzare l'algoritmo K-Modes
-    # init='Huang' = metodo di inizializzazione
-    # n_init=5 = numero di inizializzazioni diverse per trovare la soluzione migliore
-    km = KModes(n_clusters=n_clusters, init='Huang', n_init=5, verbose=0)   #verbose:Disattiva messaggi di log
+# clustering in esecuzione nel processo worker (uno alla volta)
+esecuzione_kmodes = None
 
-    #Applica K-Modes sul dataset escludendo la colonna target
-    clusters = km.fit_predict(df_encoded.drop(columns=[target_col]))
+def k_modes_cluster(n_clusters=2):
+    global esecuzione_kmodes
 
-    #Aggiunge i cluster trovati come nuova colonna
-    df_encoded["Cluster"] = clusters
+    if esecuzione_kmodes is not None:
+        messagebox.showinfo("K-Modes", "Un clustering è già in esecuzione.")
+        return
 
-    #Serve per visualizzare i dati in un grafico 2D
-    pca = PCA(n_components=2, random_state=42)
-    pca_result = pca.fit_transform(df_encoded.drop(columns=[target_col, "Cluster"]))
+    # etichette e centroidi dipendono da dataset e parametri: se già calcolati li mostriamo subito
+    chiave = ("kmodes", impronta_df, n_clusters, KMODES_INIT, KMODES_N_INIT)
+    trovato, risultato = cache.cerca(chiave)
+    if trovato:
+        mostra_kmodes(n_clusters, risultato[0])
+        return
+
+    # Inizializzare l'algoritmo K-Modes (motore NumPy in 'kmodes_engine.py') in un processo
+    # separato: la finestra resta reattiva e le n_init inizializzazioni vengono distribuite su più core
+    codici = codifica_dataset()
+    batch_size = KMODES_BATCH_SIZE if len(codici) > KMODES_SOGLIA_MINI_BATCH else None
+    esecuzione = EsecuzioneKModes(codici, n_clusters, init=KMODES_INIT, n_init=KMODES_N_INIT, batch_size=batch_size)
+    esecuzione.avvia()
+    esecuzione_kmodes = esecuzione
+    # il clustering termina in 'controlla_esecuzione', chiamata dal ciclo di Tk
+    fase_kmodes = apri_span("visual.kmodes", n_clusters=n_clusters, righe=len(codici))
+
+    #Finestra di avanzamento con possibilità di annullare
+    progress_win = tk.Toplevel(root)
+    progress_win.title("K-Modes in corso")
+    progress_win.resizable(False, False)
+    progress_label = tk.Label(progress_win, text=f"K-Modes con {n_clusters} cluster...")
+    progress_label.pack(padx=20, pady=(15, 5))
+    barra = ttk.Progressbar(progress_win, length=250, mode="determinate", maximum=esecuzione.totale)
+    barra.pack(padx=20, pady=5)
+    tk.Button(progress_win, text="Annulla", command=esecuzione.annulla).pack(pady=(5, 15))
+    progress_win.protocol("WM_DELETE_WINDOW", esecuzione.annulla)
+
+    def controlla_esecuzione():
+        global esecuzione_kmodes
+
+        barra.configure(maximum=esecuzione.totale, value=esecuzione.completate)
+        progress_label.config(text=f"Inizializzazioni completate: {esecuzione.completate}/{esecuzione.totale}")
+        if not esecuzione.terminata():
+            root.after(100, controlla_esecuzione)
+            return
+
+        progress_win.destroy()
+        esecuzione_kmodes = None
+        fase_kmodes.chiudi()
+        if esecuzione.annullata:
+            esecuzione.pulisci()
+            return
+
+        try:
+            etichette, centroidi, _ = esecuzione.risultato()
+        except RuntimeError as e:
+            esecuzione.pulisci()
+            messagebox.showerror("Errore K-Modes", f"Il clustering non è riuscito: {e}")
+            return
+
+        #Il grafico viene sempre disegnato nel thread principale
+        cache.inserisci(chiave, (etichette, centroidi))
+        mostra_kmodes(n_clusters, etichette)
+
+    root.after(100, controlla_esecuzione)
+
+@traccia("visual.grafico_kmodes")
+def mostra_kmodes(n_clusters, clusters):
+    # la PCA dipende solo dal dataset
+    pca_result = cache.ottieni(("pca", impronta_df), calcola_pca)
 
     plt.figure(figsize=(8,6))
 
@@ -168,7 +227,7 @@ def k_modes_cluster(n_clusters=2):
     sns.scatterplot(
         x=pca_result[:,0],
         y=pca_result[:,1],
-        hue=df_encoded["Cluster"],
+        hue=clusters,
         palette=["#C63636", "#5D8053", "#E08B51", "#70A4A5"],
         style=df_plot["Tipo di fungo"], # Usiamo la colonna rinominata
         s=100,
@@ -274,5 +333,8 @@ tk.Entry(cluster_frame, textvariable=cluster_var, width=10).pack(pady=5)
 # Pulsante uscita
 tk.Button(root, text="Esci", command=root.destroy, **btn_style).pack(pady=15)
 
+#Watchdog opzionale della reattività della finestra (variabile d'ambiente FUNGHI_WATCHDOG)
+watchdog = installa_da_ambiente(root, "VisualKmodes")
+
 # Avvia il loop principale di Tkinter (mostra la finestra e gestisce eventi)
 root.mainloop()
\ No newline at end of file
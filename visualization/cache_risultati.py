@@ -0,0 +1,125 @@
+# -----------------------------
+# Cache dei risultati del visualizzatore
+# -----------------------------
+# I calcoli costosi (matrice delle correlazioni, K-Modes, PCA) dipendono solo dal dataset
+# e dai parametri della chiamata. Li memorizziamo con una chiave composta da:
+#   - l'impronta del DataFrame (hash del contenuto, calcolato una volta sola);
+#   - il nome del calcolo e i suoi parametri (es. numero di cluster, inizializzazione).
+# In memoria si tengono al massimo 'max_elementi' risultati (politica LRU); se viene indicata
+# una cartella, i risultati vengono salvati anche su disco e sopravvivono al riavvio.
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import pandas as pd
+
+# incrementare se cambia il formato dei risultati salvati su disco (o il modo in cui vengono calcolati)
+VERSIONE_CACHE = 4
+
+
+def impronta_dataframe(df):
+    """
+    Hash SHA-256 del contenuto del DataFrame (valori, indice, nomi e tipi delle colonne).
+    """
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    return h.hexdigest()
+
+
+class CacheRisultati:
+
+    def __init__(self, max_elementi=32, cartella=None, max_file_su_disco=256):
+        self.max_elementi = max_elementi
+        self.cartella = cartella
+        self.max_file_su_disco = max_file_su_disco
+        self._memoria = OrderedDict()
+
+        # statistiche utili per verificare che la cache funzioni
+        self.hit = 0
+        self.miss = 0
+
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+
+    def _percorso(self, chiave):
+        nome = hashlib.sha256(repr((VERSIONE_CACHE, chiave)).encode()).hexdigest()
+        return os.path.join(self.cartella, f"{nome}.pkl")
+
+    def _memorizza(self, chiave, valore):
+        self._memoria[chiave] = valore
+        self._memoria.move_to_end(chiave)
+        while len(self._memoria) > self.max_elementi:
+            self._memoria.popitem(last=False)
+
+    def cerca(self, chiave):
+        """
+        Restituisce (True, valore) se 'chiave' è in memoria o su disco, altrimenti (False, None).
+        """
+        if chiave in self._memoria:
+            self.hit += 1
+            self._memoria.move_to_end(chiave)
+            return True, self._memoria[chiave]
+
+        if self.cartella:
+            percorso = self._percorso(chiave)
+            if os.path.exists(percorso):
+                try:
+                    with open(percorso, 'rb') as f:
+                        valore = pickle.load(f)
+                    # aggiorna la data di modifica: su disco l'ordine LRU segue 'mtime'
+                    os.utime(percorso)
+                    self.hit += 1
+                    self._memorizza(chiave, valore)
+                    return True, valore
+                except Exception:
+                    # file corrotto o incompatibile: lo ricalcoliamo
+                    pass
+
+        self.miss += 1
+        return False, None
+
+    def inserisci(self, chiave, valore):
+        self._memorizza(chiave, valore)
+        if self.cartella:
+            self._salva_su_disco(chiave, valore)
+
+    def ottieni(self, chiave, calcola):
+        """
+        Restituisce il risultato associato a 'chiave', chiamando 'calcola()' solo se
+        non è presente né in memoria né su disco.
+        """
+        trovato, valore = self.cerca(chiave)
+        if not trovato:
+            valore = calcola()
+            self.inserisci(chiave, valore)
+        return valore
+
+    def _salva_su_disco(self, chiave, valore):
+        percorso = self._percorso(chiave)
+        temporaneo = f"{percorso}.{os.getpid()}.tmp"
+        try:
+            with open(temporaneo, 'wb') as f:
+                pickle.dump(valore, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporaneo, percorso)
+        except OSError as e:
+            print(f"ATTENZIONE: Impossibile salvare il risultato in cache: {e}")
+            return
+
+        # anche su disco la cache resta limitata: eliminiamo i file usati meno di recente
+        file_cache = [os.path.join(self.cartella, n) for n in os.listdir(self.cartella) if n.endswith('.pkl')]
+        if len(file_cache) > self.max_file_su_disco:
+            file_cache.sort(key=os.path.getmtime)
+            for vecchio in file_cache[:len(file_cache) - self.max_file_su_disco]:
+                try:
+                    os.remove(vecchio)
+                except OSError:
+                    pass
+
+    def svuota(self):
+        self._memoria.clear()
+        if self.cartella:
+            for nome in os.listdir(self.cartella):
+                if nome.endswith('.pkl'):
+                    os.remove(os.path.join(self.cartella, nome))
@@ -0,0 +1,81 @@
+# -----------------------------
+# Matrice di Cramér's V vettorizzata
+# -----------------------------
+# Calcolare 'cramers_v' per ogni coppia di colonne richiede n² chiamate a 'pd.crosstab'
+# e 'chi2_contingency'. Qui invece:
+#   1. ogni colonna viene codificata in interi una sola volta;
+#   2. per ogni coppia del triangolo superiore la tabella di contingenza si ottiene con un
+#      solo 'np.bincount' sul codice combinato (codice_i * categorie_j + codice_j);
+#   3. il chi-quadro viene calcolato su quella tabella e specchiato nel triangolo inferiore.
+# Il costo è lineare nel numero di righe per ciascuna delle n(n-1)/2 coppie, senza tabelle
+# ripetute né matrici one-hot.
+import numpy as np
+import pandas as pd
+
+
+def _chi2(osservate):
+    """
+    Chi-quadro di una tabella di contingenza, con la correzione di Yates per le tabelle 2x2
+    come fa 'scipy.stats.chi2_contingency' con le impostazioni di default.
+    """
+    n = osservate.sum()
+    attese = np.outer(osservate.sum(axis=1), osservate.sum(axis=0)) / n
+    gradi_liberta = (osservate.shape[0] - 1) * (osservate.shape[1] - 1)
+    if gradi_liberta == 0:
+        return 0.0
+    if gradi_liberta == 1:
+        differenza = attese - osservate
+        osservate = osservate + np.sign(differenza) * np.minimum(0.5, np.abs(differenza))
+    return ((osservate - attese) ** 2 / attese).sum()
+
+
+def codifica_colonne(df):
+    """
+    Codici interi (-1 per i valori mancanti) e numero di categorie di ogni colonna.
+    """
+    codici = []
+    n_categorie = []
+    for col in df.columns:
+        c, categorie = pd.factorize(df[col], sort=True)
+        codici.append(c.astype(np.int64))
+        n_categorie.append(len(categorie))
+    return codici, n_categorie
+
+
+def tabella_contingenza(codici_i, codici_j, n_i, n_j):
+    """
+    Tabella di contingenza (n_i x n_j) tra due colonne codificate. I valori mancanti (codice -1)
+    vengono esclusi coppia per coppia, come in 'pd.crosstab'.
+    """
+    combinati = codici_i * n_j + codici_j
+    if codici_i.min(initial=0) < 0 or codici_j.min(initial=0) < 0:
+        combinati = combinati[(codici_i >= 0) & (codici_j >= 0)]
+    return np.bincount(combinati, minlength=n_i * n_j).reshape(n_i, n_j).astype(np.float64)
+
+
+def matrice_cramers_v(df):
+    """
+    Matrice simmetrica (DataFrame) di Cramér's V tra tutte le colonne di 'df'.
+    """
+    cols = df.columns
+    n = len(cols)
+    codici, n_categorie = codifica_colonne(df)
+
+    M = np.full((n, n), np.nan)
+    for i in range(n):
+        # V di una colonna con sé stessa vale 1 (se ha almeno due categorie)
+        if n_categorie[i] > 1:
+            M[i, i] = 1.0
+
+        for j in range(i + 1, n):
+            tabella = tabella_contingenza(codici[i], codici[j], n_categorie[i], n_categorie[j])
+            # le categorie senza osservazioni (per via dei NaN dell'altra colonna) non fanno parte della tabella
+            righe_piene = tabella.sum(axis=1) > 0
+            colonne_piene = tabella.sum(axis=0) > 0
+            tabella = tabella[np.ix_(righe_piene, colonne_piene)]
+            r, k = tabella.shape
+            if r == 0 or min(r, k) < 2:
+                continue
+            M[i, j] = M[j, i] = np.sqrt(_chi2(tabella) / (tabella.sum() * (min(r, k) - 1)))
+
+    return pd.DataFrame(M, index=cols, columns=cols)
@@ -0,0 +1,233 @@
+# -----------------------------
+# K-Modes nativo in NumPy
+# -----------------------------
+# Implementazione di K-Modes che lavora direttamente su una matrice contigua di codici uint8
+# (righe x attributi) invece che su un DataFrame:
+#   - le distanze di Hamming verso tutti i centroidi si calcolano a blocchi di righe,
+#     accumulando le coincidenze attributo per attributo (niente array righe x k x attributi);
+#   - le mode dei cluster si ottengono con un solo 'bincount' per attributo;
+#   - inizializzazione di Huang o di Cao, come in 'kmodes.KModes';
+#   - con 'batch_size' si usa la variante mini-batch, adatta a milioni di righe.
+# A differenza della libreria, l'assegnazione dei punti è "a lotti" (tutti i punti, poi tutte
+# le mode) invece che punto per punto: i costi ottenuti sono comparabili.
+import numpy as np
+
+# numero massimo di elementi (righe x cluster) elaborati a ogni blocco di distanze
+ELEMENTI_BLOCCO = 1 << 22
+
+
+def _come_codici(X):
+    X = np.asarray(X)
+    if X.ndim != 2:
+        raise ValueError("La matrice dei codici deve essere 2-D (righe x attributi).")
+    if X.size and (X.min() < 0 or X.max() > 255):
+        raise ValueError("I codici devono essere interi compresi tra 0 e 255.")
+    return np.ascontiguousarray(X, dtype=np.uint8)
+
+
+def distanze_hamming(X, centroidi):
+    """
+    Distanze di Hamming (righe x cluster) tra ogni riga di X e ogni centroide.
+    """
+    coincidenze = np.zeros((X.shape[0], centroidi.shape[0]), dtype=np.uint16)
+    for j in range(X.shape[1]):
+        coincidenze += X[:, j, None] == centroidi[None, :, j]
+    return X.shape[1] - coincidenze.astype(np.int32)
+
+
+def assegna(X, centroidi):
+    """
+    Etichetta del centroide più vicino e relativa distanza per ogni riga, calcolate a blocchi.
+    """
+    n = X.shape[0]
+    etichette = np.empty(n, dtype=np.int32)
+    distanze = np.empty(n, dtype=np.int32)
+    righe_blocco = max(1, ELEMENTI_BLOCCO // max(1, centroidi.shape[0]))
+
+    for inizio in range(0, n, righe_blocco):
+        fine = min(inizio + righe_blocco, n)
+        d = distanze_hamming(X[inizio:fine], centroidi)
+        etichette[inizio:fine] = d.argmin(axis=1)
+        distanze[inizio:fine] = d[np.arange(fine - inizio), etichette[inizio:fine]]
+
+    return etichette, distanze
+
+
+def init_huang(X, n_clusters, rng):
+    """
+    Huang: per ogni attributo si estraggono valori con probabilità pari alla loro frequenza,
+    poi ogni centroide viene sostituito dalla riga più vicina non già scelta.
+    """
+    n, m = X.shape
+    centroidi = np.empty((n_clusters, m), dtype=np.uint8)
+    for j in range(m):
+        # estrarre righe a caso equivale a estrarre i valori in proporzione alla frequenza
+        centroidi[:, j] = X[rng.integers(0, n, n_clusters), j]
+
+    for k in range(n_clusters):
+        ordine = np.argsort(distanze_hamming(X, centroidi[k:k + 1])[:, 0], kind='stable')
+        scelta = ordine[0]
+        for indice in ordine:
+            scelta = indice
+            if not np.all(X[indice] == centroidi, axis=1).any():
+                break
+        centroidi[k] = X[scelta]
+
+    return centroidi
+
+
+def init_cao(X, n_clusters):
+    """
+    Cao: il primo centroide è la riga di densità massima; i successivi massimizzano
+    densità x distanza dal centroide già scelto più vicino. È deterministica.
+    """
+    n, m = X.shape
+    densita = np.zeros(n, dtype=np.float64)
+    for j in range(m):
+        frequenze = np.bincount(X[:, j], minlength=256)
+        densita += frequenze[X[:, j]]
+    densita /= n * m
+
+    centroidi = np.empty((n_clusters, m), dtype=np.uint8)
+    centroidi[0] = X[np.argmax(densita)]
+    distanza_minima = None
+    for k in range(1, n_clusters):
+        d = distanze_hamming(X, centroidi[k - 1:k])[:, 0]
+        distanza_minima = d if distanza_minima is None else np.minimum(distanza_minima, d)
+        centroidi[k] = X[np.argmax(distanza_minima * densita)]
+
+    return centroidi
+
+
+def calcola_mode(X, etichette, n_clusters, n_categorie, centroidi_precedenti):
+    """
+    Moda di ogni attributo in ogni cluster (a parità di frequenza vince il codice minore,
+    come nella libreria). I cluster vuoti mantengono il centroide precedente.
+    """
+    centroidi = centroidi_precedenti.copy()
+    pieni = np.bincount(etichette, minlength=n_clusters) > 0
+    for j, n_cat in enumerate(n_categorie):
+        conteggi = np.bincount(etichette * n_cat + X[:, j], minlength=n_clusters * n_cat).reshape(n_clusters, n_cat)
+        centroidi[pieni, j] = conteggi[pieni].argmax(axis=1)
+    return centroidi
+
+
+class KModesNumpy:
+
+    def __init__(self, n_clusters=8, init='Huang', n_init=10, max_iter=100, batch_size=None,
+                 random_state=None, verbose=0):
+        if init.lower() not in ('huang', 'cao'):
+            raise ValueError("'init' deve essere 'Huang' oppure 'Cao'.")
+
+        self.n_clusters = n_clusters
+        self.init = init
+        self.n_init = n_init
+        self.max_iter = max_iter
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.verbose = verbose
+
+        # attributi con gli stessi nomi di 'kmodes.KModes'
+        self.labels_ = None
+        self.cluster_centroids_ = None
+        self.cost_ = None
+        self.n_iter_ = None
+
+    def _inizializza(self, X, rng):
+        if self.init.lower() == 'cao':
+            return init_cao(X, self.n_clusters)
+        return init_huang(X, self.n_clusters, rng)
+
+    def _ripara_cluster_vuoti(self, X, etichette, distanze, centroidi):
+        """
+        Un cluster vuoto riceve la riga più lontana dal proprio centroide.
+        """
+        for k in np.flatnonzero(np.bincount(etichette, minlength=self.n_clusters) == 0):
+            lontano = int(np.argmax(distanze))
+            centroidi[k] = X[lontano]
+            etichette[lontano] = k
+            distanze[lontano] = 0
+        return etichette, centroidi
+
+    def _fit_completo(self, X, rng, n_categorie):
+        centroidi = self._inizializza(X, rng)
+        etichette, distanze = assegna(X, centroidi)
+        n_iter = 0
+
+        for n_iter in range(1, self.max_iter + 1):
+            etichette, centroidi = self._ripara_cluster_vuoti(X, etichette, distanze, centroidi)
+            centroidi = calcola_mode(X, etichette, self.n_clusters, n_categorie, centroidi)
+            nuove_etichette, distanze = assegna(X, centroidi)
+            spostati = int(np.count_nonzero(nuove_etichette != etichette))
+            etichette = nuove_etichette
+            if self.verbose:
+                print(f"Iterazione {n_iter}: {spostati} punti spostati, costo {int(distanze.sum())}")
+            if spostati == 0:
+                break
+
+        return etichette, centroidi, int(distanze.sum()), n_iter
+
+    def _fit_mini_batch(self, X, rng, n_categorie, pazienza=10):
+        n = X.shape[0]
+        centroidi = self._inizializza(X, rng)
+        offset = np.concatenate([[0], np.cumsum(n_categorie)])
+
+        # conteggi cumulativi (cluster x tutte le categorie), inizializzati con i centroidi
+        conteggi = np.zeros((self.n_clusters, offset[-1]), dtype=np.int64)
+        for j in range(X.shape[1]):
+            conteggi[np.arange(self.n_clusters), offset[j] + centroidi[:, j]] += 1
+
+        stabili = 0
+        n_iter = 0
+        for n_iter in range(1, self.max_iter + 1):
+            batch = X[rng.integers(0, n, min(self.batch_size, n))]
+            etichette_batch, _ = assegna(batch, centroidi)
+
+            nuovi = centroidi.copy()
+            for j, n_cat in enumerate(n_categorie):
+                blocco = conteggi[:, offset[j]:offset[j + 1]]
+                blocco += np.bincount(etichette_batch * n_cat + batch[:, j],
+                                      minlength=self.n_clusters * n_cat).reshape(self.n_clusters, n_cat)
+                nuovi[:, j] = blocco.argmax(axis=1)
+
+            # ci fermiamo quando i centroidi non cambiano per 'pazienza' batch consecutivi
+            stabili = stabili + 1 if np.array_equal(nuovi, centroidi) else 0
+            centroidi = nuovi
+            if self.verbose:
+                print(f"Mini-batch {n_iter}: centroidi stabili da {stabili} iterazioni")
+            if stabili >= pazienza:
+                break
+
+        etichette, distanze = assegna(X, centroidi)
+        return etichette, centroidi, int(distanze.sum()), n_iter
+
+    def fit(self, X):
+        X = _come_codici(X)
+        if X.shape[0] < self.n_clusters:
+            raise ValueError("Il numero di righe deve essere almeno pari al numero di cluster.")
+
+        rng = np.random.default_rng(self.random_state)
+        n_categorie = (X.max(axis=0).astype(np.int64) + 1).tolist()
+
+        # Cao è deterministica: più inizializzazioni darebbero lo stesso risultato
+        n_init = 1 if self.init.lower() == 'cao' else self.n_init
+
+        migliore = None
+        for _ in range(n_init):
+            if self.batch_size:
+                risultato = self._fit_mini_batch(X, rng, n_categorie)
+            else:
+                risultato = self._fit_completo(X, rng, n_categorie)
+            if migliore is None or risultato[2] < migliore[2]:
+                migliore = risultato
+
+        self.labels_, self.cluster_centroids_, self.cost_, self.n_iter_ = migliore
+        return self
+
+    def fit_predict(self, X):
+        return self.fit(X).labels_
+
+    def predict(self, X):
+        if self.cluster_centroids_ is None:
+            raise ValueError("Il modello non è stato ancora addestrato.")
+        return assegna(_come_codici(X), self.cluster_centroids_)[0]
@@ -0,0 +1,183 @@
+# -----------------------------
+# K-Modes in un processo separato
+# -----------------------------
+# Il visualizzatore non deve bloccarsi durante il clustering. Questo modulo ha due ruoli:
+#   - eseguito come script, è il processo worker: carica la matrice dei codici uint8, distribuisce
+#     le 'n_init' inizializzazioni di 'KModesNumpy' su un pool di processi, stampa una riga
+#     "PROGRESSO i n" ogni volta che una termina e salva il risultato migliore (costo minimo);
+#   - importato, fornisce 'EsecuzioneKModes', che la GUI usa per avviare il worker,
+#     leggerne l'avanzamento e annullarlo, senza mai chiamare Tk da un altro thread.
+# Il worker è un processo a sé (e non un 'multiprocessing' del visualizzatore) perché gli
+# script della GUI creano la finestra già all'import e non possono essere re-importati dai figli.
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+# matrice dei codici del processo del pool, caricata una volta sola da '_inizializza'
+_codici = None
+
+
+def _inizializza(percorso_codici):
+    global _codici
+    # memory-map: i processi del pool condividono le pagine del file invece di copiarle
+    _codici = np.load(percorso_codici, mmap_mode='r')
+
+
+def _esegui_inizializzazione(parametri):
+    from kmodes_engine import KModesNumpy
+
+    n_clusters, init, seed, batch_size = parametri
+    km = KModesNumpy(n_clusters=n_clusters, init=init, n_init=1, batch_size=batch_size, random_state=seed)
+    etichette = km.fit_predict(_codici)
+    return km.cost_, etichette, km.cluster_centroids_
+
+
+def esegui_worker(percorso_codici, percorso_risultato, n_clusters, init, n_init, processi, seed, batch_size=None):
+    """
+    Corpo del processo worker: restituisce il codice di uscita.
+    """
+    from multiprocessing import Pool
+
+    # l'inizializzazione di Cao è deterministica: ripeterla darebbe sempre lo stesso risultato
+    if init.lower() == 'cao':
+        n_init = 1
+
+    # SIGTERM (inviato da 'annulla') diventa SystemExit, così il 'with Pool' termina anche i figli
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+
+    semi = np.random.SeedSequence(seed).generate_state(n_init)
+    processi = max(1, min(processi or os.cpu_count() or 1, n_init))
+    migliore = None
+
+    print(f"PROGRESSO 0 {n_init}", flush=True)
+    with Pool(processi, initializer=_inizializza, initargs=(percorso_codici,)) as pool:
+        parametri = [(n_clusters, init, int(s), batch_size) for s in semi]
+        for i, risultato in enumerate(pool.imap_unordered(_esegui_inizializzazione, parametri), start=1):
+            if migliore is None or risultato[0] < migliore[0]:
+                migliore = risultato
+            print(f"PROGRESSO {i} {n_init}", flush=True)
+
+    costo, etichette, centroidi = migliore
+    np.savez(percorso_risultato, etichette=etichette, centroidi=centroidi, costo=costo)
+    print("FATTO", flush=True)
+    return 0
+
+
+class EsecuzioneKModes:
+    """
+    Avvia K-Modes in un processo worker e ne espone lo stato alla GUI.
+    Tutti i metodi sono non bloccanti: la GUI li interroga periodicamente con 'after'.
+    """
+
+    def __init__(self, codici, n_clusters, init='Huang', n_init=5, processi=None, seed=0, batch_size=None):
+        self.codici = np.ascontiguousarray(codici, dtype=np.uint8)
+        self.n_clusters = n_clusters
+        self.init = init
+        self.n_init = n_init
+        self.processi = processi
+        self.seed = seed
+        self.batch_size = batch_size
+
+        self.completate = 0
+        self.totale = n_init
+        self.errore = None
+        self.annullata = False
+
+        self._cartella = None
+        self._processo = None
+        self._log = None
+        self._lettore = None
+        self._fatto = False
+
+    def avvia(self):
+        self._cartella = tempfile.mkdtemp(prefix="kmodes_")
+        percorso_codici = os.path.join(self._cartella, "codici.npy")
+        np.save(percorso_codici, self.codici)
+
+        comando = [
+            sys.executable, os.path.abspath(__file__),
+            percorso_codici, os.path.join(self._cartella, "risultato.npz"),
+            '--n-clusters', str(self.n_clusters), '--init', self.init,
+            '--n-init', str(self.n_init), '--seed', str(self.seed),
+        ]
+        if self.processi:
+            comando += ['--processi', str(self.processi)]
+        if self.batch_size:
+            comando += ['--batch-size', str(self.batch_size)]
+
+        # stderr va su file: una pipe non letta potrebbe riempirsi e bloccare il worker
+        self._log = open(os.path.join(self._cartella, "worker.log"), 'w+')
+        self._processo = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=self._log, text=True)
+        # un thread legge l'output del worker e aggiorna solo attributi semplici
+        self._lettore = threading.Thread(target=self._leggi_output, daemon=True)
+        self._lettore.start()
+
+    def _leggi_output(self):
+        for riga in self._processo.stdout:
+            parti = riga.split()
+            if parti[:1] == ['PROGRESSO'] and len(parti) == 3:
+                self.completate, self.totale = int(parti[1]), int(parti[2])
+            elif parti[:1] == ['FATTO']:
+                self._fatto = True
+
+        codice = self._processo.wait()
+        if codice != 0 and not self.annullata:
+            self._log.seek(0)
+            dettagli = self._log.read().strip()
+            self.errore = dettagli.splitlines()[-1] if dettagli else f"il worker è terminato con codice {codice}"
+
+    def terminata(self):
+        return self._lettore is not None and not self._lettore.is_alive()
+
+    def risultato(self):
+        """
+        (etichette, centroidi, costo) del miglior clustering; da chiamare quando 'terminata()' è vero.
+        """
+        if self.errore:
+            raise RuntimeError(self.errore)
+        if not self._fatto:
+            raise RuntimeError("Il clustering non è stato completato.")
+        with np.load(os.path.join(self._cartella, "risultato.npz")) as dati:
+            risultato = dati['etichette'], dati['centroidi'], float(dati['costo'])
+        self.pulisci()
+        return risultato
+
+    def annulla(self):
+        self.annullata = True
+        if self._processo and self._processo.poll() is None:
+            self._processo.terminate()
+
+    def pulisci(self):
+        if self._log:
+            self._log.close()
+            self._log = None
+        if self._cartella:
+            shutil.rmtree(self._cartella, ignore_errors=True)
+            self._cartella = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker K-Modes (usato dal visualizzatore).")
+    parser.add_argument('codici', help="File .npy con la matrice dei codici (righe x attributi).")
+    parser.add_argument('risultato', help="File .npz in cui salvare etichette, centroidi e costo.")
+    parser.add_argument('--n-clusters', type=int, required=True)
+    parser.add_argument('--init', default='Huang')
+    parser.add_argument('--n-init', type=int, default=5)
+    parser.add_argument('--processi', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=None, help="Se indicato usa K-Modes mini-batch.")
+    args = parser.parse_args()
+
+    sys.exit(esegui_worker(args.codici, args.risultato, args.n_clusters, args.init,
+                           args.n_init, args.processi, args.seed, args.batch_size))
+
+
+if __name__ == '__main__':
+    main()